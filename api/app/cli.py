@@ -0,0 +1,189 @@
+"""Command line entry points: ``python -m app.cli <command> ...``."""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+from typing import List, Sequence
+
+_TEXT_SUFFIXES = (".txt", ".docx")
+
+
+def _load_expected(path: Path) -> dict:
+    # gold files exported from 1C often start with a BOM
+    return json.loads(path.read_text(encoding="utf-8-sig"))
+
+
+def _collect_samples(args: argparse.Namespace):
+    from .services.evaluation import EvaluationSample
+    from .services.utils import read_text_from_path
+
+    samples: List[EvaluationSample] = []
+    for text_path, expected_path in args.pair or []:
+        samples.append(
+            EvaluationSample(
+                name=Path(text_path).name,
+                text=read_text_from_path(text_path),
+                expected=_load_expected(Path(expected_path)),
+            )
+        )
+
+    if args.corpus:
+        corpus = Path(args.corpus)
+        for text_path in sorted(corpus.iterdir()):
+            if text_path.suffix.lower() not in _TEXT_SUFFIXES:
+                continue
+            expected_path = text_path.with_suffix(".json")
+            if not expected_path.exists():
+                print(f"skip {text_path.name}: no {expected_path.name}", file=sys.stderr)
+                continue
+            samples.append(
+                EvaluationSample(
+                    name=text_path.name,
+                    text=read_text_from_path(text_path),
+                    expected=_load_expected(expected_path),
+                )
+            )
+    return samples
+
+
+def _cmd_evaluate(args: argparse.Namespace) -> int:
+    from .main import profiles
+    from .services.evaluation import evaluate_corpus
+    from .services.profiles import UnknownProfileError
+
+    try:
+        pipeline = profiles.get(args.profile).current.pipeline
+    except UnknownProfileError:
+        print(f"Unknown profile: {args.profile} (available: {', '.join(profiles.ids())})", file=sys.stderr)
+        return 2
+
+    samples = _collect_samples(args)
+    if not samples:
+        print("No samples: use --corpus DIR and/or --pair TEXT EXPECTED", file=sys.stderr)
+        return 2
+
+    fields = args.fields.split(",") if args.fields else None
+    report = asyncio.run(
+        evaluate_corpus(pipeline, samples, concurrency=args.concurrency, fields=fields)
+    )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    summary = report["summary"]
+    print(
+        f"documents={summary['documents']} failed={summary['failed_documents']} "
+        f"accuracy={summary['accuracy']} llm_ms={summary['llm_ms']} "
+        f"prompt_tokens={summary['prompt_tokens']} eval_tokens={summary['eval_tokens']}"
+    )
+    print(f"{'field':<40} {'acc':>6} {'n':>4} {'llm_ms':>10} {'in_tok':>8} {'out_tok':>8}")
+    for name, stats in report["fields"].items():
+        accuracy = "-" if stats["accuracy"] is None else f"{stats['accuracy']:.2f}"
+        print(
+            f"{name:<40} {accuracy:>6} {stats['total']:>4} {stats['avg_llm_ms']:>10} "
+            f"{stats['avg_prompt_tokens']:>8} {stats['avg_eval_tokens']:>8}"
+        )
+    return 0 if summary["failed_documents"] == 0 else 1
+
+
+def _cmd_bulk(args: argparse.Namespace) -> int:
+    from .main import profiles
+    from .services.bulk import collect_documents, run_bulk
+    from .services.profiles import UnknownProfileError
+
+    try:
+        pipeline = profiles.get(args.profile).current.pipeline
+    except UnknownProfileError:
+        print(f"Unknown profile: {args.profile} (available: {', '.join(profiles.ids())})", file=sys.stderr)
+        return 2
+
+    documents = collect_documents(
+        Path(args.input) if args.input else None,
+        Path(args.manifest) if args.manifest else None,
+    )
+    if not documents:
+        print("No documents: use --input DIR and/or --manifest FILE", file=sys.stderr)
+        return 2
+
+    def report(progress) -> None:
+        if progress.processed % args.progress_every == 0:
+            print(json.dumps(progress.to_dict()), file=sys.stderr)
+
+    try:
+        progress = asyncio.run(
+            run_bulk(
+                pipeline,
+                documents,
+                Path(args.output),
+                workers=args.workers,
+                concurrency=args.concurrency,
+                reuse_results=not args.no_reuse,
+                retry_failed=args.retry_failed,
+                on_progress=report,
+            )
+        )
+    except FileExistsError as exc:
+        print(exc, file=sys.stderr)
+        return 2
+    print(json.dumps(progress.to_dict()))
+    return 0 if progress.failed == 0 else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    evaluate = subparsers.add_parser(
+        "evaluate",
+        help="run a labelled corpus through the pipeline and report accuracy and LLM cost per field",
+    )
+    evaluate.add_argument("--corpus", help="directory with <name>.txt|.docx and matching <name>.json")
+    evaluate.add_argument(
+        "--pair",
+        nargs=2,
+        action="append",
+        metavar=("TEXT", "EXPECTED"),
+        help="document file and its expected JSON (repeatable)",
+    )
+    evaluate.add_argument("--concurrency", type=int, default=1)
+    evaluate.add_argument("--fields", help="comma separated fields to compare (default: enabled fields)")
+    evaluate.add_argument("--output", help="write the full JSON report to this file")
+    evaluate.add_argument("--profile", help="configuration profile from assets/profiles (default: base config)")
+    evaluate.set_defaults(handler=_cmd_evaluate)
+
+    bulk = subparsers.add_parser(
+        "bulk",
+        help="extract fields from many documents into JSONL; rerun the same command to resume",
+    )
+    bulk.add_argument("--input", help="directory with .txt/.docx documents (searched recursively)")
+    bulk.add_argument("--manifest", help="file with one path (or JSON {\"id\", \"path\"}) per line")
+    bulk.add_argument("--output", required=True, help="JSONL results; <output>.checkpoint tracks progress")
+    bulk.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="processes for DOCX decoding and text cleanup"
+    )
+    bulk.add_argument(
+        "--concurrency",
+        type=int,
+        default=2,
+        help="documents in the LLM stage at once (each sends up to LLM_GROUP_CONCURRENCY calls)",
+    )
+    bulk.add_argument("--profile", help="configuration profile from assets/profiles (default: base config)")
+    bulk.add_argument("--no-reuse", action="store_true", help="do not answer repeated texts from the result store")
+    bulk.add_argument("--retry-failed", action="store_true", help="process documents that failed in earlier runs again")
+    bulk.add_argument("--progress-every", type=int, default=100, help="print progress every N documents")
+    bulk.set_defaults(handler=_cmd_bulk)
+
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
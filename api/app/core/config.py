@@ -11,9 +11,71 @@ class AppConfig(BaseModel):
     ollama_host: str = "http://localhost:11434"
     model_name: str = os.getenv("MODEL", "krith/qwen2.5-32b-instruct:IQ4_XS")
     temperature: float = float(os.getenv("TEMPERATURE", "0.1"))
+    # Верхняя граница num_predict; при DYNAMIC_LLM_BUDGET длина ответа считается по полям группы.
     max_tokens: int = int(os.getenv("MAX_TOKENS", "1024"))
+    # Подбирать num_ctx и num_predict под каждый вызов LLM (иначе num_ctx из Modelfile).
+    dynamic_llm_budget: bool = os.getenv("DYNAMIC_LLM_BUDGET", "true").lower() == "true"
+    # Границы num_ctx; размер округляется вверх до степени двойки, чтобы Ollama
+    # реже перезапускала модель из-за смены контекста.
+    llm_num_ctx_min: int = int(os.getenv("LLM_NUM_CTX_MIN", "4096"))
+    llm_num_ctx_max: int = int(os.getenv("LLM_NUM_CTX_MAX", "32768"))
+    # num_ctx прогрева и продления keep_alive: размер, с которым идёт большинство вызовов
+    # (степень двойки); 0 — LLM_NUM_CTX_MIN.
+    llm_num_ctx_warmup: int = int(os.getenv("LLM_NUM_CTX_WARMUP", "0"))
     numeric_tolerance: float = float(os.getenv("NUMERIC_TOLERANCE", "0.01"))
     use_llm: bool = os.getenv("USE_LLM", "true").lower() == "true"
+    # Убирать из текста таблицы спецификаций, подписи и колонтитулы перед отправкой в LLM.
+    preprocess_documents: bool = os.getenv("PREPROCESS_DOCUMENTS", "true").lower() == "true"
+    # Заполнять «Организация» и «Контрагент» по реестру assets/counterparties.json без LLM,
+    # если совпадение не ниже этой уверенности (1.0 — ИНН, 0.9 — название с формой собственности).
+    gazetteer_min_confidence: float = float(os.getenv("GAZETTEER_MIN_CONFIDENCE", "0.9"))
+    # Запоминать стороны из результатов извлечения (по ИНН рядом с названием).
+    counterparty_learning: bool = os.getenv("COUNTERPARTY_LEARNING", "true").lower() == "true"
+    # Файл выученных сторон (общий для воркеров); пусто — только в памяти процесса.
+    counterparties_learned_path: str = os.getenv("COUNTERPARTIES_LEARNED_PATH", "")
+    # Заполнять «ОЭЗ_ОКПД2» по классификатору без LLM, если за код проголосовала
+    # не меньшая доля позиций спецификации (и больше, чем за любой другой код).
+    okpd2_suggest_min_confidence: float = float(os.getenv("OKPD2_SUGGEST_MIN_CONFIDENCE", "0.5"))
+    # Сколько раз переспрашивать LLM, если ответ группы не прошёл проверку схемы.
+    llm_reask_attempts: int = int(os.getenv("LLM_REASK_ATTEMPTS", "0"))
+    # Сколько вызовов LLM одного документа (групп полей и окон длинного текста)
+    # отправлять одновременно; имеет смысл при OLLAMA_NUM_PARALLEL > 1 на стороне Ollama.
+    llm_group_concurrency: int = int(os.getenv("LLM_GROUP_CONCURRENCY", "1"))
+    # Фрагмент группы длиннее этого числа символов делится на перекрывающиеся окна;
+    # ответы окон сводятся по правилам field_merge_rules.json. 0 (по умолчанию) — без
+    # деления сверх того, что не помещается в LLM_NUM_CTX_MAX (такой текст делится всегда).
+    llm_window_chars: int = int(os.getenv("LLM_WINDOW_CHARS", "0"))
+    llm_window_overlap: int = int(os.getenv("LLM_WINDOW_OVERLAP", "1000"))
+    # Сколько последних результатов хранить для инкрементального повторного извлечения.
+    result_store_size: int = int(os.getenv("RESULT_STORE_SIZE", "256"))
+    # Каталог снимков ассетов (по файлу на профиль): конфигурация и группы LLM читаются
+    # при старте одним файлом, пока не изменятся файлы assets/prompts; пусто — отключено.
+    asset_snapshot_dir: str = os.getenv("ASSET_SNAPSHOT_DIR", "")
+    # Период (сек) проверки файлов assets/prompts для перезагрузки конфигурации; 0 — отключено.
+    asset_reload_interval: float = float(os.getenv("ASSET_RELOAD_INTERVAL", "2"))
+    # Число процессов uvicorn (см. Dockerfile); при >1 нужен STATE_DB_PATH, иначе у каждого воркера свой кеш.
+    workers: int = int(os.getenv("UVICORN_WORKERS", "1"))
+    # Файл SQLite с общим для всех воркеров хранилищем результатов; пусто — память процесса.
+    state_db_path: str = os.getenv("STATE_DB_PATH", "")
+    # Отдавать сохранённый результат при повторной отправке того же текста.
+    reuse_identical_results: bool = os.getenv("REUSE_IDENTICAL_RESULTS", "true").lower() == "true"
+    # Размер общего пула HTTP-соединений с Ollama (на все профили).
+    ollama_max_connections: int = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "16"))
+    # Предельное время обработки одного запроса /check (сек); 0 — без ограничения.
+    request_deadline_seconds: float = float(os.getenv("REQUEST_DEADLINE_SECONDS", "0"))
+    # Как часто проверять, не отключился ли клиент /check (сек).
+    disconnect_poll_interval: float = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+    # Загружать модель при старте и продлевать её keep_alive, пока идут запросы.
+    model_warmup: bool = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+    # Сколько Ollama держит модель в памяти после вызова («30m», секунды или -1 — всегда).
+    ollama_keep_alive: str = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+    # Период (сек) продления keep_alive и окно (сек) после последнего /check, в котором это делается.
+    warmup_refresh_interval: float = float(os.getenv("WARMUP_REFRESH_INTERVAL", "600"))
+    warmup_traffic_window: float = float(os.getenv("WARMUP_TRAFFIC_WINDOW", "3600"))
+    # Пауза (сек) перед повторной попыткой прогрева, если Ollama или модель недоступны.
+    warmup_retry_interval: float = float(os.getenv("WARMUP_RETRY_INTERVAL", "15"))
+    # Файл трассировки запросов (OTLP/JSON, строка на трассу); пусто — трассировка отключена.
+    tracing_export_path: str = os.getenv("TRACING_EXPORT_PATH", "")
     ollama_read_timeout: float = float(os.getenv("OLLAMA_READ_TIMEOUT", "300"))
     supported_languages: List[str] = [lang.strip() for lang in os.getenv("SUPPORTED_LANGUAGES", "ru,en").split(",") if lang.strip()]
 
@@ -0,0 +1,369 @@
+"""Layered asset/prompt configuration: defaults overlaid by user overrides."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from . import field_settings as _field_settings
+from .field_settings import DocumentSlice, LLMFieldGroup
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: только блокировка внутри процесса
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Ключи JSON-ассетов и текстовых промптов, которые можно переопределить.
+ASSET_KEYS = ("extractors", "schema", "contexts", "merge_rules")
+PROMPT_KEYS = ("field_guidelines", "summary_system", "summary_user_template", "system", "user_template")
+
+# Версия формата снимка ассетов; снимок другой версии пересобирается.
+ASSET_SNAPSHOT_FORMAT = 1
+# Код, по которому собираются группы и подсказки снимка: его правка тоже делает снимок устаревшим
+_SNAPSHOT_SOURCES = (Path(__file__), Path(_field_settings.__file__))
+
+LLMGroups = Tuple[Tuple[LLMFieldGroup, str], ...]
+
+
+@dataclass(frozen=True)
+class ConfigLayer:
+    name: str
+    assets: Dict[str, Path]
+    prompts: Dict[str, Path]
+    field_prompts_dir: Optional[Path] = None
+
+    def files(self) -> List[Path]:
+        paths = [*self.assets.values(), *self.prompts.values()]
+        if self.field_prompts_dir is not None:
+            paths.append(self.field_prompts_dir)
+        return paths
+
+
+@dataclass(frozen=True)
+class ResolvedConfig:
+    """Итоговая конфигурация после наложения слоёв; ``sources`` — какой слой дал ключ."""
+
+    schema: Dict[str, Any]
+    extractors: Dict[str, str]
+    contexts: Any
+    prompts: Dict[str, str]
+    field_prompts: Dict[str, str]
+    merge_rules: Any = None
+    sources: Dict[str, str] = field(default_factory=dict)
+    # Группы LLM с подсказками, собранные заранее (только из снимка ассетов)
+    llm_groups: Optional[LLMGroups] = None
+    # Отпечаток файлов, из которых собрана конфигурация (если включён снимок)
+    fingerprint: str = ""
+    from_snapshot: bool = False
+
+
+def _expand(paths: Iterable[Path]) -> List[Path]:
+    files: List[Path] = []
+    for path in paths:
+        if path.is_dir():
+            files.extend(sorted(item for item in path.iterdir() if item.is_file()))
+        else:
+            files.append(path)
+    return files
+
+
+def assets_fingerprint(paths: Iterable[Path]) -> str:
+    """Отпечаток набора файлов по (путь, mtime, размер) — без чтения содержимого.
+
+    Каталоги раскрываются в список файлов, поэтому добавление и удаление
+    подсказок полей тоже меняет отпечаток.
+    """
+
+    digest = hashlib.sha1()
+    for path in _expand(paths):
+        try:
+            stat = path.stat()
+        except OSError:
+            marker = "missing"
+        else:
+            marker = f"{stat.st_mtime_ns}:{stat.st_size}"
+        digest.update(f"{path}\0{marker}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def content_fingerprint(paths: Iterable[Path]) -> str:
+    """Отпечаток содержимого набора файлов.
+
+    В отличие от :func:`assets_fingerprint` не зависит от времени изменения,
+    поэтому одинаков во всех воркерах, читающих одни и те же файлы.
+    """
+
+    digest = hashlib.sha1()
+    for path in _expand(paths):
+        try:
+            content = path.read_bytes()
+        except OSError:
+            digest.update(f"{path}\0missing\n".encode("utf-8"))
+            continue
+        digest.update(f"{path}\0{len(content)}\n".encode("utf-8"))
+        digest.update(content)
+    return digest.hexdigest()
+
+
+def _read_json(path: Path) -> Any:
+    with path.open("r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _unlink_quietly(name: str) -> None:
+    try:
+        os.unlink(name)
+    except OSError:
+        pass
+
+
+def atomic_write_text(path: Path, content: str) -> None:
+    """Записывает файл через временный файл и ``os.replace``.
+
+    Читатель (в том числе наблюдатель за конфигурацией) видит либо старое,
+    либо новое содержимое целиком, но никогда не частично записанный файл.
+    """
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(content)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        _unlink_quietly(tmp_name)
+        raise
+
+
+class InterProcessLock:
+    """Эксклюзивная блокировка файла ``path`` (``fcntl.flock``) между процессами.
+
+    Методы блокирующие: из event loop их вызывают через ``asyncio.to_thread``.
+    ``flock`` принадлежит открытому файлу, а не потоку, поэтому держателей внутри
+    процесса упорядочивает вызывающий код.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._handle = None
+
+    def acquire(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        handle = open(self.path, "a+")
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        self._handle = handle
+
+    def release(self) -> None:
+        handle, self._handle = self._handle, None
+        if handle is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        handle.close()
+
+
+class LayeredConfigStore:
+    """Resolves assets and prompts from ``layers`` (lowest priority first).
+
+    ``extractors`` and per-field prompts are merged key by key, so a user layer
+    only has to list the fields it changes; ``schema``, ``contexts``,
+    ``merge_rules`` and the text prompts are replaced as a whole. Blank prompt files are ignored.
+    """
+
+    def __init__(
+        self,
+        layers: Sequence[ConfigLayer],
+        override_layer: Optional[str] = None,
+        snapshot_path: Optional[Path] = None,
+    ):
+        """``snapshot_path`` — файл снимка ассетов: вся итоговая конфигурация и
+        собранные группы LLM, которые читаются одним чтением, пока отпечаток
+        файлов слоёв не изменился. ``None`` — снимок не ведётся."""
+        if not layers:
+            raise ValueError("At least one configuration layer is required")
+        self.layers = tuple(layers)
+        self._override_layer = override_layer
+        self.snapshot_path = snapshot_path
+
+    @property
+    def override_layer(self) -> ConfigLayer:
+        """Слой, в который пишут ``/assets/change`` и ``/prompts/system_change``."""
+        if self._override_layer is None:
+            return self.layers[-1]
+        for layer in self.layers:
+            if layer.name == self._override_layer:
+                return layer
+        raise KeyError(self._override_layer)
+
+    def watched_paths(self) -> List[Path]:
+        return [path for layer in self.layers for path in layer.files()]
+
+    def override_lock(self) -> InterProcessLock:
+        """Блокировка записи переопределений, общая для всех воркеров (файл рядом со слоем)."""
+        layer = self.override_layer
+        directory = next(iter([*layer.assets.values(), *layer.prompts.values()])).parent
+        return InterProcessLock(directory / ".overrides.lock")
+
+    def resolve(self) -> ResolvedConfig:
+        if self.snapshot_path is None:
+            return self._resolve_layers()
+        # Отпечаток снимается до чтения: файл, изменённый во время сборки,
+        # даст другой отпечаток при следующем старте, и снимок пересоберётся.
+        fingerprint = assets_fingerprint([*self.watched_paths(), *_SNAPSHOT_SOURCES])
+        cached = self._load_snapshot(fingerprint)
+        if cached is not None:
+            return cached
+        return replace(self._resolve_layers(), fingerprint=fingerprint)
+
+    def save_snapshot(self, resolved: ResolvedConfig, llm_groups: Optional[LLMGroups] = None) -> bool:
+        """Сохраняет ``resolved`` и собранные по нему группы LLM в файл снимка.
+
+        Ошибка записи (например, каталог только для чтения) не мешает работе:
+        конфигурация просто будет собираться из файлов слоёв.
+        """
+
+        if self.snapshot_path is None or resolved.from_snapshot or not resolved.fingerprint:
+            return False
+        payload = {
+            "format": ASSET_SNAPSHOT_FORMAT,
+            "fingerprint": resolved.fingerprint,
+            "config": {
+                "schema": resolved.schema,
+                "extractors": resolved.extractors,
+                "contexts": resolved.contexts,
+                "prompts": resolved.prompts,
+                "field_prompts": resolved.field_prompts,
+                "merge_rules": resolved.merge_rules,
+                "sources": resolved.sources,
+            },
+            "llm_groups": None
+            if llm_groups is None
+            else [
+                {"fields": list(group.fields), "slice": asdict(group.document_slice), "guidelines": guidelines}
+                for group, guidelines in llm_groups
+            ],
+        }
+        try:
+            atomic_write_text(self.snapshot_path, json.dumps(payload, ensure_ascii=False, separators=(",", ":")))
+        except OSError as exc:
+            logger.warning("Asset snapshot %s is not saved: %s", self.snapshot_path, exc)
+            return False
+        return True
+
+    def _load_snapshot(self, fingerprint: str) -> Optional[ResolvedConfig]:
+        try:
+            payload = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+            if payload.get("format") != ASSET_SNAPSHOT_FORMAT or payload.get("fingerprint") != fingerprint:
+                return None
+            config = payload["config"]
+            groups = payload.get("llm_groups")
+            return ResolvedConfig(
+                schema=config["schema"],
+                extractors=config["extractors"],
+                contexts=config.get("contexts"),
+                prompts=config["prompts"],
+                field_prompts=config["field_prompts"],
+                merge_rules=config.get("merge_rules"),
+                sources=config.get("sources", {}),
+                llm_groups=None
+                if groups is None
+                else tuple(
+                    (
+                        LLMFieldGroup(tuple(item["fields"]), DocumentSlice(**item["slice"])),
+                        item["guidelines"],
+                    )
+                    for item in groups
+                ),
+                fingerprint=fingerprint,
+                from_snapshot=True,
+            )
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            # Повреждённый снимок не ошибка: конфигурация соберётся из файлов слоёв
+            logger.warning("Asset snapshot %s is ignored: %s", self.snapshot_path, exc)
+            return None
+
+    def _resolve_layers(self) -> ResolvedConfig:
+        sources: Dict[str, str] = {}
+        extractors: Dict[str, str] = {}
+        replaced: Dict[str, Any] = {}
+        prompts: Dict[str, str] = {}
+        field_prompts: Dict[str, str] = {}
+
+        for layer in self.layers:
+            for key, path in layer.assets.items():
+                if not path.exists():
+                    continue
+                data = _read_json(path)
+                if key == "extractors":
+                    if not isinstance(data, dict):
+                        raise ValueError(f"{path}: field extractors must be a JSON object")
+                    extractors.update({str(name): str(method) for name, method in data.items()})
+                else:
+                    replaced[key] = data
+                sources[key] = layer.name
+
+            for key, path in layer.prompts.items():
+                if not path.exists():
+                    continue
+                text = path.read_text(encoding="utf-8")
+                if text.strip():
+                    prompts[key] = text
+                    sources[key] = layer.name
+
+            if layer.field_prompts_dir is not None and layer.field_prompts_dir.exists():
+                for file in sorted(layer.field_prompts_dir.glob("*.md")):
+                    field_prompts[file.stem] = file.read_text(encoding="utf-8")
+
+        if "schema" not in replaced:
+            raise FileNotFoundError("Schema is not defined in any configuration layer")
+        if "extractors" not in sources:
+            raise FileNotFoundError("Field extractors are not defined in any configuration layer")
+
+        return ResolvedConfig(
+            schema=replaced["schema"],
+            extractors=extractors,
+            contexts=replaced.get("contexts"),
+            prompts=prompts,
+            field_prompts=field_prompts,
+            merge_rules=replaced.get("merge_rules"),
+            sources=sources,
+        )
+
+    async def write_override(self, kind: str, key: str, content: str) -> Optional[str]:
+        """Атомарно записывает файл слоя переопределений и возвращает прежнее
+        содержимое (``None``, если файла не было), чтобы его можно было вернуть.
+        """
+
+        layer = self.override_layer
+        paths = layer.assets if kind == "asset" else layer.prompts
+        if key not in paths:
+            raise KeyError(key)
+        path = paths[key]
+        return await asyncio.to_thread(self._replace, path, content)
+
+    async def restore_override(self, kind: str, key: str, previous: Optional[str]) -> None:
+        layer = self.override_layer
+        path = (layer.assets if kind == "asset" else layer.prompts)[key]
+        if previous is None:
+            await asyncio.to_thread(_unlink_quietly, str(path))
+        else:
+            await asyncio.to_thread(atomic_write_text, path, previous)
+
+    @staticmethod
+    def _replace(path: Path, content: str) -> Optional[str]:
+        previous = path.read_text(encoding="utf-8") if path.exists() else None
+        atomic_write_text(path, content)
+        return previous
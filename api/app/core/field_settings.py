@@ -3,9 +3,38 @@ from __future__ import annotations
 from collections import OrderedDict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, Iterable, Iterator, Sequence
+from typing import Dict, Any, Callable, Iterable, Iterator, Sequence
 import json
 
+# Правила сведения ответов окон длинного документа (см. services/extractor/chunking.py):
+#   first    — первое непустое значение по порядку окон (реквизиты из преамбулы);
+#   max      — наибольшее число (итоговая сумма больше сумм отдельных позиций);
+#   majority — значение, которое назвало большинство окон (при равенстве — более раннее).
+MERGE_RULES = ("first", "max", "majority")
+DEFAULT_MERGE_RULE = "first"
+
+
+def _filter_schema_properties(
+    schema: Dict[str, Any], keep: Callable[[str], bool]
+) -> Dict[str, Any]:
+    """Копия схемы только с полями, для которых ``keep`` вернул True.
+
+    Копируются лишь верхний уровень, ``properties`` и ``required``; описания
+    самих свойств разделяются с исходной схемой и не должны изменяться.
+    """
+    filtered = dict(schema)
+    properties = schema.get("properties")
+    if isinstance(properties, dict):
+        filtered["properties"] = {
+            field: meta for field, meta in properties.items() if keep(field)
+        }
+
+    required = schema.get("required")
+    if isinstance(required, list):
+        filtered["required"] = [field for field in required if keep(field)]
+
+    return filtered
+
 
 @dataclass(frozen=True)
 class DocumentSlice:
@@ -83,6 +112,7 @@ class FieldSettings:
         guidelines_path: str,
         prompts_dir: str,
         contexts_path: str | None = None,
+        merge_rules_path: str | None = None,
     ) -> None:
         self._extractors_path = Path(extractors_path)
         self._guidelines_path = Path(guidelines_path)
@@ -100,11 +130,52 @@ class FieldSettings:
         self._context_rules: Dict[str, DocumentSlice] = {}
         self._context_groups: list[LLMFieldGroup] = []
         self._load_context_rules()
+        self._merge_rules: Dict[str, str] = {}
+        if merge_rules_path and Path(merge_rules_path).exists():
+            with Path(merge_rules_path).open("r", encoding="utf-8") as fh:
+                self._apply_merge_rules(json.load(fh))
+
+    @classmethod
+    def from_data(
+        cls,
+        extractors: Dict[str, str],
+        general_guidelines: str = "",
+        field_prompts: Dict[str, str] | None = None,
+        contexts: Any = None,
+        merge_rules: Any = None,
+    ) -> "FieldSettings":
+        """Создаёт настройки из уже прочитанных данных (без обращения к файлам)."""
+        if not isinstance(extractors, dict):
+            raise ValueError("Field extractors configuration must be a JSON object")
+
+        settings = cls.__new__(cls)
+        settings._extractors_path = None
+        settings._guidelines_path = None
+        settings._prompts_dir = None
+        settings._contexts_path = None
+        settings._extractors = {str(field): str(method) for field, method in extractors.items()}
+        settings._general_guidelines_cache = general_guidelines
+        settings._field_prompts_cache = dict(field_prompts or {})
+        settings._context_rules = {}
+        settings._context_groups = []
+        if contexts is not None:
+            settings._apply_context_config(contexts)
+        settings._merge_rules = {}
+        if merge_rules is not None:
+            settings._apply_merge_rules(merge_rules)
+        return settings
 
     @property
     def extractors(self) -> Dict[str, str]:
         return self._extractors
 
+    @property
+    def merge_rules(self) -> Dict[str, str]:
+        return self._merge_rules
+
+    def get_merge_rule(self, field: str) -> str:
+        return self._merge_rules.get(field, DEFAULT_MERGE_RULE)
+
     def get_method(self, field: str) -> str:
         return self._extractors.get(field, "LLM")
 
@@ -150,7 +221,7 @@ class FieldSettings:
     def _load_general_guidelines(self) -> str:
         if self._general_guidelines_cache is not None:
             return self._general_guidelines_cache
-        if self._guidelines_path.exists():
+        if self._guidelines_path is not None and self._guidelines_path.exists():
             self._general_guidelines_cache = self._guidelines_path.read_text(encoding="utf-8")
         else:
             self._general_guidelines_cache = ""
@@ -161,7 +232,7 @@ class FieldSettings:
             return self._field_prompts_cache
 
         prompts: Dict[str, str] = {}
-        if self._prompts_dir.exists():
+        if self._prompts_dir is not None and self._prompts_dir.exists():
             for file in sorted(self._prompts_dir.glob("*.md")):
                 prompts[file.stem] = file.read_text(encoding="utf-8")
 
@@ -170,24 +241,15 @@ class FieldSettings:
 
     def refresh_prompts(self) -> None:
         """Сбрасывает кеш подсказок и перечитывает файлы."""
-        self._general_guidelines_cache = None
-        self._field_prompts_cache = None
+        # Подсказки, переданные через from_data, перечитывать неоткуда
+        if self._guidelines_path is not None:
+            self._general_guidelines_cache = None
+        if self._prompts_dir is not None:
+            self._field_prompts_cache = None
 
     def apply_to_schema(self, schema: Dict[str, Any]) -> Dict[str, Any]:
         """Возвращает копию схемы, очищенную от отключённых полей."""
-        from copy import deepcopy
-
-        filtered = deepcopy(schema)
-        properties = filtered.get("properties", {})
-        for field in list(properties.keys()):
-            if not self.is_enabled(field):
-                properties.pop(field, None)
-
-        required_fields = filtered.get("required")
-        if isinstance(required_fields, list):
-            filtered["required"] = [field for field in required_fields if self.is_enabled(field)]
-
-        return filtered
+        return _filter_schema_properties(schema, self.is_enabled)
 
     def filter_payload(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         return {key: value for key, value in payload.items() if self.is_enabled(key)}
@@ -199,6 +261,14 @@ class FieldSettings:
             if self.is_enabled(field) and method.lower() == "llm"
         )
 
+    def derived_fields(self) -> Iterable[str]:
+        """Поля, которые вычисляются из других полей (способ ``derived``)."""
+        return (
+            field
+            for field, method in self._extractors.items()
+            if method.lower() == "derived"
+        )
+
     def build_llm_groups(self) -> Sequence[LLMFieldGroup]:
         if self._context_groups:
             collected: list[LLMFieldGroup] = []
@@ -257,7 +327,11 @@ class FieldSettings:
 
         with self._contexts_path.open("r", encoding="utf-8") as fh:
             raw = json.load(fh)
+        self._apply_context_config(raw)
 
+    def _apply_context_config(self, raw: Any) -> None:
+        self._context_rules = {}
+        self._context_groups = []
         groups_data: Sequence[Dict[str, Any]] | None = None
         if isinstance(raw, dict) and "groups" in raw:
             maybe_groups = raw.get("groups", [])
@@ -305,18 +379,20 @@ class FieldSettings:
 
         self._context_rules = context_rules
 
-    def build_schema_subset(self, schema: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
-        from copy import deepcopy
+    def _apply_merge_rules(self, raw: Any) -> None:
+        if not isinstance(raw, dict):
+            raise ValueError("Merge rules configuration must be a JSON object")
+        rules: Dict[str, str] = {}
+        for field, rule in raw.items():
+            rule = str(rule).lower()
+            if rule not in MERGE_RULES:
+                raise ValueError(
+                    f"Invalid merge rule for field '{field}': {rule} "
+                    f"(expected one of {', '.join(MERGE_RULES)})"
+                )
+            rules[str(field)] = rule
+        self._merge_rules = rules
 
+    def build_schema_subset(self, schema: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
         allowed = set(fields)
-        subset = deepcopy(schema)
-        properties = subset.get("properties", {})
-        for field in list(properties.keys()):
-            if field not in allowed:
-                properties.pop(field, None)
-
-        required = subset.get("required")
-        if isinstance(required, list):
-            subset["required"] = [field for field in required if field in allowed]
-
-        return subset
+        return _filter_schema_properties(schema, allowed.__contains__)
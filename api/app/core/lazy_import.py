@@ -0,0 +1,46 @@
+"""Deferred imports of heavy third-party modules."""
+from __future__ import annotations
+
+import importlib
+import logging
+from types import ModuleType
+from typing import Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """Stands in for a module and imports it on the first attribute access.
+
+    ``httpx = LazyModule("httpx")`` keeps ``httpx.AsyncClient(...)`` and
+    ``except httpx.ReadTimeout`` working unchanged, while the import cost is
+    paid by the first call that needs it instead of by every process start.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def __getattr__(self, attribute: str) -> Any:
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attribute)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def preload(names: Iterable[str]) -> None:
+    """Imports ``names`` ahead of use (e.g. in a background thread after startup).
+
+    A module that fails to import is skipped: the call that needs it will
+    raise the error in its own context.
+    """
+
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            logger.warning("Module %s could not be preloaded", name, exc_info=True)
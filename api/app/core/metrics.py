@@ -0,0 +1,47 @@
+"""Process-local counters exposed by ``GET /metrics`` in Prometheus text format."""
+from __future__ import annotations
+
+import threading
+from typing import Dict
+
+# Описания счётчиков для HELP-строк; неописанные счётчики тоже выводятся.
+_DESCRIPTIONS: Dict[str, str] = {
+    "check_requests_total": "Requests to /check",
+    "extraction_runs_total": "Pipeline runs actually executed",
+    "extraction_coalesced_total": "Requests that awaited an identical in-flight extraction",
+    "llm_calls_total": "Calls to the LLM",
+    "llm_groups_reused_total": "LLM field groups reused from stored results",
+    "requests_cancelled_total": "Requests abandoned because the client disconnected",
+    "requests_deadline_exceeded_total": "Requests stopped by REQUEST_DEADLINE_SECONDS",
+    "ollama_calls_cancelled_total": "Ollama generations aborted by closing the stream",
+    "model_warmups_total": "Warm-up and keep-alive refresh requests sent to Ollama",
+    "model_warmup_failures_total": "Failed model checks or warm-up requests",
+    "gazetteer_fields_resolved_total": "Party fields filled from the counterparty registry",
+    "gazetteer_entries_learned_total": "Parties added to the registry from extraction results",
+}
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._counters: Dict[str, float] = {name: 0 for name in _DESCRIPTIONS}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._counters)
+
+    def render(self) -> str:
+        lines = []
+        for name, value in sorted(self.snapshot().items()):
+            if name in _DESCRIPTIONS:
+                lines.append(f"# HELP {name} {_DESCRIPTIONS[name]}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
@@ -0,0 +1,326 @@
+"""Request tracing with OpenTelemetry-compatible spans.
+
+A request to a traced endpoint opens a root span; pipeline stages and LLM
+calls become its children (the current span lives in a ``ContextVar``, so
+tasks started for parallel groups inherit their parent). Trace and span ids
+follow W3C Trace Context, and an incoming ``traceparent`` header continues
+the caller's trace.
+
+Finished traces are appended to ``TRACING_EXPORT_PATH`` as OTLP/JSON lines
+(one ``ExportTraceServiceRequest`` per trace), the format read by the
+OpenTelemetry Collector's ``otlpjsonfile`` receiver, so the file can be
+replayed into Jaeger, Tempo or any OTLP backend. Without an export path, or
+outside a root span, ``TRACER.span`` returns a shared no-op object.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from contextvars import ContextVar, Token
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Коды SpanKind и StatusCode из протокола OTLP
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+_STATUS_UNSET = 0
+_STATUS_ERROR = 2
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+_INVALID_TRACE_ID = "0" * 32
+_INVALID_SPAN_ID = "0" * 16
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None
+    ]
+
+
+class _Trace:
+    """Spans of one trace in this process, exported together when the local root ends."""
+
+    __slots__ = ("spans", "lock", "exported")
+
+    def __init__(self) -> None:
+        self.spans: List[Span] = []
+        self.lock = threading.Lock()
+        self.exported = False
+
+
+class Span:
+    recording = True
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_span_id: str,
+        kind: int,
+        attributes: Optional[Mapping[str, Any]],
+        trace: _Trace,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status_code = _STATUS_UNSET
+        self.status_message = ""
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns = 0
+        self._started = time.perf_counter_ns()
+        self._trace = trace
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Mapping[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def set_error(self, message: str) -> None:
+        self.status_code = _STATUS_ERROR
+        self.status_message = message
+
+    def end(self) -> None:
+        # Длительность по монотонным часам, начало — по часам реального времени
+        self.end_time_ns = self.start_time_ns + time.perf_counter_ns() - self._started
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span: Dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status_code},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class _NoopSpan:
+    recording = False
+    trace_id = ""
+    span_id = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Mapping[str, Any]) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+
+class _NoopContext:
+    def __enter__(self) -> _NoopSpan:
+        return _NOOP_SPAN
+
+    def __exit__(self, *exc_info: Any) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+_NOOP_CONTEXT = _NoopContext()
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class _SpanContext:
+    __slots__ = ("_tracer", "_span", "_token", "_root")
+
+    def __init__(self, tracer: "Tracer", span: Span, root: bool):
+        self._tracer = tracer
+        self._span = span
+        self._root = root
+        self._token: Optional[Token] = None
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type: Any, exc: Any, _: Any) -> bool:
+        span = self._span
+        if exc_type is not None:
+            span.set_error(f"{exc_type.__name__}: {exc}" if str(exc) else exc_type.__name__)
+            span.set_attribute("exception.type", exc_type.__name__)
+        span.end()
+        _current_span.reset(self._token)
+        self._tracer._finish(span, self._root)
+        return False
+
+
+class JsonlSpanExporter:
+    """Appends one OTLP/JSON ``ExportTraceServiceRequest`` line per trace.
+
+    The file is opened with ``O_APPEND`` and every trace is a single write, so
+    several uvicorn workers can share it.
+    """
+
+    def __init__(self, path: Path, service_name: str):
+        self.path = path
+        self._resource = {"attributes": _otlp_attributes({"service.name": service_name})}
+        self._fd: Optional[int] = None
+        self._lock = threading.Lock()
+        self._failed = False
+
+    def export(self, spans: Sequence[Span]) -> None:
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": self._resource,
+                    "scopeSpans": [
+                        {"scope": {"name": "contract-extractor"}, "spans": [span.to_otlp() for span in spans]}
+                    ],
+                }
+            ]
+        }
+        line = (json.dumps(payload, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            try:
+                if self._fd is None:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                os.write(self._fd, line)
+            except OSError as exc:
+                # Трассировка не должна ронять запросы; сообщаем один раз
+                if not self._failed:
+                    logger.warning("Trace export to %s failed: %s", self.path, exc)
+                    self._failed = True
+                return
+            self._failed = False
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple[str, str]]:
+    """``(trace_id, parent_span_id)`` из заголовка W3C ``traceparent`` или ``None``."""
+    if not header:
+        return None
+    match = _TRACEPARENT_RE.match(header.strip().lower())
+    if match is None or match.group(1) == _INVALID_TRACE_ID or match.group(2) == _INVALID_SPAN_ID:
+        return None
+    return match.group(1), match.group(2)
+
+
+class Tracer:
+    def __init__(self, exporter: Optional[JsonlSpanExporter] = None):
+        self._exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self._exporter is not None
+
+    def configure(self, exporter: Optional[JsonlSpanExporter]) -> None:
+        self._exporter = exporter
+
+    def start_trace(
+        self,
+        name: str,
+        attributes: Optional[Mapping[str, Any]] = None,
+        traceparent: Optional[str] = None,
+        kind: int = SPAN_KIND_SERVER,
+    ):
+        """Корневой спан запроса (или документа пакетной обработки)."""
+        if self._exporter is None:
+            return _NOOP_CONTEXT
+        remote = parse_traceparent(traceparent)
+        trace_id, parent_span_id = remote if remote else (secrets.token_hex(16), "")
+        return _SpanContext(self, Span(name, trace_id, parent_span_id, kind, attributes, _Trace()), root=True)
+
+    def span(self, name: str, attributes: Optional[Mapping[str, Any]] = None, kind: int = SPAN_KIND_INTERNAL):
+        """Дочерний спан текущего; вне трассы (или без экспорта) — пустышка."""
+        parent = _current_span.get()
+        if parent is None or self._exporter is None:
+            return _NOOP_CONTEXT
+        return _SpanContext(
+            self, Span(name, parent.trace_id, parent.span_id, kind, attributes, parent._trace), root=False
+        )
+
+    def current_trace_id(self) -> Optional[str]:
+        span = _current_span.get()
+        return span.trace_id if span is not None else None
+
+    def _finish(self, span: Span, root: bool) -> None:
+        trace = span._trace
+        with trace.lock:
+            if trace.exported:
+                # Спан завершился после корня (например, отменённая фоновая задача)
+                spans = [span]
+            else:
+                trace.spans.append(span)
+                if not root:
+                    return
+                spans, trace.spans = trace.spans, []
+                trace.exported = True
+        exporter = self._exporter
+        if exporter is not None:
+            exporter.export(spans)
+
+
+TRACER = Tracer(
+    JsonlSpanExporter(Path(CONFIG.tracing_export_path), CONFIG.app_name)
+    if CONFIG.tracing_export_path
+    else None
+)
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of requests to ``paths``.
+
+    It wraps the whole request, including reading and parsing the upload, so
+    the gap before the first child span shows time spent before the handler.
+    """
+
+    def __init__(self, app: Any, paths: Sequence[str]):
+        self.app = app
+        self._paths = frozenset(paths)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or scope["path"] not in self._paths:
+            await self.app(scope, receive, send)
+            return
+        traceparent = None
+        for name, value in scope.get("headers") or ():
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        attributes = {"http.request.method": scope["method"], "url.path": scope["path"]}
+        with TRACER.start_trace(f"{scope['method']} {scope['path']}", attributes, traceparent) as span:
+
+            async def send_with_status(message: Dict[str, Any]) -> None:
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    span.set_attribute("http.response.status_code", status)
+                    if status >= 500:
+                        span.set_error(f"HTTP {status}")
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
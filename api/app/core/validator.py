@@ -1,14 +1,184 @@
+from __future__ import annotations
+
+import hashlib
 import json
 import re
-from jsonschema import Draft202012Validator, ValidationError
-from typing import Any, Dict
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from jsonschema import ValidationError
+
+# Ключевые слова, которые быстрый валидатор умеет проверять (или может
+# безопасно игнорировать, как это делает Draft202012Validator без format_checker).
+_FLAT_ROOT_KEYS = {"$schema", "$id", "title", "description", "type", "properties", "required"}
+_FLAT_PROPERTY_KEYS = {"type", "enum", "format", "title", "description"}
+
+
+def _is_integer(value: Any) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return True
+    return isinstance(value, float) and value.is_integer()
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda value: isinstance(value, str),
+    "integer": _is_integer,
+    "number": _is_number,
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None,
+}
+
+
+def _enum_equal(left: Any, right: Any) -> bool:
+    # Как и jsonschema, не считаем True равным 1.
+    if isinstance(left, bool) or isinstance(right, bool):
+        return isinstance(left, bool) and isinstance(right, bool) and left == right
+    return left == right
+
+
+def schema_fingerprint(schema: Dict[str, Any]) -> str:
+    """Стабильный отпечаток схемы для кеширования валидаторов."""
+    payload = json.dumps(schema, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class _PropertyRule:
+    name: str
+    # Ключевые слова в порядке их объявления в схеме: ("type", "string") или ("enum", [...]).
+    checks: Tuple[Tuple[str, Any], ...]
+
+
+class _FlatSchemaValidator:
+    """Скомпилированная проверка плоской схемы: объект из свойств примитивных типов.
+
+    Возвращает те же ошибки (path, message, validator), что и Draft202012Validator.
+    """
+
+    def __init__(self, rules: Tuple[_PropertyRule, ...], required: Tuple[str, ...], root_keys: Tuple[str, ...]):
+        self._rules = rules
+        self._required = required
+        self._root_keys = root_keys
+
+    @staticmethod
+    def compile(schema: Dict[str, Any]) -> Optional["_FlatSchemaValidator"]:
+        if not isinstance(schema, dict) or set(schema) - _FLAT_ROOT_KEYS:
+            return None
+        if schema.get("type", "object") != "object":
+            return None
+        properties = schema.get("properties", {})
+        required = schema.get("required", [])
+        if not isinstance(properties, dict) or not isinstance(required, list):
+            return None
+        if not all(isinstance(name, str) for name in required):
+            return None
+
+        rules: List[_PropertyRule] = []
+        for name, meta in properties.items():
+            if not isinstance(meta, dict) or set(meta) - _FLAT_PROPERTY_KEYS:
+                return None
+            checks: List[Tuple[str, Any]] = []
+            for key, value in meta.items():
+                if key == "type":
+                    # Объединение типов (["string", "null"]) и прочее — дело jsonschema
+                    if not isinstance(value, str) or value not in _TYPE_CHECKS:
+                        return None
+                    checks.append(("type", value))
+                elif key == "enum":
+                    if not isinstance(value, list):
+                        return None
+                    checks.append(("enum", value))
+            rules.append(_PropertyRule(name=name, checks=tuple(checks)))
+
+        root_keys = tuple(key for key in schema if key in {"type", "properties", "required"})
+        return _FlatSchemaValidator(tuple(rules), tuple(required), root_keys)
+
+    def errors(self, data: Any) -> List[Dict[str, Any]]:
+        if not isinstance(data, dict):
+            if "type" in self._root_keys:
+                return [
+                    {
+                        "path": [],
+                        "title": "type",
+                        "message": f"{data!r} is not of type 'object'",
+                        "validator": "type",
+                    }
+                ]
+            return []
+
+        collected: List[Tuple[List[Any], Dict[str, Any]]] = []
+        for key in self._root_keys:
+            if key == "properties":
+                for rule in self._rules:
+                    if rule.name not in data:
+                        continue
+                    value = data[rule.name]
+                    for keyword, expected in rule.checks:
+                        if keyword == "type":
+                            if _TYPE_CHECKS[expected](value):
+                                continue
+                            message = f"{value!r} is not of type {expected!r}"
+                        else:
+                            if any(_enum_equal(item, value) for item in expected):
+                                continue
+                            message = f"{value!r} is not one of {expected!r}"
+                        collected.append(
+                            (
+                                [rule.name],
+                                {
+                                    "path": [rule.name],
+                                    "title": rule.name,
+                                    "message": message,
+                                    "validator": keyword,
+                                },
+                            )
+                        )
+            elif key == "required":
+                for name in self._required:
+                    if name not in data:
+                        collected.append(
+                            (
+                                [],
+                                {
+                                    "path": [],
+                                    "title": name,
+                                    "message": f"{name!r} is a required property",
+                                    "validator": "required",
+                                },
+                            )
+                        )
+
+        collected.sort(key=lambda item: item[0])
+        return [error for _, error in collected]
+
 
 class SchemaValidator:
     def __init__(self, schema: Dict[str, Any]):
         self.schema = schema
-        self.validator = Draft202012Validator(schema)
+        self._fast = _FlatSchemaValidator.compile(schema)
+        self.validator = None
+        if self._fast is None:
+            # jsonschema нужен только схемам, которые не умеет быстрый валидатор
+            from jsonschema import Draft202012Validator
+
+            self.validator = Draft202012Validator(schema)
+
+    @property
+    def is_fast_path(self) -> bool:
+        return self._fast is not None
 
     def validate(self, data: Dict[str, Any]):
+        if self._fast is not None:
+            return self._fast.errors(data)
+
         errors = sorted(self.validator.iter_errors(data), key=lambda e: e.path)
         return [
             {
@@ -37,3 +207,22 @@ class SchemaValidator:
 
     def get_schema(self) -> Dict[str, Any]:
         return self.schema
+
+
+_VALIDATOR_CACHE: "OrderedDict[str, SchemaValidator]" = OrderedDict()
+_VALIDATOR_CACHE_SIZE = 256
+
+
+def get_validator(schema: Dict[str, Any]) -> SchemaValidator:
+    """Возвращает валидатор для схемы, переиспользуя уже собранные по отпечатку схемы."""
+    key = schema_fingerprint(schema)
+    validator = _VALIDATOR_CACHE.get(key)
+    if validator is not None:
+        _VALIDATOR_CACHE.move_to_end(key)
+        return validator
+
+    validator = SchemaValidator(schema)
+    _VALIDATOR_CACHE[key] = validator
+    if len(_VALIDATOR_CACHE) > _VALIDATOR_CACHE_SIZE:
+        _VALIDATOR_CACHE.popitem(last=False)
+    return validator
@@ -1,18 +1,30 @@
+import asyncio
 import json
 import logging
+import time
+from contextlib import asynccontextmanager, suppress
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 
-from fastapi import FastAPI, UploadFile, File, Body, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Body, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from .core.config import CONFIG
-from .core.schema import load_schema
+from .core.metrics import METRICS
+from .core.config_store import ConfigLayer, LayeredConfigStore
+from .core.lazy_import import preload
+from .core.tracing import TRACER, TracingMiddleware
 from .core.field_settings import FieldSettings
+from .services.evaluation import EvaluationSample, evaluate_corpus
 from .services.extractor.pipeline import ExtractionPipeline
 from .services.warnings import to_payload
 from .services.utils import read_text_from_upload
-from .services.ollama_client import OllamaServiceError
+from .services.config_snapshot import ConfigSnapshotManager
+from .services.profiles import DEFAULT_PROFILE, ProfileRegistry, UnknownProfileError
+from .services.ollama_client import OllamaClient, OllamaServiceError
+from .services.result_store import create_result_store
+from .services.gazetteer import CounterpartyGazetteer
+from .services.warmup import ModelWarmer
 
 APP_DIR = Path(__file__).resolve().parent
 SCHEMA_PATH = APP_DIR / "assets" / "schema.json"
@@ -24,38 +36,260 @@ SUMMARY_USER_TMPL_PATH = APP_DIR / "prompts" / "summary_user_template.txt"
 FIELD_PROMPTS_DIR = APP_DIR / "prompts" / "fields"
 FIELD_EXTRACTORS_PATH = APP_DIR / "assets" / "field_extractors.json"
 FIELD_CONTEXTS_PATH = APP_DIR / "assets" / "field_contexts.json"
+FIELD_MERGE_RULES_PATH = APP_DIR / "assets" / "field_merge_rules.json"
+COUNTERPARTIES_PATH = APP_DIR / "assets" / "counterparties.json"
 USER_ASSETS_DIR = APP_DIR / "assets" / "users_assets"
 USER_FIELD_EXTRACTORS_PATH = USER_ASSETS_DIR / "field_extractors.json"
 USER_SCHEMA_PATH = USER_ASSETS_DIR / "schema.json"
 USER_FIELD_CONTEXTS_PATH = USER_ASSETS_DIR / "contexts.json"
+USER_FIELD_MERGE_RULES_PATH = USER_ASSETS_DIR / "merge_rules.json"
 USER_PROMPTS_DIR = APP_DIR / "prompts" / "user_prompts"
 USER_FIELD_GUIDELINES_PATH = USER_PROMPTS_DIR / "field_guidelines.md"
 USER_SYSTEM_PROMPT_PATH = USER_PROMPTS_DIR / "system.txt"
 USER_USER_TMPL_PATH = USER_PROMPTS_DIR / "user_template.txt"
 USER_SUMMARY_SYSTEM_PROMPT_PATH = USER_PROMPTS_DIR / "summary_system.txt"
 USER_SUMMARY_USER_TMPL_PATH = USER_PROMPTS_DIR / "summary_user_template.txt"
-raw_schema = load_schema(str(SCHEMA_PATH))
-field_settings = FieldSettings(
-    str(FIELD_EXTRACTORS_PATH),
-    str(FIELD_GUIDELINES_PATH),
-    str(FIELD_PROMPTS_DIR),
-    str(FIELD_CONTEXTS_PATH),
+USER_FIELD_PROMPTS_DIR = USER_PROMPTS_DIR / "fields"
+PROFILES_DIR = APP_DIR / "assets" / "profiles"
+# Тяжёлые модули импортируются лениво; после старта их подгружает фоновый поток,
+# чтобы импорт не достался первому запросу.
+PRELOADED_MODULES = ("httpx", "docx")
+# Базовые файлы, поверх которых накладываются пользовательские переопределения.
+BASE_CONFIG_LAYERS = (
+    ConfigLayer(
+        "default",
+        assets={
+            "extractors": FIELD_EXTRACTORS_PATH,
+            "schema": SCHEMA_PATH,
+            "contexts": FIELD_CONTEXTS_PATH,
+            "merge_rules": FIELD_MERGE_RULES_PATH,
+        },
+        prompts={
+            "field_guidelines": FIELD_GUIDELINES_PATH,
+            "summary_system": SUMMARY_SYSTEM_PROMPT_PATH,
+            "summary_user_template": SUMMARY_USER_TMPL_PATH,
+            "system": SYSTEM_PROMPT_PATH,
+            "user_template": USER_TMPL_PATH,
+        },
+        field_prompts_dir=FIELD_PROMPTS_DIR,
+    ),
+    ConfigLayer(
+        "user",
+        assets={
+            "extractors": USER_FIELD_EXTRACTORS_PATH,
+            "schema": USER_SCHEMA_PATH,
+            "contexts": USER_FIELD_CONTEXTS_PATH,
+            "merge_rules": USER_FIELD_MERGE_RULES_PATH,
+        },
+        prompts={
+            "field_guidelines": USER_FIELD_GUIDELINES_PATH,
+            "summary_system": USER_SUMMARY_SYSTEM_PROMPT_PATH,
+            "summary_user_template": USER_SUMMARY_USER_TMPL_PATH,
+            "system": USER_SYSTEM_PROMPT_PATH,
+            "user_template": USER_USER_TMPL_PATH,
+        },
+        field_prompts_dir=USER_FIELD_PROMPTS_DIR,
+    ),
 )
-pipeline = ExtractionPipeline(
-    raw_schema,
-    str(SYSTEM_PROMPT_PATH),
-    str(USER_TMPL_PATH),
-    field_settings,
-    str(FIELD_GUIDELINES_PATH),
-    str(SUMMARY_SYSTEM_PROMPT_PATH),
-    str(SUMMARY_USER_TMPL_PATH),
+config_store = LayeredConfigStore(BASE_CONFIG_LAYERS)
+result_store = create_result_store(CONFIG.state_db_path, CONFIG.result_store_size)
+gazetteer = CounterpartyGazetteer(
+    COUNTERPARTIES_PATH,
+    Path(CONFIG.counterparties_learned_path) if CONFIG.counterparties_learned_path else None,
+    CONFIG.gazetteer_min_confidence,
 )
-app = FastAPI(title="Contract Extractor API", version=CONFIG.version)
 
 
-async def _process_text_payload(text: str):
+# Общие для всех профилей ресурсы: пул соединений с Ollama, хранилище результатов и реестр сторон
+ollama_client = OllamaClient()
+warmer = ModelWarmer(ollama_client, enabled=CONFIG.use_llm and CONFIG.model_warmup)
+
+
+def build_pipeline(
+    client: Optional[OllamaClient] = None,
+    store: Optional[LayeredConfigStore] = None,
+    profile: str = DEFAULT_PROFILE,
+) -> ExtractionPipeline:
+    """Собирает пайплайн из текущей конфигурации (базовые файлы + переопределения)."""
+    store = store or config_store
+    resolved = store.resolve()
+    field_settings = FieldSettings.from_data(
+        resolved.extractors,
+        resolved.prompts.get("field_guidelines", ""),
+        resolved.field_prompts,
+        resolved.contexts,
+        resolved.merge_rules,
+    )
+    pipeline = ExtractionPipeline(
+        resolved.schema,
+        None,
+        None,
+        field_settings,
+        client=client or ollama_client,
+        result_store=result_store,
+        prompts=resolved.prompts,
+        gazetteer=gazetteer,
+        llm_groups=resolved.llm_groups,
+        # Результаты профиля по умолчанию хранятся под прежними идентификаторами
+        profile=None if profile == DEFAULT_PROFILE else profile,
+    )
+    store.save_snapshot(resolved, pipeline.llm_groups)
+    return pipeline
+
+
+profiles = ProfileRegistry(
+    PROFILES_DIR,
+    BASE_CONFIG_LAYERS,
+    lambda store, profile_id: build_pipeline(store=store, profile=profile_id),
+    override_layer=config_store.override_layer.name,
+    snapshot_dir=Path(CONFIG.asset_snapshot_dir) if CONFIG.asset_snapshot_dir else None,
+)
+snapshots = profiles.default
+# Записи переопределений и пересборка снимка выполняются по одной: внутри процесса —
+# под asyncio.Lock, между воркерами — под блокировкой файла рядом со слоем переопределений
+_config_write_lock = asyncio.Lock()
+_config_file_lock = config_store.override_lock()
+
+
+async def _apply_overrides(kind: str, changes: Dict[str, str]) -> str:
+    """Записывает переопределения и сразу собирает новый снимок конфигурации.
+
+    Если с новыми файлами пайплайн не собирается, прежнее содержимое файлов
+    возвращается на место, а клиент получает 400 с текстом ошибки.
+    """
+
+    async with _config_write_lock:
+        acquiring = asyncio.ensure_future(asyncio.to_thread(_config_file_lock.acquire))
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # Поток всё равно возьмёт блокировку — отпускаем её сразу за ним
+            acquiring.add_done_callback(lambda _: _config_file_lock.release())
+            raise
+        try:
+            # Прежнее содержимое читается с диска под блокировкой, поэтому откат
+            # возвращает то, что записал последний воркер, а не состояние этого процесса
+            previous: Dict[str, Optional[str]] = {}
+            for key, content in changes.items():
+                previous[key] = await config_store.write_override(kind, key, content)
+            # Пользовательский слой общий для всех профилей — пересобираем каждый
+            reloaded = await asyncio.to_thread(profiles.refresh, True)
+            managers = profiles.managers()
+            failed = [profile_id for profile_id, ok in reloaded.items() if not ok]
+            if failed:
+                error = "; ".join(f"{profile_id}: {managers[profile_id].last_error}" for profile_id in failed)
+                for key, content in previous.items():
+                    await config_store.restore_override(kind, key, content)
+                await asyncio.to_thread(profiles.refresh, True)
+                raise HTTPException(status_code=400, detail=f"Configuration was not applied: {error}")
+            return snapshots.current.version
+        finally:
+            _config_file_lock.release()
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    if CONFIG.workers > 1 and not CONFIG.state_db_path:
+        logging.warning(
+            "UVICORN_WORKERS=%s without STATE_DB_PATH: every worker keeps its own result store",
+            CONFIG.workers,
+        )
+    watchers = [asyncio.create_task(asyncio.to_thread(preload, PRELOADED_MODULES))]
+    if warmer.enabled:
+        watchers.append(asyncio.create_task(warmer.run()))
+    if CONFIG.asset_reload_interval > 0:
+        watchers.append(asyncio.create_task(profiles.watch(CONFIG.asset_reload_interval)))
+        watchers.append(asyncio.create_task(gazetteer.watch(CONFIG.asset_reload_interval)))
+    try:
+        yield
+    finally:
+        for watcher in watchers:
+            watcher.cancel()
+            with suppress(asyncio.CancelledError):
+                await watcher
+        await ollama_client.aclose()
+
+
+app = FastAPI(title="Contract Extractor API", version=CONFIG.version, lifespan=lifespan)
+if TRACER.enabled:
+    # Без TRACING_EXPORT_PATH промежуточный слой не ставится вовсе
+    app.add_middleware(TracingMiddleware, paths=("/check", "/evaluate"))
+
+
+def _profile_snapshots(profile: Optional[str]) -> ConfigSnapshotManager:
+    try:
+        return profiles.get(profile)
+    except UnknownProfileError as exc:
+        raise HTTPException(status_code=404, detail=f"Unknown profile '{profile}'") from exc
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(CONFIG.disconnect_poll_interval)
+
+
+async def _run_cancellable(coroutine, request: Optional[Request]):
+    """Выполняет обработку, пока клиент на связи и не истёк REQUEST_DEADLINE_SECONDS.
+
+    Иначе задача отменяется: отменяются ещё не отправленные группы, а потоковые
+    соединения с Ollama закрываются, и генерация прекращается.
+    """
+
+    task = asyncio.ensure_future(coroutine)
+    waiters = {task}
+    watcher = None
+    if request is not None:
+        watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+        waiters.add(watcher)
+    deadline = CONFIG.request_deadline_seconds if CONFIG.request_deadline_seconds > 0 else None
+    try:
+        done, _ = await asyncio.wait(waiters, timeout=deadline, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+
+    if task in done:
+        return task.result()
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    if watcher is not None and watcher in done:
+        METRICS.increment("requests_cancelled_total")
+        # 499 (client closed request): ответ уже некому читать
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    METRICS.increment("requests_deadline_exceeded_total")
+    raise HTTPException(
+        status_code=504,
+        detail=f"Processing exceeded REQUEST_DEADLINE_SECONDS={CONFIG.request_deadline_seconds}",
+    )
+
+
+async def _process_text_payload(
+    text: str,
+    read_ms: float | None = None,
+    previous_result_id: Optional[str] = None,
+    previous_text: Optional[str] = None,
+    profile: Optional[str] = None,
+    request: Optional[Request] = None,
+):
+    METRICS.increment("check_requests_total")
+    warmer.touch()
+    # Снимок берётся один раз: перезагрузка конфигурации не затронет этот запрос
+    snapshot = _profile_snapshots(profile).current
     try:
-        data, warns, errors, debug, ext_prompt = await pipeline.run(text)
+        data, warns, errors, debug, ext_prompt = await _run_cancellable(
+            snapshot.pipeline.run(
+                text,
+                previous_result_id=previous_result_id,
+                previous_text=previous_text,
+            ),
+            request,
+        )
+    except HTTPException:
+        raise
     except OllamaServiceError as exc:
         logging.exception("Ollama service error during text processing")
         raise HTTPException(status_code=502, detail=str(exc)) from exc
@@ -63,7 +297,16 @@ async def _process_text_payload(text: str):
         logging.exception("Unhandled error during text processing")
         raise HTTPException(status_code=500, detail="Internal processing error") from exc
 
+    if read_ms is not None:
+        debug.setdefault("timings", {})["read_upload_ms"] = read_ms
+    debug["config_version"] = snapshot.version
+    debug["profile"] = profile or DEFAULT_PROFILE
+    trace_id = TRACER.current_trace_id()
+    if trace_id:
+        debug["trace_id"] = trace_id
+
     response_content = {
+        "result_id": debug.get("result_id", ""),
         "ext_prompt": ext_prompt or "",
         "data": data,
         "warnings": to_payload(warns),
@@ -101,17 +344,60 @@ async def healthz():
     return {"status": "ok"}
 
 
+@app.get("/readyz")
+async def readyz():
+    # Балансировщику: 503, пока модель не загружена в Ollama
+    status = warmer.status()
+    return JSONResponse(status, status_code=200 if warmer.ready else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Счётчики процесса: при нескольких воркерах каждый отдаёт свои
+    return METRICS.render()
+
+
+@app.post("/assets/reload")
+async def reload_assets(force: bool = False):
+    reloaded = await asyncio.to_thread(profiles.refresh, force)
+    counterparties_reloaded = await asyncio.to_thread(gazetteer.reload_if_changed, force)
+    return {
+        "reloaded": reloaded.get(DEFAULT_PROFILE, False),
+        "version": snapshots.current.version,
+        "error": snapshots.last_error,
+        "counterparties": {"reloaded": counterparties_reloaded, "entries": len(gazetteer)},
+        "profiles": {
+            profile_id: {
+                "reloaded": reloaded.get(profile_id, False),
+                "version": manager.current.version,
+                "error": manager.last_error,
+            }
+            for profile_id, manager in profiles.managers().items()
+        },
+    }
+
+
+@app.get("/profiles")
+async def list_profiles():
+    return {
+        profile_id: {"version": manager.current.version}
+        for profile_id, manager in profiles.managers().items()
+    }
+
+
 @app.get("/assets/fields")
 async def get_fields(q: str = "", f: str = "extractors"):
     default_files = {
         "extractors": FIELD_EXTRACTORS_PATH,
         "schema": SCHEMA_PATH,
         "contexts": FIELD_CONTEXTS_PATH,
+        "merge_rules": FIELD_MERGE_RULES_PATH,
     }
     user_files = {
         "extractors": USER_FIELD_EXTRACTORS_PATH,
         "schema": USER_SCHEMA_PATH,
         "contexts": USER_FIELD_CONTEXTS_PATH,
+        "merge_rules": USER_FIELD_MERGE_RULES_PATH,
     }
 
     if q == "get":
@@ -133,6 +419,7 @@ async def change_fields(payload: Dict[str, Any] = Body(...), f: Optional[str] =
         "extractors": USER_FIELD_EXTRACTORS_PATH,
         "schema": USER_SCHEMA_PATH,
         "contexts": USER_FIELD_CONTEXTS_PATH,
+        "merge_rules": USER_FIELD_MERGE_RULES_PATH,
     }
 
     if not f:
@@ -141,15 +428,13 @@ async def change_fields(payload: Dict[str, Any] = Body(...), f: Optional[str] =
     if f not in user_files:
         raise HTTPException(status_code=400, detail="Invalid query parameter for 'f'")
 
-    USER_ASSETS_DIR.mkdir(parents=True, exist_ok=True)
-
     try:
-        with user_files[f].open("w", encoding="utf-8") as file:
-            json.dump(payload, file, ensure_ascii=False, indent=2)
+        content = json.dumps(payload, ensure_ascii=False, indent=2)
     except TypeError as exc:
         raise HTTPException(status_code=400, detail="Payload is not JSON serializable") from exc
 
-    return {"status": "ok"}
+    version = await _apply_overrides("asset", {f: content})
+    return {"status": "ok", "config_version": version}
 
 
 @app.get("/prompts/system")
@@ -209,28 +494,83 @@ async def change_prompts(payload: Dict[str, Any] = Body(...)):
             detail=f"Invalid payload keys: {', '.join(sorted(set(invalid_keys)))}",
         )
 
-    USER_PROMPTS_DIR.mkdir(parents=True, exist_ok=True)
-
     for key, value in payload.items():
         if not isinstance(value, str):
             raise HTTPException(status_code=400, detail=f"Value for '{key}' must be a string")
-        with user_files[key].open("w", encoding="utf-8") as file:
-            file.write(value)
 
-    return {"status": "ok"}
+    version = await _apply_overrides("prompt", payload)
+    return {"status": "ok", "config_version": version}
 
 @app.post("/check")
-async def check(file: UploadFile = File(None), payload: Optional[Dict[str, Any]] = Body(None)):
+async def check(
+    request: Request,
+    file: UploadFile = File(None),
+    previous_file: UploadFile = File(None),
+    previous_result_id: Optional[str] = Query(None),
+    profile: Optional[str] = Query(None),
+    payload: Optional[Dict[str, Any]] = Body(None),
+):
     # Accept either multipart file or JSON body {"text": "..."}
+    # Для повторной проверки правленой версии можно передать result_id прошлого
+    # ответа (или прошлую версию файлом previous_file / полем previous_text).
     if file is None and not payload:
         raise HTTPException(status_code=400, detail="Provide a text file or JSON body with {'text': '...'}")
 
+    read_ms = None
     if file is not None:
-        text = await read_text_from_upload(file)
+        started = time.perf_counter()
+        with TRACER.span("read_text_from_upload", {"file.name": file.filename}) as span:
+            text = await read_text_from_upload(file)
+            span.set_attribute("document.chars", len(text))
+        read_ms = round((time.perf_counter() - started) * 1000, 3)
     else:
         text = payload.get("text", "") if isinstance(payload, dict) else ""
 
     if not text.strip():
         raise HTTPException(status_code=400, detail="Empty text")
 
-    return await _process_text_payload(text)
+    previous_text = None
+    if previous_file is not None:
+        previous_text = await read_text_from_upload(previous_file)
+    elif isinstance(payload, dict):
+        previous_result_id = previous_result_id or payload.get("previous_result_id")
+        previous_text = payload.get("previous_text")
+        profile = profile or payload.get("profile")
+
+    return await _process_text_payload(
+        text, read_ms, previous_result_id, previous_text, profile, request
+    )
+
+
+@app.post("/evaluate")
+async def evaluate(request: Request, payload: Dict[str, Any] = Body(...)):
+    # {"samples": [{"name": "...", "text": "...", "expected": {...}}], "concurrency": 2, "fields": [...], "profile": "..."}
+    raw_samples = payload.get("samples")
+    if not isinstance(raw_samples, list) or not raw_samples:
+        raise HTTPException(status_code=400, detail="Provide a non-empty 'samples' list")
+
+    samples: List[EvaluationSample] = []
+    for index, item in enumerate(raw_samples):
+        if not isinstance(item, dict):
+            raise HTTPException(status_code=400, detail=f"Sample #{index} must be an object")
+        text = item.get("text")
+        expected = item.get("expected")
+        if not isinstance(text, str) or not text.strip():
+            raise HTTPException(status_code=400, detail=f"Sample #{index} has empty 'text'")
+        if not isinstance(expected, dict):
+            raise HTTPException(status_code=400, detail=f"Sample #{index} must have an 'expected' object")
+        samples.append(EvaluationSample(name=str(item.get("name") or index), text=text, expected=expected))
+
+    fields = payload.get("fields")
+    if fields is not None and not (isinstance(fields, list) and all(isinstance(f, str) for f in fields)):
+        raise HTTPException(status_code=400, detail="'fields' must be a list of field names")
+
+    try:
+        concurrency = int(payload.get("concurrency", 1))
+    except (TypeError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail="'concurrency' must be an integer") from exc
+
+    snapshot = _profile_snapshots(payload.get("profile")).current
+    return await _run_cancellable(
+        evaluate_corpus(snapshot.pipeline, samples, concurrency=concurrency, fields=fields), request
+    )
@@ -0,0 +1,244 @@
+"""Resumable bulk extraction over a directory or a manifest of documents.
+
+Decoding (DOCX) and text cleanup run in a process pool; the pipeline itself
+runs in the event loop with a bounded number of documents in the LLM stage.
+Results are appended to a JSONL file. After every document a small checkpoint
+records the byte offset of the last complete line, so an interrupted run
+truncates any partial line and skips the documents already written.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from ..core.config_store import atomic_write_text
+from ..core.tracing import SPAN_KIND_INTERNAL, TRACER
+from .extractor.pipeline import ExtractionPipeline, PreparedDocument, prepare_document
+from .utils import read_text_from_path
+from .warnings import to_payload
+
+DOCUMENT_SUFFIXES = (".txt", ".docx")
+CHECKPOINT_SUFFIX = ".checkpoint"
+
+
+@dataclass(frozen=True)
+class BulkDocument:
+    id: str
+    path: Path
+
+
+@dataclass
+class BulkProgress:
+    total: int = 0
+    skipped: int = 0
+    processed: int = 0
+    failed: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "skipped": self.skipped,
+            "processed": self.processed,
+            "failed": self.failed,
+            "elapsed_s": round(time.perf_counter() - self.started, 1),
+        }
+
+
+def collect_documents(directory: Optional[Path] = None, manifest: Optional[Path] = None) -> List[BulkDocument]:
+    """Documents from a directory (recursively) and/or a manifest.
+
+    A manifest line is either a path or a JSON object with ``path`` and an
+    optional ``id``; relative paths are resolved against the manifest's
+    directory. The id defaults to the path relative to its root. Of several
+    documents with the same id only the first one is kept.
+    """
+
+    documents: List[BulkDocument] = []
+    seen: Set[str] = set()
+
+    def add(document: BulkDocument) -> None:
+        if document.id not in seen:
+            seen.add(document.id)
+            documents.append(document)
+
+    if directory is not None:
+        for path in sorted(directory.rglob("*")):
+            if path.is_file() and path.suffix.lower() in DOCUMENT_SUFFIXES:
+                add(BulkDocument(path.relative_to(directory).as_posix(), path))
+    if manifest is not None:
+        for line in manifest.read_text(encoding="utf-8-sig").splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = json.loads(line) if line.startswith("{") else {"path": line}
+            path = Path(entry["path"])
+            if not path.is_absolute():
+                path = manifest.parent / path
+            add(BulkDocument(str(entry.get("id") or entry["path"]), path))
+    return documents
+
+
+def _prepare_file(path: str) -> PreparedDocument:
+    """Runs in a pool worker: decode the file and clean its text."""
+    return prepare_document(read_text_from_path(path))
+
+
+class _ResultWriter:
+    """Appends JSONL records and keeps the checkpoint in step with the file.
+
+    ``write`` blocks on fsync, so it is called through ``asyncio.to_thread``;
+    the lock keeps records and checkpoints from concurrent calls in order.
+    """
+
+    def __init__(self, output: Path, checkpoint: Path):
+        self._checkpoint = checkpoint
+        self._file = open(output, "ab")
+        self._processed = 0
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line.encode("utf-8"))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._processed += 1
+            atomic_write_text(
+                self._checkpoint,
+                json.dumps({"offset": self._file.tell(), "written": self._processed}),
+            )
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _drop_failed(output: Path, checkpoint: Path) -> None:
+    """Rewrites ``output`` without records with an error, so a retry leaves one record per id.
+
+    The filtered copy replaces the file atomically before the checkpoint is
+    moved; after a crash in between the old offset is clamped to the new size.
+    """
+
+    kept: List[bytes] = []
+    with open(output, "rb") as handle:
+        for line in handle:
+            if not json.loads(line).get("error"):
+                kept.append(line)
+    temporary = output.with_name(output.name + ".tmp")
+    with open(temporary, "wb") as handle:
+        handle.writelines(kept)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, output)
+    atomic_write_text(checkpoint, json.dumps({"offset": output.stat().st_size, "written": len(kept)}))
+
+
+def resume_state(output: Path, checkpoint: Path, retry_failed: bool = False) -> Set[str]:
+    """Ids already written to ``output``; the file is cut back to the checkpoint offset.
+
+    A non-empty output without a checkpoint was not written by this command
+    (or the checkpoint was removed) and is refused rather than overwritten.
+    With ``retry_failed`` the failed records are removed from the file first.
+    """
+
+    offset = 0
+    if checkpoint.exists() and output.exists():
+        offset = min(int(json.loads(checkpoint.read_text(encoding="utf-8"))["offset"]), output.stat().st_size)
+    elif output.exists() and output.stat().st_size:
+        raise FileExistsError(f"{output} exists but has no {checkpoint.name}; choose another output file")
+    with open(output, "ab") as handle:
+        handle.truncate(offset)
+    if retry_failed and offset:
+        _drop_failed(output, checkpoint)
+    done: Set[str] = set()
+    with open(output, "rb") as handle:
+        for line in handle:
+            done.add(json.loads(line)["id"])
+    return done
+
+
+async def run_bulk(
+    pipeline: ExtractionPipeline,
+    documents: Iterable[BulkDocument],
+    output: Path,
+    *,
+    workers: int = 1,
+    concurrency: int = 1,
+    reuse_results: bool = True,
+    retry_failed: bool = False,
+    on_progress: Optional[Callable[[BulkProgress], None]] = None,
+) -> BulkProgress:
+    """Process ``documents`` and append one JSONL record per document to ``output``.
+
+    At most ``concurrency`` documents are in the LLM stage at a time (each
+    sending up to ``LLM_GROUP_CONCURRENCY`` calls); at most ``workers`` more
+    are decoded ahead of them, so memory stays bounded for any corpus size.
+    """
+
+    checkpoint = output.with_name(output.name + CHECKPOINT_SUFFIX)
+    done = resume_state(output, checkpoint, retry_failed)
+    documents = list(documents)
+    pending = [document for document in documents if document.id not in done]
+    # Считаем по документам прогона: записи о документах вне его в счёт не идут
+    progress = BulkProgress(total=len(documents), skipped=len(documents) - len(pending))
+
+    loop = asyncio.get_running_loop()
+    in_llm = asyncio.Semaphore(max(concurrency, 1))
+    in_flight = asyncio.Semaphore(max(concurrency, 1) + max(workers, 1))
+    writer = _ResultWriter(output, checkpoint)
+    # spawn: пул не наследует потоки и открытые соединения event loop
+    context = multiprocessing.get_context("spawn")
+
+    async def process(document: BulkDocument, pool: ProcessPoolExecutor) -> None:
+        record: Dict[str, Any] = {"id": document.id, "path": str(document.path)}
+        attributes = {"document.id": document.id, "document.path": str(document.path)}
+        with TRACER.start_trace("bulk.document", attributes, kind=SPAN_KIND_INTERNAL) as span:
+            try:
+                with TRACER.span("prepare_document"):
+                    prepared = await loop.run_in_executor(pool, _prepare_file, str(document.path))
+                async with in_llm:
+                    data, warnings, errors, debug, _ = await pipeline.run_prepared(
+                        prepared, reuse_results=reuse_results
+                    )
+                record.update(
+                    result_id=debug.get("result_id"),
+                    data=data,
+                    warnings=to_payload(warnings),
+                    validation_errors=errors,
+                    total_ms=debug.get("timings", {}).get("total_ms"),
+                )
+            except Exception as exc:  # один документ не должен останавливать весь прогон
+                record["error"] = f"{type(exc).__name__}: {exc}"
+                span.set_error(record["error"])
+                progress.failed += 1
+            finally:
+                in_flight.release()
+            if span.recording:
+                record["trace_id"] = span.trace_id
+        await asyncio.to_thread(writer.write, record)
+        progress.processed += 1
+        if on_progress is not None:
+            on_progress(progress)
+
+    try:
+        with ProcessPoolExecutor(max(workers, 1), mp_context=context) as pool:
+            tasks: Set[asyncio.Task] = set()
+            for document in pending:
+                await in_flight.acquire()
+                task = asyncio.create_task(process(document, pool))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+    finally:
+        writer.close()
+    return progress
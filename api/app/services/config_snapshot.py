@@ -0,0 +1,101 @@
+"""Versioned, atomically swapped snapshots of the compiled extraction pipeline."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+from ..core.config_store import assets_fingerprint, content_fingerprint
+from .extractor.pipeline import ExtractionPipeline
+
+logger = logging.getLogger(__name__)
+
+
+# Длина версии снимка (префикс отпечатка содержимого файлов конфигурации)
+_VERSION_CHARS = 12
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    # Отпечаток содержимого файлов конфигурации: одинаков во всех воркерах
+    version: str
+    fingerprint: str
+    pipeline: ExtractionPipeline
+    created_at: float
+
+
+class ConfigSnapshotManager:
+    """Holds the current :class:`ConfigSnapshot` and rebuilds it when assets change.
+
+    A request reads :attr:`current` once and keeps working with that snapshot,
+    so a reload never changes the configuration under an in-flight request.
+    Snapshots are immutable; a reload builds a new pipeline off to the side and
+    replaces the reference in one assignment.
+    """
+
+    def __init__(self, factory: Callable[[], ExtractionPipeline], watched_paths: Sequence[Path]):
+        self._factory = factory
+        self._watched_paths = tuple(watched_paths)
+        self._lock = threading.Lock()
+        self._failed_fingerprint: Optional[str] = None
+        self.last_error: str = ""
+        fingerprint = assets_fingerprint(self._watched_paths)
+        version = self._content_version()
+        self._current = ConfigSnapshot(version, fingerprint, factory(), time.time())
+
+    @property
+    def current(self) -> ConfigSnapshot:
+        return self._current
+
+    def install(self, pipeline: ExtractionPipeline, fingerprint: Optional[str] = None) -> ConfigSnapshot:
+        """Делает ``pipeline`` текущим снимком."""
+        with self._lock:
+            return self._swap(pipeline, fingerprint or self._current.fingerprint, self._content_version())
+
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """Пересобирает пайплайн, если файлы конфигурации изменились.
+
+        Ошибка сборки (например, JSON записан не полностью) не трогает текущий
+        снимок; тот же набор файлов повторно не собирается, пока не изменится.
+        """
+
+        with self._lock:
+            fingerprint = assets_fingerprint(self._watched_paths)
+            if not force and fingerprint in (self._current.fingerprint, self._failed_fingerprint):
+                return False
+            version = self._content_version()
+            try:
+                pipeline = self._factory()
+            except Exception as exc:
+                self._failed_fingerprint = fingerprint
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                logger.warning("Config reload failed, keeping version %s: %s", self._current.version, exc)
+                return False
+            self._failed_fingerprint = None
+            self.last_error = ""
+            snapshot = self._swap(pipeline, fingerprint, version)
+        logger.info("Config reloaded, version %s", snapshot.version)
+        return True
+
+    async def watch(self, interval: float) -> None:
+        """Опрашивает файлы каждые ``interval`` секунд до отмены задачи."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.reload_if_changed)
+            except Exception:  # pragma: no cover - defensive safeguard
+                logger.exception("Unexpected error while checking config files")
+
+    def _content_version(self) -> str:
+        # Версия по содержимому, а не счётчик перезагрузок: воркеры, собравшие
+        # снимок из одних и тех же файлов, сообщают одну и ту же версию
+        return content_fingerprint(self._watched_paths)[:_VERSION_CHARS]
+
+    def _swap(self, pipeline: ExtractionPipeline, fingerprint: str, version: str) -> ConfigSnapshot:
+        snapshot = ConfigSnapshot(version, fingerprint, pipeline, time.time())
+        self._current = snapshot
+        return snapshot
@@ -0,0 +1,158 @@
+"""Accuracy and LLM cost evaluation of the pipeline on a labelled corpus."""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from .compare import compare_dicts
+from .extractor.pipeline import ExtractionPipeline
+
+
+@dataclass
+class EvaluationSample:
+    name: str
+    text: str
+    expected: Dict[str, Any]
+
+
+@dataclass
+class _FieldStats:
+    total: int = 0
+    matches: int = 0
+    llm_ms: float = 0.0
+    prompt_tokens: float = 0.0
+    eval_tokens: float = 0.0
+    llm_calls: int = 0
+
+    def to_dict(self, documents: int) -> Dict[str, Any]:
+        per_doc = max(documents, 1)
+        return {
+            "total": self.total,
+            "matches": self.matches,
+            "accuracy": round(self.matches / self.total, 4) if self.total else None,
+            "llm_calls": self.llm_calls,
+            "avg_llm_ms": round(self.llm_ms / per_doc, 3),
+            "avg_prompt_tokens": round(self.prompt_tokens / per_doc, 1),
+            "avg_eval_tokens": round(self.eval_tokens / per_doc, 1),
+        }
+
+
+@dataclass
+class _SampleOutcome:
+    name: str
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    summary: Dict[str, Any] = field(default_factory=dict)
+    llm_calls: List[Dict[str, Any]] = field(default_factory=list)
+    duration_ms: float = 0.0
+    error: str = ""
+
+
+def _attribute_llm_costs(stats: Dict[str, _FieldStats], llm_calls: Iterable[Dict[str, Any]]) -> None:
+    """Split the time and tokens of each LLM call evenly between its fields."""
+
+    for call in llm_calls:
+        fields = call.get("fields") or []
+        if not fields:
+            continue
+        share = 1 / len(fields)
+        for name in fields:
+            entry = stats.setdefault(name, _FieldStats())
+            entry.llm_calls += 1
+            entry.llm_ms += (call.get("duration_ms") or 0.0) * share
+            entry.prompt_tokens += (call.get("prompt_eval_count") or 0) * share
+            entry.eval_tokens += (call.get("eval_count") or 0) * share
+
+
+async def _evaluate_sample(
+    pipeline: ExtractionPipeline,
+    sample: EvaluationSample,
+    fields: Optional[Sequence[str]],
+) -> _SampleOutcome:
+    outcome = _SampleOutcome(name=sample.name)
+    started = time.perf_counter()
+    try:
+        # Оценка не должна пополнять реестр сторон ответами, которые она проверяет
+        data, _warnings, _errors, debug, _prompt = await pipeline.run(
+            sample.text, reuse_results=False, learn_counterparties=False
+        )
+    except Exception as exc:  # one broken document must not abort the corpus run
+        outcome.error = f"{type(exc).__name__}: {exc}"
+        outcome.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        return outcome
+    outcome.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    if fields is not None:
+        allowed = set(fields)
+        expected = {key: value for key, value in sample.expected.items() if key in allowed}
+    else:
+        expected = pipeline.field_settings.filter_payload(sample.expected)
+
+    outcome.rows, outcome.summary = compare_dicts(expected, data)
+    outcome.llm_calls = list(debug.get("llm_calls", []))
+    return outcome
+
+
+async def evaluate_corpus(
+    pipeline: ExtractionPipeline,
+    samples: Sequence[EvaluationSample],
+    concurrency: int = 1,
+    fields: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """Run ``samples`` through ``pipeline`` and report accuracy and LLM cost per field.
+
+    Only enabled fields of the expected JSON are compared unless ``fields`` is given.
+    """
+
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def _guarded(sample: EvaluationSample) -> _SampleOutcome:
+        async with semaphore:
+            return await _evaluate_sample(pipeline, sample, fields)
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(_guarded(sample) for sample in samples))
+    wall_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    field_stats: Dict[str, _FieldStats] = {}
+    evaluated = [outcome for outcome in outcomes if not outcome.error]
+    for outcome in evaluated:
+        for row in outcome.rows:
+            entry = field_stats.setdefault(row["field"], _FieldStats())
+            entry.total += 1
+            entry.matches += int(bool(row["match"]))
+        _attribute_llm_costs(field_stats, outcome.llm_calls)
+
+    total = sum(entry.total for entry in field_stats.values())
+    matches = sum(entry.matches for entry in field_stats.values())
+    all_calls = [call for outcome in evaluated for call in outcome.llm_calls]
+
+    return {
+        "summary": {
+            "documents": len(samples),
+            "failed_documents": len(samples) - len(evaluated),
+            "concurrency": max(concurrency, 1),
+            "compared_fields": total,
+            "matches": matches,
+            "accuracy": round(matches / total, 4) if total else None,
+            "wall_ms": wall_ms,
+            "llm_calls": len(all_calls),
+            "llm_ms": round(sum(call.get("duration_ms") or 0.0 for call in all_calls), 3),
+            "prompt_tokens": sum(call.get("prompt_eval_count") or 0 for call in all_calls),
+            "eval_tokens": sum(call.get("eval_count") or 0 for call in all_calls),
+        },
+        "fields": {
+            name: entry.to_dict(len(evaluated))
+            for name, entry in sorted(field_stats.items())
+        },
+        "documents": [
+            {
+                "name": outcome.name,
+                "duration_ms": outcome.duration_ms,
+                **({"error": outcome.error} if outcome.error else {}),
+                **({"summary": outcome.summary, "rows": outcome.rows} if not outcome.error else {}),
+            }
+            for outcome in outcomes
+        ],
+    }
@@ -0,0 +1,75 @@
+"""Per-call ``num_ctx`` and ``num_predict`` sizing for Ollama.
+
+Ollama reserves the KV cache for the whole ``num_ctx`` of every parallel
+slot, so a two-field group over a 1000-character tail should not ask for the
+same context as a thirty-field group over the full document.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict
+
+from ..preprocess import estimate_tokens
+
+# Выход на одно поле: ключ, кавычки, двоеточие, запятая и отступ в JSON-ответе
+_FIELD_OVERHEAD_TOKENS = 6
+_RESPONSE_OVERHEAD_TOKENS = 16
+_NUMBER_TOKENS = 10
+_BOOLEAN_TOKENS = 3
+_DATE_TOKENS = 12
+# Строка без maxLength: около 270 символов кириллицы
+_STRING_TOKENS = 96
+# Служебные токены шаблона чата (роли, разделители сообщений)
+_CHAT_TEMPLATE_TOKENS = 64
+# Запас на неточность оценки токенов без токенизатора
+_SAFETY_FACTOR = 1.15
+# Символов кириллицы на токен в estimate_tokens (самый «дорогой» текст)
+_CYRILLIC_CHARS_PER_TOKEN = 2.8
+
+
+def _value_tokens(meta: Dict[str, Any]) -> int:
+    if "enum" in meta:
+        return max((estimate_tokens(json.dumps(option, ensure_ascii=False)) for option in meta["enum"]), default=1)
+    type_ = meta.get("type")
+    if isinstance(type_, list):
+        type_ = next((item for item in type_ if item != "null"), None)
+    if type_ in ("integer", "number"):
+        return _NUMBER_TOKENS
+    if type_ == "boolean":
+        return _BOOLEAN_TOKENS
+    if meta.get("format") in ("date", "date-time", "time"):
+        return _DATE_TOKENS
+    max_length = meta.get("maxLength")
+    if isinstance(max_length, int) and max_length > 0:
+        return estimate_tokens("я" * max_length)
+    return _STRING_TOKENS
+
+
+def output_tokens(schema: Dict[str, Any], cap: int) -> int:
+    """``num_predict`` для ответа по схеме: сумма бюджетов полей по их типам, не больше ``cap``."""
+    total = _RESPONSE_OVERHEAD_TOKENS
+    for key, meta in (schema.get("properties") or {}).items():
+        total += estimate_tokens(key) + _FIELD_OVERHEAD_TOKENS + _value_tokens(meta or {})
+    return max(min(round(total * _SAFETY_FACTOR), cap), 1)
+
+
+def context_tokens(prompt_tokens: int, num_predict: int, minimum: int, maximum: int) -> int:
+    """``num_ctx``: промпт и ответ, округлённые вверх до степени двойки в пределах ``[minimum, maximum]``.
+
+    Степени двойки ограничивают число разных размеров контекста: Ollama
+    перезапускает модель при смене ``num_ctx``.
+    """
+    needed = round(prompt_tokens * _SAFETY_FACTOR) + _CHAT_TEMPLATE_TOKENS + num_predict
+    size = 1 << max(needed - 1, 1).bit_length()
+    return max(minimum, min(size, maximum))
+
+
+def document_chars(overhead_tokens: int, num_predict: int, maximum: int) -> int:
+    """Сколько символов документа помещается в контекст ``maximum`` рядом с остальным
+    промптом (``overhead_tokens``) и ответом.
+
+    Считается по кириллице, поэтому текст такой длины любого состава проходит
+    по :func:`context_tokens`, не превышая ``maximum``.
+    """
+    available = (maximum - _CHAT_TEMPLATE_TOKENS - num_predict) / _SAFETY_FACTOR - overhead_tokens - 1
+    return max(int(available * _CYRILLIC_CHARS_PER_TOKEN), 0)
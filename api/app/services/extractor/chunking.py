@@ -0,0 +1,121 @@
+"""Overlapping windows over long documents and merging of per-window answers."""
+from __future__ import annotations
+
+import json
+from collections import Counter
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+from app.core.field_settings import DEFAULT_MERGE_RULE
+from ..normalize import extract_number
+
+
+def split_windows(text: str, size: int, overlap: int) -> List[Tuple[int, int]]:
+    """Делит текст на окна ``[start, end)`` длиной не больше ``size`` символов.
+
+    Соседние окна перекрываются примерно на ``overlap`` символов, чтобы
+    фраза на границе целиком попала хотя бы в одно окно. Граница окна
+    сдвигается к концу предложения или пробелу, если он есть в последней
+    пятой части окна. Короткий текст — одно окно.
+    """
+
+    length = len(text)
+    if size <= 0 or length <= size:
+        return [(0, length)]
+    overlap = min(max(overlap, 0), size // 2)
+
+    windows: List[Tuple[int, int]] = []
+    start = 0
+    while True:
+        end = min(start + size, length)
+        if end < length:
+            floor = end - size // 5
+            cut = text.rfind(". ", floor, end)
+            if cut != -1:
+                end = cut + 1
+            else:
+                cut = text.rfind(" ", floor, end)
+                if cut != -1:
+                    end = cut
+        windows.append((start, end))
+        if end >= length:
+            return windows
+        next_start = max(end - overlap, start + 1)
+        # Начинаем окно с целого слова
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+
+
+def _is_blank(value: Any) -> bool:
+    """Значения нет: ``null``, пустая строка или пустой список/объект."""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    if isinstance(value, (list, dict)):
+        return not value
+    return False
+
+
+def _is_template_default(value: Any) -> bool:
+    """``0`` и ``false`` из JSON-шаблона промпта: окно без нужного фрагмента
+    отвечает ими так же, как окно, где в договоре действительно ноль или «нет»."""
+    if isinstance(value, bool):
+        return not value
+    return isinstance(value, (int, float)) and value == 0
+
+
+def _vote_key(value: Any) -> str:
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def _as_number(value: Any) -> float | None:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return extract_number(value)
+    return None
+
+
+def merge_values(rule: str, candidates: Sequence[Any]) -> Any:
+    """Сводит ответы окон для одного поля по правилу ``rule``.
+
+    Сначала сводятся содержательные ответы; ``0`` и ``false`` учитываются,
+    только если других нет (одно окно с «да» или суммой НДС перевешивает
+    окна, ответившие значением из шаблона). Если все окна вернули пустое
+    значение, остаётся ответ первого окна.
+    """
+
+    present = [value for value in candidates if not _is_blank(value)]
+    filled = [value for value in present if not _is_template_default(value)] or present
+    if not filled:
+        return candidates[0] if candidates else None
+    if rule == "max":
+        numbers = [(number, value) for value in filled if (number := _as_number(value)) is not None]
+        if numbers:
+            # max() возвращает первый из равных, то есть более раннее окно
+            return max(numbers, key=lambda item: item[0])[1]
+        return filled[0]
+    if rule == "majority":
+        counts = Counter(_vote_key(value) for value in filled)
+        best = max(counts.values())
+        return next(value for value in filled if counts[_vote_key(value)] == best)
+    return filled[0]
+
+
+def merge_window_results(
+    fields: Sequence[str],
+    results: Sequence[Mapping[str, Any]],
+    rules: Mapping[str, str],
+) -> Dict[str, Any]:
+    """Собирает ответ группы из ответов окон (в порядке окон)."""
+
+    merged: Dict[str, Any] = {}
+    for field in fields:
+        candidates = [result[field] for result in results if field in result]
+        if candidates:
+            merged[field] = merge_values(rules.get(field, DEFAULT_MERGE_RULE), candidates)
+    return merged
@@ -0,0 +1,235 @@
+"""Fields computed from other fields instead of being asked from the LLM."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from ..normalize import extract_number
+from ..warnings import WarningItem
+
+_UNITS_MASCULINE = ("", "один", "два", "три", "четыре", "пять", "шесть", "семь", "восемь", "девять")
+_UNITS_FEMININE = ("", "одна", "две", "три", "четыре", "пять", "шесть", "семь", "восемь", "девять")
+_TEENS = (
+    "десять",
+    "одиннадцать",
+    "двенадцать",
+    "тринадцать",
+    "четырнадцать",
+    "пятнадцать",
+    "шестнадцать",
+    "семнадцать",
+    "восемнадцать",
+    "девятнадцать",
+)
+_TENS = (
+    "",
+    "",
+    "двадцать",
+    "тридцать",
+    "сорок",
+    "пятьдесят",
+    "шестьдесят",
+    "семьдесят",
+    "восемьдесят",
+    "девяносто",
+)
+_HUNDREDS = (
+    "",
+    "сто",
+    "двести",
+    "триста",
+    "четыреста",
+    "пятьсот",
+    "шестьсот",
+    "семьсот",
+    "восемьсот",
+    "девятьсот",
+)
+# Разряды: (формы для 1, 2–4, 5+), женский род
+_SCALES = (
+    (("", "", ""), False),
+    (("тысяча", "тысячи", "тысяч"), True),
+    (("миллион", "миллиона", "миллионов"), False),
+    (("миллиард", "миллиарда", "миллиардов"), False),
+    (("триллион", "триллиона", "триллионов"), False),
+)
+_RUBLE_FORMS = ("рубль", "рубля", "рублей")
+_KOPECK_FORMS = ("копейка", "копейки", "копеек")
+_RUBLE_CURRENCIES = {"", "RUB", "RUR", "РУБ", "РУБЛЬ", "РУБЛИ", "РУБЛЕЙ"}
+
+
+def plural_form(number: int, forms: Tuple[str, str, str]) -> str:
+    """Форма слова для числа: 1 рубль, 2 рубля, 5 рублей, 11 рублей, 21 рубль."""
+    number = abs(number) % 100
+    if 11 <= number <= 19:
+        return forms[2]
+    number %= 10
+    if number == 1:
+        return forms[0]
+    if 2 <= number <= 4:
+        return forms[1]
+    return forms[2]
+
+
+def _triad_words(number: int, feminine: bool) -> List[str]:
+    words = [_HUNDREDS[number // 100]]
+    rest = number % 100
+    if 10 <= rest <= 19:
+        words.append(_TEENS[rest - 10])
+    else:
+        words.append(_TENS[rest // 10])
+        words.append((_UNITS_FEMININE if feminine else _UNITS_MASCULINE)[rest % 10])
+    return [word for word in words if word]
+
+
+def integer_in_words(number: int, feminine: bool = False) -> str:
+    """Целое неотрицательное число прописью (``feminine`` — род единиц: одна, две)."""
+    if number < 0:
+        raise ValueError("Only non-negative numbers are supported")
+    if number >= 1000 ** len(_SCALES):
+        raise ValueError("Number is too large")
+    if number == 0:
+        return "ноль"
+    words: List[str] = []
+    for index, (forms, scale_feminine) in enumerate(_SCALES):
+        triad = (number // 1000**index) % 1000
+        if not triad:
+            continue
+        part = _triad_words(triad, scale_feminine if index else feminine)
+        if index:
+            part.append(plural_form(triad, forms))
+        words = part + words
+    return " ".join(words)
+
+
+def _to_decimal(value: Any) -> Optional[Decimal]:
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number: Optional[float] = float(value)
+    else:
+        number = extract_number(str(value))
+    if number is None:
+        return None
+    try:
+        return Decimal(str(number)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        return None
+
+
+def amount_in_words(amount: Any) -> Optional[str]:
+    """Сумма в рублях прописью в формате договоров: «Двести две тысячи шестьсот два рубля 67 копеек»."""
+    value = _to_decimal(amount)
+    if value is None or value < 0 or value >= 1000 ** len(_SCALES):
+        return None
+    rubles = int(value)
+    kopecks = int((value - rubles) * 100)
+    text = (
+        f"{integer_in_words(rubles)} {plural_form(rubles, _RUBLE_FORMS)} "
+        f"{kopecks:02d} {plural_form(kopecks, _KOPECK_FORMS)}"
+    )
+    return text[0].upper() + text[1:]
+
+
+def vat_rate(value: Any) -> Optional[Decimal]:
+    """Ставка НДС в процентах: «20», «20%», 20; «Без НДС» — 0."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, str) and "без" in value.lower():
+        return Decimal(0)
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    number = extract_number(str(value))
+    return Decimal(str(number)) if number is not None else None
+
+
+def vat_amount(total: Any, rate: Any) -> Optional[float]:
+    """НДС, включённый в сумму: ``total * rate / (100 + rate)`` с округлением до копеек."""
+    total_value = _to_decimal(total)
+    rate_value = vat_rate(rate)
+    if total_value is None or rate_value is None or rate_value < 0:
+        return None
+    amount = total_value * rate_value / (100 + rate_value)
+    return float(amount.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+
+def _is_rubles(data: Dict[str, Any]) -> bool:
+    currency = data.get("Валюта")
+    return not isinstance(currency, str) or currency.strip().upper() in _RUBLE_CURRENCIES
+
+
+def _derive_vat(data: Dict[str, Any]) -> Optional[Any]:
+    return vat_amount(data.get("Сумма"), data.get("СтавкаНДС"))
+
+
+def _derive_total_words(data: Dict[str, Any]) -> Optional[Any]:
+    return amount_in_words(data.get("Сумма")) if _is_rubles(data) else None
+
+
+def _derive_vat_words(data: Dict[str, Any]) -> Optional[Any]:
+    return amount_in_words(data.get("СуммаНДС")) if _is_rubles(data) else None
+
+
+@dataclass(frozen=True)
+class DerivedField:
+    name: str
+    compute: Callable[[Dict[str, Any]], Optional[Any]]
+    # Допустимое расхождение с найденным в документе значением (для чисел)
+    tolerance: float = 0.0
+
+
+# Порядок важен: СуммаНДСПрописью считается из уже вычисленной СуммаНДС
+DERIVED_FIELDS: Dict[str, DerivedField] = {
+    field.name: field
+    for field in (
+        # Рубль допуска: в тексте копейки часто записаны словами («202 602 (…) рубля 67 копеек»)
+        DerivedField("СуммаНДС", _derive_vat, tolerance=1.0),
+        DerivedField("СуммаПрописью", _derive_total_words),
+        DerivedField("СуммаНДСПрописью", _derive_vat_words),
+    )
+}
+
+
+def _same_value(found: Any, derived: Any, tolerance: float) -> bool:
+    if isinstance(derived, str):
+        return " ".join(str(found).split()).casefold() == " ".join(derived.split()).casefold()
+    found_number = _to_decimal(found)
+    return found_number is not None and abs(float(found_number) - derived) <= tolerance
+
+
+def _is_blank(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def apply_derived_fields(
+    data: Dict[str, Any], fields: Sequence[str]
+) -> Tuple[List[str], List[WarningItem]]:
+    """Вычисляет ``fields`` по уже извлечённым значениям и записывает их в ``data``.
+
+    Значение, найденное в документе раньше (правилами или LLM), только сверяется
+    с вычисленным; при расхождении добавляется предупреждение. Если исходных
+    данных не хватает, поле остаётся как есть. Возвращает список вычисленных
+    полей и предупреждения.
+    """
+
+    computed: List[str] = []
+    warnings: List[WarningItem] = []
+    for name, spec in DERIVED_FIELDS.items():
+        if name not in fields:
+            continue
+        value = spec.compute(data)
+        if value is None:
+            continue
+        found = data.get(name)
+        if not _is_blank(found) and not _same_value(found, value, spec.tolerance):
+            code = "vat_mismatch" if name == "СуммаНДС" else "derived_mismatch"
+            warnings.append(
+                WarningItem(
+                    code=code,
+                    message=f"{name}: в документе {found}, расчётное значение {value}",
+                )
+            )
+        data[name] = value
+        computed.append(name)
+    return computed, warnings
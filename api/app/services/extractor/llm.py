@@ -1,35 +1,62 @@
 import json
+import logging
+import time
 from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, Any
 
 from .base import BaseExtractor
-from ..ollama_client import OllamaClient
+from .budget import context_tokens, document_chars, output_tokens
+from ..ollama_client import ChatStats, OllamaClient
 from ..normalize import normalize_whitespace
+from ..preprocess import estimate_tokens
 from app.core.config import CONFIG
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LLMCallResult:
+    data: Dict[str, Any]
+    prompt: str
+    raw: str
+    duration_ms: float
+    stats: ChatStats | None = None
+    # Размеры, отправленные в Ollama (None — значения по умолчанию)
+    num_ctx: int | None = None
+    num_predict: int | None = None
+    prompt_tokens_estimate: int | None = None
+
 
 class LLMExtractor(BaseExtractor):
     def __init__(
         self,
         schema: Dict[str, Any],
-        system_path: str,
-        user_tmpl_path: str,
+        system_path: str | None = None,
+        user_tmpl_path: str | None = None,
         field_guidelines_path: str | None = None,
         field_guidelines: str | None = None,
+        client: OllamaClient | None = None,
+        *,
+        system_prompt: str | None = None,
+        user_template: str | None = None,
     ):
         self.schema = schema
-        self.system_prompt = Path(system_path).read_text(encoding="utf-8")
-        self.user_template = Path(user_tmpl_path).read_text(encoding="utf-8")
+        # Тексты промптов можно передать напрямую (слоистое хранилище конфигурации)
+        if system_prompt is None:
+            system_prompt = Path(system_path).read_text(encoding="utf-8")
+        if user_template is None:
+            user_template = Path(user_tmpl_path).read_text(encoding="utf-8")
+        self.system_prompt = system_prompt
+        self.user_template = user_template
         if field_guidelines is not None:
             self.field_guidelines = field_guidelines
         elif field_guidelines_path and Path(field_guidelines_path).exists():
             self.field_guidelines = Path(field_guidelines_path).read_text(encoding="utf-8")
         else:
             self.field_guidelines = ""
-        self.client = OllamaClient()
-        self.last_prompt: str = ""
-        self.last_raw: str = ""
+        self.client = client or OllamaClient()
 
     async def extract(
         self,
@@ -39,28 +66,52 @@ class LLMExtractor(BaseExtractor):
         schema_override: Dict[str, Any] | None = None,
         field_guidelines: str | None = None,
     ) -> Dict[str, Any]:
-        schema_to_use = schema_override or self.schema
-        guidelines_to_use = field_guidelines if field_guidelines is not None else self.field_guidelines
-        json_schema = json.dumps(schema_to_use, ensure_ascii=False, indent=2)
-        json_skeleton = json.dumps(
-            self._build_json_skeleton(schema_to_use), ensure_ascii=False, indent=2
+        result = await self.extract_call(
+            text,
+            partial,
+            schema_override=schema_override,
+            field_guidelines=field_guidelines,
         )
+        return result.data
 
-        # Встраиваем схему внутрь промпта
-        user_prompt = self.user_template.format(
-            document_text=text[:100000],  # безопасный лимит
-            json_schema=json_schema,
-            json_skeleton=json_skeleton,
-            field_guidelines=guidelines_to_use,
-        )
-        self.last_prompt = normalize_whitespace(user_prompt)
-        raw = await self.client.chat(
+    async def extract_call(
+        self,
+        text: str,
+        partial: Dict[str, Any],
+        *,
+        schema_override: Dict[str, Any] | None = None,
+        field_guidelines: str | None = None,
+    ) -> LLMCallResult:
+        """Один вызов LLM; всё, что о нём известно, возвращается в результате.
+
+        Экземпляр не хранит состояние вызова, поэтому его можно использовать
+        из параллельных запросов и групп.
+        """
+        schema_to_use = schema_override or self.schema
+        user_prompt = self._user_prompt(text, schema_to_use, field_guidelines)
+        num_predict = self._num_predict(schema_to_use)
+        num_ctx = None
+        prompt_tokens = estimate_tokens(self.system_prompt) + estimate_tokens(user_prompt)
+        if CONFIG.dynamic_llm_budget:
+            # Контекст и длина ответа по размеру промпта и числу/типам полей схемы
+            num_ctx = context_tokens(
+                prompt_tokens, num_predict, CONFIG.llm_num_ctx_min, CONFIG.llm_num_ctx_max
+            )
+            if prompt_tokens + num_predict > num_ctx:
+                # Ollama молча обрежет начало промпта
+                logger.warning(
+                    "Prompt of ~%s tokens does not fit LLM_NUM_CTX_MAX=%s", prompt_tokens, num_ctx
+                )
+        started = time.perf_counter()
+        result = await self.client.chat(
             self.system_prompt,
             user_prompt,
             temperature=CONFIG.temperature,
-            max_tokens=CONFIG.max_tokens,
+            max_tokens=num_predict,
+            num_ctx=num_ctx,
         )
-        self.last_raw = raw
+        duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        raw = result.content
 
         # Попытка распарсить JSON напрямую
         data = None
@@ -83,7 +134,46 @@ class LLMExtractor(BaseExtractor):
         # Не перетираем уже найденные правилами поля
         merged = dict(data)
         merged.update(partial)  # приоритет у правил/локальной логики
-        return merged
+        return LLMCallResult(
+            data=merged,
+            prompt=normalize_whitespace(user_prompt),
+            raw=raw,
+            duration_ms=duration_ms,
+            stats=result.stats,
+            num_ctx=num_ctx,
+            num_predict=num_predict,
+            prompt_tokens_estimate=prompt_tokens,
+        )
+
+    def document_chars_limit(
+        self,
+        schema_override: Dict[str, Any] | None = None,
+        field_guidelines: str | None = None,
+    ) -> int:
+        """Сколько символов документа помещается в ``LLM_NUM_CTX_MAX`` вместе с
+        инструкциями, схемой и ответом; длинный текст делится на окна этой длины."""
+        schema_to_use = schema_override or self.schema
+        overhead = estimate_tokens(self.system_prompt) + estimate_tokens(
+            self._user_prompt("", schema_to_use, field_guidelines)
+        )
+        return document_chars(overhead, self._num_predict(schema_to_use), CONFIG.llm_num_ctx_max)
+
+    def _user_prompt(self, text: str, schema: Dict[str, Any], field_guidelines: str | None) -> str:
+        guidelines_to_use = field_guidelines if field_guidelines is not None else self.field_guidelines
+        json_schema = json.dumps(schema, ensure_ascii=False, indent=2)
+        json_skeleton = json.dumps(self._build_json_skeleton(schema), ensure_ascii=False, indent=2)
+        # Встраиваем схему внутрь промпта
+        return self.user_template.format(
+            document_text=text,
+            json_schema=json_schema,
+            json_skeleton=json_skeleton,
+            field_guidelines=guidelines_to_use,
+        )
+
+    def _num_predict(self, schema: Dict[str, Any]) -> int:
+        if CONFIG.dynamic_llm_budget:
+            return output_tokens(schema, CONFIG.max_tokens)
+        return CONFIG.max_tokens
 
     def _build_json_skeleton(self, schema: Dict[str, Any] | None = None) -> Dict[str, Any]:
         schema = schema or self.schema
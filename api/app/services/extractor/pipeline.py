@@ -1,31 +1,216 @@
-from typing import Dict, Any, List, Optional
+import asyncio
+import copy
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Any, Awaitable, FrozenSet, Iterable, List, Optional, Sequence, Tuple
 from .rules import RuleBasedExtractor
-from .llm import LLMExtractor
-from app.core.validator import SchemaValidator
+from .chunking import merge_window_results, split_windows
+from .derived import DERIVED_FIELDS, apply_derived_fields
+from .llm import LLMCallResult, LLMExtractor
+from app.core.validator import SchemaValidator, get_validator
 from app.core.config import CONFIG
-from app.core.field_settings import FieldSettings
+from app.core.metrics import METRICS
+from app.core.tracing import TRACER
+from app.core.field_settings import DocumentSlice, FieldSettings, LLMFieldGroup
+from ..okpd2 import OKPD2_FIELD, default_classifier
+from ..ollama_client import OllamaClient
+from ..single_flight import SingleFlight
+from ..result_store import (
+    AnyResultStore,
+    ResultStore,
+    StoredGroup,
+    StoredResult,
+    diff_spans,
+    result_id_for,
+    text_fingerprint,
+)
 from ..warnings import WarningItem
 from ..normalize import normalize_whitespace
+from ..preprocess import PreprocessReport, preprocess_document
 from ..summary import (
+    DocumentDigest,
+    build_document_digest,
     build_selection_rationale,
     build_short_summary,
     clamp_summary_text,
 )
 
+if TYPE_CHECKING:
+    # gazetteer -> config_snapshot -> pipeline: импорт только для аннотаций
+    from ..gazetteer import CounterpartyGazetteer
+
+# Нижняя граница окна, если инструкции и схема сами занимают почти весь LLM_NUM_CTX_MAX
+_MIN_WINDOW_CHARS = 1000
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def _describe_llm_call(
+    stage: str,
+    call: LLMCallResult,
+    fields: Iterable[str],
+    document_slice: DocumentSlice,
+    segment: str,
+) -> Dict[str, Any]:
+    """Собирает сведения об одном вызове LLM для debug-блока ответа."""
+    return {
+        "stage": stage,
+        "fields": list(fields),
+        "slice": document_slice.mode,
+        "input_chars": len(segment),
+        "prompt_chars": len(call.prompt),
+        "duration_ms": call.duration_ms,
+        "prompt_tokens_estimate": call.prompt_tokens_estimate,
+        "num_ctx": call.num_ctx,
+        "num_predict": call.num_predict,
+        **(call.stats.to_dict() if call.stats is not None else {}),
+    }
+
+
+def _llm_span_attributes(call: Dict[str, Any]) -> Dict[str, Any]:
+    """Атрибуты спана ``LLMExtractor.extract`` из описания вызова (``_describe_llm_call``)."""
+    attributes = {f"llm.{key}": value for key, value in call.items()}
+    attributes["gen_ai.usage.input_tokens"] = call.get("prompt_eval_count")
+    attributes["gen_ai.usage.output_tokens"] = call.get("eval_count")
+    return attributes
+
+
+async def _gather_cancelling(coroutines: Iterable[Awaitable[Any]]) -> List[Any]:
+    """``asyncio.gather``, который при первой ошибке отменяет остальные задачи."""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def _clean_document(text: str) -> Tuple[str, Optional[PreprocessReport]]:
+    """Предобработка (``PREPROCESS_DOCUMENTS``) и нормализация пробелов."""
+    report = None
+    if CONFIG.preprocess_documents:
+        with TRACER.span("preprocess_document", {"document.chars": len(text)}):
+            preprocessed = preprocess_document(text)
+        text, report = preprocessed.text, preprocessed.report
+    with TRACER.span("normalize_whitespace", {"document.chars": len(text)}):
+        return normalize_whitespace(text), report
+
+
+@dataclass(frozen=True)
+class PreparedDocument:
+    """Текст после предобработки и нормализации; сериализуется для передачи между процессами."""
+
+    text: str
+    preprocess_report: Optional[PreprocessReport]
+    normalize_ms: float
+
+
+def prepare_document(text: str) -> PreparedDocument:
+    """CPU-часть подготовки документа, не зависящая от снимка конфигурации."""
+    started = time.perf_counter()
+    cleaned_text, report = _clean_document(text)
+    return PreparedDocument(cleaned_text, report, _elapsed_ms(started))
+
+
+def _fingerprint(*parts: Any) -> str:
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=repr)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _prompt_fingerprint(extractor: LLMExtractor, *parts: Any) -> str:
+    """Отпечаток всего, кроме текста документа, что влияет на ответ LLM."""
+    return _fingerprint(
+        extractor.system_prompt,
+        extractor.user_template,
+        getattr(extractor.client, "model", ""),
+        *parts,
+    )
+
+
+def _window_chars(extractor: LLMExtractor, schema: Dict[str, Any], guidelines: str | None = None) -> int:
+    """Длина окна: ``LLM_WINDOW_CHARS``, но не больше, чем помещается в ``LLM_NUM_CTX_MAX``.
+
+    Без этой границы Ollama молча обрезала бы начало промпта — инструкции и схему.
+    """
+    limit = max(extractor.document_chars_limit(schema, guidelines), _MIN_WINDOW_CHARS)
+    return min(CONFIG.llm_window_chars, limit) if CONFIG.llm_window_chars > 0 else limit
+
+
+def _reask_guidelines(guidelines: str, errors: List[Dict[str, Any]]) -> str:
+    problems = "\n".join(f"- {error['title']}: {error['message']}" for error in errors)
+    return (
+        f"{guidelines}\n\n## Исправление предыдущего ответа\n\n"
+        f"Предыдущий ответ не прошёл проверку по схеме:\n{problems}\n"
+        "Верни исправленный JSON, строго соблюдая типы и допустимые значения."
+    )
+
+
+@dataclass
+class _GroupOutcome:
+    """Результат обработки одной группы полей (собирается без общих списков)."""
+
+    values: Dict[str, Any] = field(default_factory=dict)
+    stored: Optional[StoredGroup] = None
+    reused: bool = False
+    calls: List[Dict[str, Any]] = field(default_factory=list)
+    prompts: List[str] = field(default_factory=list)
+    raw_outputs: List[str] = field(default_factory=list)
+
+    def absorb(self, other: "_GroupOutcome") -> None:
+        self.calls.extend(other.calls)
+        self.prompts.extend(other.prompts)
+        self.raw_outputs.extend(other.raw_outputs)
+
+
 class ExtractionPipeline:
     def __init__(
         self,
         schema: Dict[str, Any],
-        system_prompt_path: str,
-        user_tmpl_path: str,
+        system_prompt_path: Optional[str],
+        user_tmpl_path: Optional[str],
         field_settings: FieldSettings,
         field_guidelines_path: Optional[str] = None,
         summary_system_prompt_path: Optional[str] = None,
         summary_user_tmpl_path: Optional[str] = None,
+        client: Optional[OllamaClient] = None,
+        result_store: Optional[AnyResultStore] = None,
+        prompts: Optional[Dict[str, str]] = None,
+        gazetteer: Optional["CounterpartyGazetteer"] = None,
+        llm_groups: Optional[Sequence[Tuple[LLMFieldGroup, str]]] = None,
+        profile: Optional[str] = None,
     ):
+        """``prompts`` — уже разрешённые тексты промптов (ключи ``system``,
+        ``user_template``, ``summary_system``, ``summary_user_template``); если
+        ключ передан, соответствующий путь не читается. ``gazetteer`` — реестр
+        известных сторон договора (общий для всех снимков). ``llm_groups`` —
+        группы с подсказками из снимка ассетов; без них собираются по ``field_settings``.
+        ``profile`` — профиль конфигурации (``None`` — по умолчанию): результаты
+        разных профилей хранятся под разными идентификаторами."""
+        prompts = prompts or {}
+        self.profile = profile
         self.field_settings = field_settings
+        self.gazetteer = gazetteer
+        self.okpd2 = default_classifier()
+        self.result_store = (
+            result_store if result_store is not None else ResultStore(CONFIG.result_store_size)
+        )
         self.schema = self.field_settings.apply_to_schema(schema)
-        self.validator = SchemaValidator(self.schema)
+        self._derived_fields = tuple(self.field_settings.derived_fields())
+        unknown_derived = [name for name in self._derived_fields if name not in DERIVED_FIELDS]
+        if unknown_derived:
+            raise ValueError(
+                f"No derivation is defined for fields: {', '.join(unknown_derived)} "
+                f"(supported: {', '.join(DERIVED_FIELDS)})"
+            )
+        self.validator = get_validator(self.schema)
+        self._inflight = SingleFlight()
+        self._group_schemas: Dict[Tuple[str, ...], Tuple[Dict[str, Any], SchemaValidator]] = {}
         self.rules = RuleBasedExtractor()
         self.llm = None
         self.summary_llm = None
@@ -47,24 +232,425 @@ class ExtractionPipeline:
                 system_prompt_path,
                 user_tmpl_path,
                 field_guidelines_path,
+                client=client,
+                system_prompt=prompts.get("system"),
+                user_template=prompts.get("user_template"),
             )
-            if summary_system_prompt_path and summary_user_tmpl_path:
+            summary_system = prompts.get("summary_system")
+            summary_user_template = prompts.get("summary_user_template")
+            if (summary_system_prompt_path or summary_system) and (
+                summary_user_tmpl_path or summary_user_template
+            ):
                 self.summary_llm = LLMExtractor(
                     self._summary_schema,
                     summary_system_prompt_path,
                     summary_user_tmpl_path,
+                    client=client,
+                    system_prompt=summary_system,
+                    user_template=summary_user_template,
+                )
+        # Группы и подсказки собираются один раз: пайплайн — неизменяемый снимок
+        # конфигурации, изменения файлов применяются пересборкой (см. config_snapshot).
+        self._llm_groups: Tuple[Tuple[LLMFieldGroup, str], ...] = ()
+        if self.llm is not None and llm_groups is not None:
+            self._llm_groups = tuple(llm_groups)
+        elif self.llm is not None:
+            self._llm_groups = tuple(
+                (group, self.field_settings.build_guidelines_bundle(group.fields))
+                for group in self.field_settings.build_llm_groups()
+            )
+        self._reduced_groups: Dict[
+            Tuple[Tuple[str, ...], FrozenSet[str]], Optional[Tuple[LLMFieldGroup, str]]
+        ] = {}
+
+    @property
+    def llm_groups(self) -> Optional[Tuple[Tuple[LLMFieldGroup, str], ...]]:
+        """Группы LLM с подсказками; ``None``, если LLM отключена."""
+        return self._llm_groups if self.llm is not None else None
+
+    def _active_groups(self, known: FrozenSet[str]) -> List[Tuple[LLMFieldGroup, str]]:
+        """Группы LLM без полей, значения которых уже известны (например, из реестра сторон).
+
+        Группа, у которой не осталось полей, не вызывается вовсе.
+        """
+        if not known:
+            return list(self._llm_groups)
+        active: List[Tuple[LLMFieldGroup, str]] = []
+        for group, guidelines in self._llm_groups:
+            key = (group.fields, known & frozenset(group.fields))
+            if not key[1]:
+                active.append((group, guidelines))
+                continue
+            if key not in self._reduced_groups:
+                fields = tuple(name for name in group.fields if name not in known)
+                self._reduced_groups[key] = (
+                    (
+                        LLMFieldGroup(fields, group.document_slice),
+                        self.field_settings.build_guidelines_bundle(fields),
+                    )
+                    if fields
+                    else None
                 )
+            reduced = self._reduced_groups[key]
+            if reduced is not None:
+                active.append(reduced)
+        return active
+
+    def _resolve_okpd2(
+        self, digest: DocumentDigest, preprocess_report: Optional[PreprocessReport]
+    ) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Код ОКПД2 без LLM: единственный полный код, указанный в документе рядом
+        с упоминанием ОКПД, или уверенная подсказка по названиям позиций спецификации."""
+        document_codes: List[str] = []
+        for value in digest.marked_okpd2_codes:
+            check = self.okpd2.check(value)
+            # Только код из классификатора целиком: известный класс есть и у дат и сумм;
+            # короткие «коды» вида 12.50 слишком похожи на числа
+            if check.exact and len(check.code.replace(".", "")) >= 6:
+                document_codes.append(check.code)
+        document_codes = list(dict.fromkeys(document_codes))
+        items = (
+            preprocess_report.table_items
+            if preprocess_report is not None and preprocess_report.table_items
+            else list(digest.key_sentences)
+        )
+        suggestions = self.okpd2.suggest(items)
+        details: Dict[str, Any] = {
+            "document_codes": document_codes,
+            "suggestions": [suggestion.to_dict() for suggestion in suggestions],
+        }
+        if len(document_codes) == 1:
+            details["source"] = "document"
+            return document_codes[0], details
+        if not document_codes and suggestions:
+            top = suggestions[0]
+            runner_up = suggestions[1].hits if len(suggestions) > 1 else 0
+            if top.confidence >= CONFIG.okpd2_suggest_min_confidence and top.hits > runner_up:
+                details["source"] = "items"
+                return top.code, details
+        return None, details
+
+    def _normalize_okpd2(self, data: Dict[str, Any]) -> List[WarningItem]:
+        """Приводит код от LLM к виду XX.XX.XX[.XXX] и проверяет его по классификатору."""
+        value = data.get(OKPD2_FIELD)
+        if not isinstance(value, str) or not value.strip():
+            return []
+        check = self.okpd2.check(value)
+        if check.code is None:
+            # Например, «группа ОКПД2 не определена» — оставляем как есть
+            return []
+        data[OKPD2_FIELD] = check.code
+        if check.known:
+            return []
+        return [
+            WarningItem(
+                code="okpd2_unknown",
+                message=f"{OKPD2_FIELD}: кода {check.code} нет в классификаторе ОКПД2",
+            )
+        ]
+
+    def _group_schema(self, fields: Tuple[str, ...]) -> Tuple[Dict[str, Any], SchemaValidator]:
+        cached = self._group_schemas.get(fields)
+        if cached is None:
+            subset = self.field_settings.build_schema_subset(self.schema, fields)
+            cached = (subset, get_validator(subset))
+            self._group_schemas[fields] = cached
+        return cached
 
-    async def run(self, text: str) -> (
+    async def _extract_group(
+        self,
+        group: LLMFieldGroup,
+        segment: str,
+        group_partial: Dict[str, Any],
+        schema_subset: Dict[str, Any],
+        group_validator: SchemaValidator,
+        guidelines: str,
+        outcome: "_GroupOutcome",
+        queue_ms: Optional[float] = None,
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        attempt_guidelines = guidelines
+        for attempt in range(max(CONFIG.llm_reask_attempts, 0) + 1):
+            with TRACER.span(
+                "LLMExtractor.extract",
+                {"llm.attempt": attempt, "llm.queue_ms": queue_ms if attempt == 0 else None},
+            ) as span:
+                result = await self.llm.extract_call(
+                    segment,
+                    group_partial,
+                    schema_override=schema_subset,
+                    field_guidelines=attempt_guidelines,
+                )
+                llm_result = result.data
+                # Проверяем ответ группы сразу, чтобы при ошибке переспросить только её
+                group_errors = group_validator.validate(
+                    {key: llm_result[key] for key in group.fields if key in llm_result}
+                )
+                call = _describe_llm_call(
+                    "group" if attempt == 0 else "group_reask",
+                    result,
+                    group.fields,
+                    group.document_slice,
+                    segment,
+                )
+                call["validation_errors"] = [error["message"] for error in group_errors]
+                span.set_attributes(_llm_span_attributes(call))
+            outcome.calls.append(call)
+            if result.prompt:
+                outcome.prompts.append(result.prompt)
+            if result.raw:
+                outcome.raw_outputs.append(result.raw)
+            if not group_errors:
+                break
+            attempt_guidelines = _reask_guidelines(guidelines, group_errors)
+        return llm_result, group_errors
+
+    async def _process_group(
+        self,
+        group: LLMFieldGroup,
+        guidelines: str,
+        cleaned_text: str,
+        partial: Dict[str, Any],
+        previous: Optional[StoredResult],
+        semaphore: asyncio.Semaphore,
+    ) -> "_GroupOutcome":
+        with TRACER.span(
+            "llm.group", {"llm.fields": list(group.fields), "llm.slice": group.document_slice.mode}
+        ) as span:
+            outcome = await self._extract_group_fields(
+                group, guidelines, cleaned_text, partial, previous, semaphore
+            )
+            span.set_attributes({"llm.reused": outcome.reused, "llm.calls": len(outcome.calls)})
+        return outcome
+
+    async def _extract_group_fields(
+        self,
+        group: LLMFieldGroup,
+        guidelines: str,
+        cleaned_text: str,
+        partial: Dict[str, Any],
+        previous: Optional[StoredResult],
+        semaphore: asyncio.Semaphore,
+    ) -> "_GroupOutcome":
+        """Извлекает поля группы из её фрагмента текста.
+
+        Фрагмент длиннее ``LLM_WINDOW_CHARS`` (или того, что помещается в
+        ``LLM_NUM_CTX_MAX``) делится на перекрывающиеся окна, которые обрабатываются параллельно (в пределах ``semaphore``); ответы
+        окон сводятся по правилам полей из ``field_merge_rules.json``.
+        """
+        outcome = _GroupOutcome()
+        schema_subset, group_validator = self._group_schema(group.fields)
+        segment = group.document_slice.extract(cleaned_text)
+        group_partial = {key: partial[key] for key in group.fields if key in partial}
+        group_key = "|".join(group.fields)
+        config_fingerprint = _prompt_fingerprint(
+            self.llm,
+            group.fields,
+            group.document_slice,
+            guidelines,
+            schema_subset,
+            CONFIG.llm_window_chars,
+            CONFIG.llm_window_overlap,
+            CONFIG.llm_num_ctx_max,
+            [self.field_settings.get_merge_rule(key) for key in group.fields],
+        )
+        segment_fingerprint = text_fingerprint(segment)
+        stored = previous.groups.get(group_key) if previous is not None else None
+        if (
+            stored is not None
+            and stored.config_fingerprint == config_fingerprint
+            and stored.segment_fingerprint == segment_fingerprint
+        ):
+            # Фрагмент группы не изменился — переиспользуем прошлый ответ LLM
+            llm_result = dict(stored.values)
+            llm_result.update(group_partial)
+            group_errors: List[Dict[str, Any]] = []
+            outcome.reused = True
+        else:
+            windows = split_windows(
+                segment,
+                _window_chars(self.llm, schema_subset, guidelines),
+                CONFIG.llm_window_overlap,
+            )
+            window_outcomes = [_GroupOutcome() for _ in windows]
+
+            async def extract_window(index: int, start: int, end: int):
+                queued = time.perf_counter()
+                async with semaphore:
+                    return await self._extract_group(
+                        group,
+                        segment[start:end],
+                        group_partial,
+                        schema_subset,
+                        group_validator,
+                        guidelines,
+                        window_outcomes[index],
+                        queue_ms=_elapsed_ms(queued),
+                    )
+
+            results = await _gather_cancelling(
+                extract_window(index, start, end) for index, (start, end) in enumerate(windows)
+            )
+            for (start, end), window_outcome in zip(windows, window_outcomes):
+                if len(windows) > 1:
+                    for call in window_outcome.calls:
+                        call["window"] = [start, end]
+                outcome.absorb(window_outcome)
+            if len(windows) == 1:
+                llm_result, group_errors = results[0]
+            else:
+                llm_result = merge_window_results(
+                    group.fields,
+                    [window_result for window_result, _ in results],
+                    self.field_settings.merge_rules,
+                )
+                # Значения правил приоритетнее ответов окон, как и при одном вызове
+                llm_result.update(group_partial)
+                group_errors = group_validator.validate(llm_result)
+        outcome.values = {key: llm_result[key] for key in group.fields if key in llm_result}
+        if not group_errors:
+            outcome.stored = StoredGroup(
+                fields=group.fields,
+                config_fingerprint=config_fingerprint,
+                segment_fingerprint=segment_fingerprint,
+                values=outcome.values,
+            )
+        return outcome
+
+    async def _find_previous(
+        self, previous_result_id: Optional[str], previous_text: Optional[str]
+    ) -> Optional[StoredResult]:
+        if previous_result_id:
+            previous = await self.result_store.aget(previous_result_id)
+            # Результат другого профиля получен с другой конфигурацией — не наш
+            return previous if previous is not None and previous.profile == self.profile else None
+        if previous_text:
+            return await self.result_store.afind_by_text(_clean_document(previous_text)[0], self.profile)
+        return None
+
+    async def run(
+        self,
+        text: str,
+        previous_result_id: Optional[str] = None,
+        previous_text: Optional[str] = None,
+        reuse_results: bool = True,
+        learn_counterparties: bool = True,
+    ) -> (
         Dict[str, Any],
         List[WarningItem],
         List[Dict[str, Any]],
         Dict[str, Any],
         str,
     ):
+        """Извлекает поля из текста договора.
+
+        Если передан ``previous_result_id`` (или ``previous_text``) ранее
+        обработанного документа, повторно вызываются только те группы LLM,
+        чей фрагмент текста или промпт изменился; остальные значения берутся
+        из сохранённого результата. Повторная отправка того же текста
+        обслуживается из хранилища без вызовов LLM (``REUSE_IDENTICAL_RESULTS``);
+        ``reuse_results=False`` отключает это для замеров, а
+        ``learn_counterparties=False`` не даёт пополнять реестр сторон
+        (``COUNTERPARTY_LEARNING``) по результату, например при оценке качества.
+
+        Одновременные вызовы с тем же нормализованным текстом и параметрами
+        выполняются один раз; остальные получают копию результата
+        (``debug["coalesced"]``). Ключ живёт в пайплайне, то есть в снимке
+        конфигурации, поэтому вызовы на разных версиях не объединяются.
+        """
+        return await self.run_prepared(
+            prepare_document(text), previous_result_id, previous_text, reuse_results, learn_counterparties
+        )
+
+    async def run_prepared(
+        self,
+        document: PreparedDocument,
+        previous_result_id: Optional[str] = None,
+        previous_text: Optional[str] = None,
+        reuse_results: bool = True,
+        learn_counterparties: bool = True,
+    ):
+        """То же, что ``run``, для документа, уже подготовленного ``prepare_document``
+        (например, в пуле процессов пакетной обработки)."""
+        # total_ms включает подготовку, где бы она ни выполнялась
+        run_started = time.perf_counter() - document.normalize_ms / 1000
+        cleaned_text = document.text
+        preprocess_report = document.preprocess_report
+        normalize_ms = document.normalize_ms
+
+        key = _fingerprint(
+            text_fingerprint(cleaned_text),
+            previous_result_id,
+            text_fingerprint(previous_text) if previous_text else None,
+            reuse_results,
+            learn_counterparties,
+        )
+        with TRACER.span("pipeline.run", {"document.chars": len(cleaned_text)}) as span:
+            result, shared = await self._inflight.run(
+                key,
+                lambda: self._run(
+                    cleaned_text,
+                    run_started,
+                    normalize_ms,
+                    preprocess_report,
+                    previous_result_id,
+                    previous_text,
+                    reuse_results,
+                    learn_counterparties,
+                ),
+            )
+            # Совпавший вызов ждёт чужой прогон: его стадии в трассе первого запроса
+            span.set_attribute("pipeline.coalesced", shared)
+        # Каждый вызывающий получает свою копию: ответ дополняется уже в main.py
+        data, warnings, errors, debug, prompt = copy.deepcopy(result)
+        if shared:
+            METRICS.increment("extraction_coalesced_total")
+            debug["coalesced"] = True
+        return data, warnings, errors, debug, prompt
+
+    async def _run(
+        self,
+        cleaned_text: str,
+        run_started: float,
+        normalize_ms: float,
+        preprocess_report: Optional[PreprocessReport],
+        previous_result_id: Optional[str],
+        previous_text: Optional[str],
+        reuse_results: bool,
+        learn_counterparties: bool,
+    ):
+        METRICS.increment("extraction_runs_total")
         warnings = []
+        timings: Dict[str, float] = {"normalize_ms": normalize_ms}
+        llm_calls: List[Dict[str, Any]] = []
+
+        # Короткая выжимка документа: эвристики краткого содержания работают только с ней
+        stage_started = time.perf_counter()
+        with TRACER.span("build_document_digest"):
+            digest = build_document_digest(cleaned_text)
+        timings["digest_ms"] = _elapsed_ms(stage_started)
 
-        cleaned_text = normalize_whitespace(text)
+        result_id = result_id_for(cleaned_text, self.profile)
+        previous = await self._find_previous(previous_result_id, previous_text)
+        if previous is None and reuse_results and CONFIG.reuse_identical_results:
+            # Тот же текст уже обрабатывался (в том числе другим воркером) — это кеш ответов
+            previous = await self.result_store.aget(result_id)
+        incremental: Dict[str, Any] | None = None
+        if previous_result_id or previous_text or previous is not None:
+            incremental = {
+                "previous_result_id": previous.result_id if previous else previous_result_id,
+                "previous_found": previous is not None,
+                "changed_spans": (
+                    [list(span) for span in diff_spans(previous.text, cleaned_text)]
+                    if previous is not None
+                    else []
+                ),
+                "reused_groups": [],
+                "rerun_groups": [],
+                "summary_reused": False,
+            }
+        stored_groups: Dict[str, StoredGroup] = {}
+        summary_fingerprint = ""
+        stored_summary_payload: Dict[str, Any] = {}
 
         summary_text = ""
         rationale_text = ""
@@ -77,10 +663,50 @@ class ExtractionPipeline:
         raw_outputs: List[str] = []
 
         if self.summary_llm is not None:
-            try:
-                summary_payload = await self.summary_llm.extract(cleaned_text, {})
-            except Exception:
-                summary_payload = {}
+            stage_started = time.perf_counter()
+            summary_fingerprint = _prompt_fingerprint(
+                self.summary_llm, self._summary_schema, CONFIG.llm_window_chars, CONFIG.llm_num_ctx_max
+            )
+            if (
+                previous is not None
+                and previous.text == cleaned_text
+                and previous.summary_fingerprint == summary_fingerprint
+            ):
+                # Текст не изменился — краткое содержание берём из прошлого результата
+                summary_payload = dict(previous.summary_payload)
+                stored_summary_payload = summary_payload
+                incremental["summary_reused"] = True
+            else:
+                # Краткое содержание строится по началу документа (одно окно)
+                summary_input = cleaned_text[: _window_chars(self.summary_llm, self._summary_schema)]
+                with TRACER.span("LLMExtractor.extract", {"llm.stage": "summary"}) as span:
+                    try:
+                        summary_call = await self.summary_llm.extract_call(summary_input, {})
+                    except Exception as exc:
+                        summary_payload = {}
+                        summary_fingerprint = ""
+                        span.set_error(f"{type(exc).__name__}: {exc}")
+                        llm_calls.append(
+                            {"stage": "summary", "failed": True, "duration_ms": _elapsed_ms(stage_started)}
+                        )
+                    else:
+                        summary_payload = summary_call.data
+                        stored_summary_payload = summary_payload
+                        llm_calls.append(
+                            _describe_llm_call(
+                                "summary",
+                                summary_call,
+                                self._summary_schema["properties"].keys(),
+                                DocumentSlice(),
+                                summary_input,
+                            )
+                        )
+                        span.set_attributes(_llm_span_attributes(llm_calls[-1]))
+                        if summary_call.prompt:
+                            prompts.append(summary_call.prompt)
+                        if summary_call.raw:
+                            raw_outputs.append(summary_call.raw)
+            timings["summary_llm_ms"] = _elapsed_ms(stage_started)
             candidate_summary = (
                 summary_payload.get("КраткоеСодержание")
                 if isinstance(summary_payload, dict)
@@ -131,51 +757,90 @@ class ExtractionPipeline:
                 contract_type = candidate_contract_type.strip()
             if isinstance(candidate_payment_method, str):
                 payment_method = candidate_payment_method.strip()
-                
-            if getattr(self.summary_llm, "last_prompt", ""):
-                prompts.append(self.summary_llm.last_prompt)
-            if getattr(self.summary_llm, "last_raw", ""):
-                raw_outputs.append(self.summary_llm.last_raw)
 
         # 1) Правила
-        partial = await self.rules.extract(cleaned_text, {})
+        stage_started = time.perf_counter()
+        with TRACER.span("RuleBasedExtractor.extract") as span:
+            partial = await self.rules.extract(cleaned_text, {})
+            span.set_attribute("rules.fields", len(partial))
+        timings["rules_ms"] = _elapsed_ms(stage_started)
+
+        # Стороны договора из реестра: уверенное совпадение приоритетнее правил и LLM
+        resolved_parties: Dict[str, str] = {}
+        gazetteer_debug: Dict[str, Any] | None = None
+        if self.gazetteer is not None:
+            stage_started = time.perf_counter()
+            with TRACER.span("CounterpartyGazetteer.resolve"):
+                resolved_parties, matches = self.gazetteer.resolve(cleaned_text)
+            resolved_parties = {
+                key: value
+                for key, value in resolved_parties.items()
+                if self.field_settings.is_enabled(key)
+            }
+            partial.update(resolved_parties)
+            METRICS.increment("gazetteer_fields_resolved_total", len(resolved_parties))
+            gazetteer_debug = {
+                "resolved": resolved_parties,
+                "matches": [match.to_dict() for match in matches],
+                "learned": [],
+            }
+            timings["gazetteer_ms"] = _elapsed_ms(stage_started)
+        resolved_fields = set(resolved_parties)
+
+        # Код ОКПД2 по классификатору: уверенный результат не запрашивается у LLM
+        okpd2_debug: Dict[str, Any] | None = None
+        if self.field_settings.is_enabled(OKPD2_FIELD):
+            stage_started = time.perf_counter()
+            with TRACER.span("okpd2.resolve"):
+                local_okpd2, okpd2_debug = self._resolve_okpd2(digest, preprocess_report)
+            if local_okpd2 is not None:
+                partial[OKPD2_FIELD] = local_okpd2
+                resolved_fields.add(OKPD2_FIELD)
+            timings["okpd2_ms"] = _elapsed_ms(stage_started)
 
         # 2) LLM (если включен)
         prompt = ""
         if self.llm is not None:
-            self.field_settings.refresh_prompts()
-            aggregated = dict(partial)
-            for group in self.field_settings.build_llm_groups():
-                schema_subset = self.field_settings.build_schema_subset(
-                    self.schema, group.fields
+            stage_started = time.perf_counter()
+            # Группы независимы (поле входит в одну группу), поэтому их можно
+            # вызывать параллельно; результаты сливаются в исходном порядке групп.
+            # Семафор ограничивает число одновременных вызовов LLM (групп и окон).
+            semaphore = asyncio.Semaphore(max(CONFIG.llm_group_concurrency, 1))
+            groups = self._active_groups(frozenset(resolved_fields))
+            with TRACER.span("llm_groups", {"llm.groups": len(groups)}):
+                outcomes = await _gather_cancelling(
+                    self._process_group(group, guidelines, cleaned_text, partial, previous, semaphore)
+                    for group, guidelines in groups
                 )
-                guidelines = self.field_settings.build_guidelines_bundle(group.fields)
-                segment = group.document_slice.extract(cleaned_text)
-                group_partial = {
-                    key: aggregated[key]
-                    for key in group.fields
-                    if key in aggregated
-                }
-                llm_result = await self.llm.extract(
-                    segment,
-                    group_partial,
-                    schema_override=schema_subset,
-                    field_guidelines=guidelines,
+            aggregated = dict(partial)
+            llm_assigned: set = set()
+            for (group, _), outcome in zip(groups, outcomes):
+                llm_calls.extend(outcome.calls)
+                prompts.extend(outcome.prompts)
+                raw_outputs.extend(outcome.raw_outputs)
+                if incremental is not None:
+                    key = "reused_groups" if outcome.reused else "rerun_groups"
+                    incremental[key].append(list(group.fields))
+                if outcome.stored is not None:
+                    stored_groups["|".join(group.fields)] = outcome.stored
+                # Если поле попало в несколько групп, остаётся ответ первой из них
+                aggregated.update(
+                    {key: value for key, value in outcome.values.items() if key not in llm_assigned}
                 )
-                for field in group.fields:
-                    if field in llm_result:
-                        aggregated[field] = llm_result[field]
-                if self.llm.last_prompt:
-                    prompts.append(self.llm.last_prompt)
-                if getattr(self.llm, "last_raw", ""):
-                    raw_outputs.append(self.llm.last_raw)
+                llm_assigned.update(outcome.values)
             data = aggregated
             prompt = "\n\n-----\n\n".join(prompts)
+            timings["llm_groups_ms"] = _elapsed_ms(stage_started)
         else:
             data = partial
 
-        if okpd2_code:
-            data["ОЭЗ_ОКПД2"] = okpd2_code
+        if okpd2_code and OKPD2_FIELD not in resolved_fields:
+            data[OKPD2_FIELD] = okpd2_code
+        if okpd2_debug is not None:
+            if OKPD2_FIELD not in resolved_fields:
+                warnings.extend(self._normalize_okpd2(data))
+                okpd2_debug["source"] = "llm"
+            okpd2_debug["code"] = data.get(OKPD2_FIELD)
         
         if contract_term:
             data["СрокДоговора"] = contract_term
@@ -195,36 +860,98 @@ class ExtractionPipeline:
             if not isinstance(existing_payment_method, str) or not existing_payment_method.strip():
                 data["СпособОплаты"] = payment_method
                 
-        # 3) Валидация
-        filtered_data = self.field_settings.filter_payload(data)
-        errors = self.validator.validate(filtered_data)
+        # 3) Вычисляемые поля (сумма прописью, НДС) — по уже извлечённым значениям
+        derived_fields: List[str] = []
+        if self._derived_fields:
+            stage_started = time.perf_counter()
+            with TRACER.span("apply_derived_fields"):
+                derived_fields, derived_warnings = apply_derived_fields(data, self._derived_fields)
+            warnings.extend(derived_warnings)
+            timings["derived_ms"] = _elapsed_ms(stage_started)
+
+        # 4) Валидация
+        stage_started = time.perf_counter()
+        with TRACER.span("SchemaValidator.validate") as span:
+            filtered_data = self.field_settings.filter_payload(data)
+            errors = self.validator.validate(filtered_data)
+            span.set_attribute("validation.errors", len(errors))
+        timings["validation_ms"] = _elapsed_ms(stage_started)
 
+        stage_started = time.perf_counter()
         if not summary_text:
-            summary_text = build_short_summary(filtered_data, cleaned_text)
+            summary_text = build_short_summary(filtered_data, digest)
         if summary_text:
             filtered_data["КраткоеСодержание"] = summary_text
 
         if not rationale_text:
-            rationale_text = build_selection_rationale(filtered_data, cleaned_text)
+            rationale_text = build_selection_rationale(filtered_data, digest)
         if rationale_text:
             filtered_data["ОбоснованиеВыбора"] = rationale_text
+        timings["summary_fallback_ms"] = _elapsed_ms(stage_started)
+
+        # 5) Дополнительные предупреждения: расхождение НДС (если НДС не вычислен выше —
+        # там сверка уже сделана)
+        if "СуммаНДС" not in derived_fields:
+            try:
+                vat = float(data.get("СуммаНДС")) if data.get("СуммаНДС") is not None else None
+                total = float(data.get("Сумма")) if data.get("Сумма") is not None else None
+                rate = float(data.get("СтавкаНДС")) if data.get("СтавкаНДС") is not None else None
+                if vat is not None and total is not None and rate is not None and rate > 0:
+                    expected_vat = round(total * rate / (100 + rate), 2)
+                    if abs(expected_vat - vat) > 0.1:
+                        warnings.append(WarningItem(code="vat_mismatch", message=f"НДС в документе {vat}, расчётное значение {expected_vat} при ставке {rate}%"))
+            except Exception:
+                pass
+
+        # Новые контрагенты с ИНН запоминаются, чтобы в следующих договорах не спрашивать
+        # LLM; только из результатов, прошедших проверку схемы
+        if (
+            self.gazetteer is not None
+            and CONFIG.counterparty_learning
+            and learn_counterparties
+            and not errors
+        ):
+            learned = self.gazetteer.learn(
+                cleaned_text,
+                {key: value for key, value in filtered_data.items() if key not in resolved_parties},
+            )
+            if learned:
+                METRICS.increment("gazetteer_entries_learned_total", len(learned))
+                gazetteer_debug["learned"] = [item.value for item in learned]
+                await asyncio.to_thread(self.gazetteer.save)
+
+        await self.result_store.aput(
+            StoredResult(
+                result_id=result_id,
+                text=cleaned_text,
+                groups=stored_groups,
+                summary_fingerprint=summary_fingerprint,
+                summary_payload=stored_summary_payload,
+                profile=self.profile,
+            )
+        )
 
-        # 4) Дополнительные предупреждения (пример: расхождение НДС)
-        try:
-            vat = float(data.get("СуммаНДС")) if data.get("СуммаНДС") is not None else None
-            total = float(data.get("Сумма")) if data.get("Сумма") is not None else None
-            rate = float(data.get("СтавкаНДС")) if data.get("СтавкаНДС") is not None else None
-            if vat is not None and total is not None and rate is not None and rate > 0:
-                expected_vat = round(total * rate / (100 + rate), 2)
-                if abs(expected_vat - vat) > 0.1:
-                    warnings.append(WarningItem(code="vat_mismatch", message=f"НДС в документе {vat}, расчётное значение {expected_vat} при ставке {rate}%"))
-        except Exception:
-            pass
+        METRICS.increment("llm_calls_total", len(llm_calls))
+        if incremental is not None:
+            METRICS.increment("llm_groups_reused_total", len(incremental["reused_groups"]))
 
+        timings["total_ms"] = _elapsed_ms(run_started)
         debug = {
+            "result_id": result_id,
             "disabled_fields": ", ".join(sorted(self.field_settings.disabled_fields())),
             "llm_raw_outputs": raw_outputs,
+            "llm_calls": llm_calls,
+            "derived_fields": derived_fields,
+            "timings": timings,
         }
+        if preprocess_report is not None:
+            debug["preprocess"] = preprocess_report.to_dict()
+        if gazetteer_debug is not None:
+            debug["gazetteer"] = gazetteer_debug
+        if okpd2_debug is not None:
+            debug["okpd2"] = okpd2_debug
+        if incremental is not None:
+            debug["incremental"] = incremental
 
         prompt = normalize_whitespace(prompt) if prompt else ""
 
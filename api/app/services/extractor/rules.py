@@ -5,7 +5,10 @@ from ..normalize import normalize_whitespace, extract_number
 
 class RuleBasedExtractor(BaseExtractor):
     SUM_PAT = re.compile(r'(?:итого|сумма\s*договора)\s*[:\-]?\s*([0-9\s\u00A0.,]+)', re.IGNORECASE)
-    VAT_PAT = re.compile(r'НДС\s*(?:[:\-]?\s*)?([0-9\s\u00A0.,]+)', re.IGNORECASE)
+    # Ставку («НДС 20% - 202 602») пропускаем: число, за которым идёт %, суммой не считается
+    VAT_PAT = re.compile(
+        r'НДС\s*(?:\(?\d{1,2}\s*%\)?\s*)?[:\-–—]?\s*([0-9][0-9\s\u00A0.,]*+)(?!%)', re.IGNORECASE
+    )
     VAT_RATE_PAT = re.compile(r'(?:ставка\s*ндс|ндс)\s*[:\-]?\s*(\d{1,2})\s*%?', re.IGNORECASE)
 
     _ORG_PREFIX = r'(?:[AА][OО]|[OО]{3}|[PР][AА][OО]|[ZЗ][AА][OО])'
@@ -0,0 +1,440 @@
+"""Known contract parties matched in the document text without the LLM.
+
+Entries come from a registry file (``assets/counterparties.json``) and from
+earlier extraction results ("learned" entries, optionally persisted). Names
+are indexed in a word-level trie, so one pass over the document finds every
+known name; INN numbers are looked up in a dictionary.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import threading
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ..core.config_store import atomic_write_text
+from ..core.config_store import assets_fingerprint
+
+logger = logging.getLogger(__name__)
+
+ORGANIZATION_FIELD = "Организация"
+COUNTERPARTY_FIELD = "Контрагент"
+
+# Уверенность совпадения: по ИНН, по названию с формой собственности, по названию без неё
+INN_CONFIDENCE = 1.0
+NAME_CONFIDENCE = 0.9
+CORE_NAME_CONFIDENCE = 0.7
+
+_LEGAL_FORMS: Dict[str, Tuple[str, ...]] = {
+    "ООО": ("общество", "с", "ограниченной", "ответственностью"),
+    "ПАО": ("публичное", "акционерное", "общество"),
+    "НАО": ("непубличное", "акционерное", "общество"),
+    "ЗАО": ("закрытое", "акционерное", "общество"),
+    "ОАО": ("открытое", "акционерное", "общество"),
+    "АО": ("акционерное", "общество"),
+    "ИП": ("индивидуальный", "предприниматель"),
+}
+_FORM_BY_ABBREVIATION = {abbreviation.lower(): abbreviation for abbreviation in _LEGAL_FORMS}
+# Длинные формы проверяются первыми («публичное акционерное общество» раньше «акционерного общества»)
+_FULL_FORMS = sorted(_LEGAL_FORMS.items(), key=lambda item: -len(item[1]))
+
+_WORD_RE = re.compile(r"[0-9a-zа-я]+")
+_PARENTHESES_RE = re.compile(r"\([^)]*\)")
+_QUOTES_RE = re.compile(r"[«»\"“”„']")
+_INN_RE = re.compile(
+    r"ИНН(?:\s*/?\s*КПП)?\s*[:№]?\s*(\d{12}|\d{10})\b(?:\s*/?\s*(?:КПП\s*[:№]?\s*)?(\d{9})\b)?",
+    re.IGNORECASE,
+)
+# Насколько далеко после названия стороны искать её ИНН (блок реквизитов)
+_INN_LOOKAHEAD_CHARS = 600
+# Роль стороны рядом с упоминанием: «Поставщик: ООО …» или «ООО …, именуемое в дальнейшем …».
+# Без неё организация может быть просто упомянута в договоре (производитель, банк)
+_PARTY_ROLE_RE = re.compile(
+    r"поставщик|покупател|продав[её]ц|заказчик|исполнител|подрядчик|арендатор|арендодател"
+    r"|лицензиа[рт]|получател|именуем",
+    re.IGNORECASE,
+)
+_NOT_PARTY_RE = re.compile(r"производ|изготов", re.IGNORECASE)
+_ROLE_LOOKBEHIND_CHARS = 200
+_ROLE_LOOKAHEAD_CHARS = 150
+_TERMINAL = ""
+
+
+def _has_party_role(text: str, position: int) -> bool:
+    """Указана ли рядом с упоминанием роль стороны договора (до него или «именуемое» после)."""
+    before = text[max(position - _ROLE_LOOKBEHIND_CHARS, 0) : position]
+    roles = list(_PARTY_ROLE_RE.finditer(before))
+    if roles and not _NOT_PARTY_RE.search(before[roles[-1].end() :]):
+        return True
+    after = text[position : position + _ROLE_LOOKAHEAD_CHARS]
+    return "именуем" in _fold(after)
+
+
+def _fold(text: str) -> str:
+    return text.lower().replace("ё", "е")
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(_fold(text))
+
+
+def valid_inn(inn: str) -> bool:
+    """Проверяет контрольные цифры ИНН (10 цифр — организация, 12 — ИП)."""
+    if not inn.isdigit() or len(inn) not in (10, 12):
+        return False
+    digits = [int(char) for char in inn]
+
+    def check(weights: Sequence[int]) -> int:
+        return sum(weight * digit for weight, digit in zip(weights, digits)) % 11 % 10
+
+    if len(inn) == 10:
+        return check((2, 4, 10, 3, 5, 9, 4, 6, 8)) == digits[9]
+    return (
+        check((7, 2, 4, 10, 3, 5, 9, 4, 6, 8)) == digits[10]
+        and check((3, 7, 2, 4, 10, 3, 5, 9, 4, 6, 8)) == digits[11]
+    )
+
+
+def split_legal_form(name: str) -> Tuple[Optional[str], List[str]]:
+    """Делит название на форму собственности (аббревиатура) и слова самого названия.
+
+    Понимает «ООО «Ромашка»», «Общество с ограниченной ответственностью «Ромашка»»
+    и запись справочника 1С «Ромашка ООО (ИНН:… КПП:…)».
+    """
+    words = _words(_PARENTHESES_RE.sub(" ", name))
+    if words and words[0] in _FORM_BY_ABBREVIATION:
+        return _FORM_BY_ABBREVIATION[words[0]], words[1:]
+    for abbreviation, full in _FULL_FORMS:
+        if tuple(words[: len(full)]) == full:
+            return abbreviation, words[len(full):]
+    if words and words[-1] in _FORM_BY_ABBREVIATION:
+        return _FORM_BY_ABBREVIATION[words[-1]], words[:-1]
+    return None, words
+
+
+def _display_core(name: str) -> str:
+    """Название без формы собственности и кавычек, с исходным регистром."""
+    text = _QUOTES_RE.sub(" ", _PARENTHESES_RE.sub(" ", name))
+    form, _ = split_legal_form(name)
+    if form is not None:
+        lowered = _fold(text).strip()
+        for variant in (form.lower(), " ".join(_LEGAL_FORMS[form])):
+            if lowered.startswith(variant):
+                text = text.strip()[len(variant):]
+                break
+            if lowered.endswith(variant):
+                text = text.strip()[: -len(variant)]
+                break
+    return " ".join(text.split())
+
+
+def counterparty_value(name: str, inn: str, kpp: str = "") -> str:
+    """Запись контрагента в формате справочника 1С: «ИНСНАБ ООО (ИНН:1650381764 КПП:165001001)»."""
+    form, _ = split_legal_form(name)
+    title = " ".join(part for part in (_display_core(name), form or "") if part)
+    requisites = " ".join(part for part in (f"ИНН:{inn}" if inn else "", f"КПП:{kpp}" if kpp else "") if part)
+    return f"{title} ({requisites})" if requisites else title
+
+
+@dataclass(frozen=True)
+class Counterparty:
+    # Значение поля в ответе сервиса
+    value: str
+    name: str = ""
+    inn: str = ""
+    kpp: str = ""
+    # Своя организация заполняет «Организация», остальные — «Контрагент»
+    own: bool = False
+    aliases: Tuple[str, ...] = ()
+    source: str = "registry"
+
+    @property
+    def key(self) -> str:
+        return self.inn or " ".join(split_legal_form(self.name or self.value)[1])
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any], source: str, own: bool = False) -> "Counterparty":
+        value = str(data.get("value") or data.get("name") or "").strip()
+        if not value:
+            raise ValueError(f"Counterparty entry without a name: {data}")
+        return Counterparty(
+            value=value,
+            name=str(data.get("name") or value),
+            inn=str(data.get("inn") or ""),
+            kpp=str(data.get("kpp") or ""),
+            own=bool(data.get("own", own)),
+            aliases=tuple(str(alias) for alias in data.get("aliases") or ()),
+            source=source,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["aliases"] = list(self.aliases)
+        data.pop("source")
+        return data
+
+    def patterns(self) -> Iterable[Tuple[Tuple[str, ...], float]]:
+        """Последовательности слов, по которым сторону узнают в тексте."""
+        for name in dict.fromkeys((self.name, self.value, *self.aliases)):
+            form, core = split_legal_form(name)
+            if not core:
+                continue
+            if form is not None:
+                yield (form.lower(), *core), NAME_CONFIDENCE
+                yield (*_LEGAL_FORMS[form], *core), NAME_CONFIDENCE
+                yield (*core, form.lower()), NAME_CONFIDENCE
+            # Название без формы собственности: только подсказка, если оно не слишком короткое
+            if len(core) > 1 or len(core[0]) >= 6:
+                yield tuple(core), CORE_NAME_CONFIDENCE
+
+
+@dataclass(frozen=True)
+class GazetteerMatch:
+    counterparty: Counterparty
+    confidence: float
+    position: int
+    matched_by: str
+    # Рядом хотя бы с одним упоминанием указана роль стороны договора
+    party_role: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "value": self.counterparty.value,
+            "own": self.counterparty.own,
+            "source": self.counterparty.source,
+            "confidence": self.confidence,
+            "position": self.position,
+            "matched_by": self.matched_by,
+            "party_role": self.party_role,
+        }
+
+
+@dataclass
+class _Index:
+    entries: Dict[str, Counterparty] = field(default_factory=dict)
+    by_inn: Dict[str, Counterparty] = field(default_factory=dict)
+    trie: Dict[str, Any] = field(default_factory=dict)
+
+    def add(self, counterparty: Counterparty) -> None:
+        self.entries[counterparty.key] = counterparty
+        if counterparty.inn:
+            self.by_inn[counterparty.inn] = counterparty
+        for words, confidence in counterparty.patterns():
+            node = self.trie
+            for word in words:
+                node = node.setdefault(word, {})
+            terminal = node.setdefault(_TERMINAL, {})
+            if terminal.get(counterparty.key, 0.0) < confidence:
+                terminal[counterparty.key] = confidence
+
+
+class CounterpartyGazetteer:
+    """Finds registry and learned parties in a document and fills the party fields.
+
+    Only matches at or above ``min_confidence`` fill a field: the own
+    organization goes to «Организация»; «Контрагент» is filled only when exactly
+    one other known party is matched with the top confidence and is named as a
+    party of the contract (a role such as «Поставщик» next to a mention).
+    Own organizations come from the registry only; learning adds counterparties.
+    """
+
+    def __init__(
+        self,
+        registry_path: Path,
+        learned_path: Optional[Path] = None,
+        min_confidence: float = NAME_CONFIDENCE,
+    ):
+        self._registry_path = registry_path
+        self._learned_path = learned_path
+        self.min_confidence = min_confidence
+        # _lock — изменения индекса и снятие копий с него (короткие, в том числе из
+        # event loop); _file_lock — чтение и запись файлов в save/reload_if_changed
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._fingerprint = ""
+        self._index = _Index()
+        self.reload_if_changed(force=True)
+
+    def __len__(self) -> int:
+        return len(self._index.entries)
+
+    def _watched_paths(self) -> List[Path]:
+        return [path for path in (self._registry_path, self._learned_path) if path is not None]
+
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """Перестраивает индекс, если изменился реестр или файл выученных записей."""
+        with self._file_lock:
+            fingerprint = assets_fingerprint(self._watched_paths())
+            if not force and fingerprint == self._fingerprint:
+                return False
+            index = _Index()
+            try:
+                for counterparty in self._read_registry():
+                    index.add(counterparty)
+                for counterparty in self._read_learned():
+                    # Реестр приоритетнее выученных записей с тем же ИНН
+                    if counterparty.key not in index.entries:
+                        index.add(counterparty)
+            except (OSError, ValueError) as exc:
+                self._fingerprint = fingerprint
+                logger.warning("Counterparty registry is not reloaded: %s", exc)
+                return False
+            with self._lock:
+                self._index = index
+                self._fingerprint = fingerprint
+        logger.info("Counterparty gazetteer loaded, %s entries", len(index.entries))
+        return True
+
+    async def watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.reload_if_changed)
+            except Exception:  # pragma: no cover - defensive safeguard
+                logger.exception("Unexpected error while checking the counterparty registry")
+
+    def _read_registry(self) -> List[Counterparty]:
+        if not self._registry_path.exists():
+            return []
+        data = json.loads(self._registry_path.read_text(encoding="utf-8"))
+        if not isinstance(data, dict):
+            raise ValueError(f"{self._registry_path}: expected a JSON object")
+        return [
+            Counterparty.from_dict(item, "registry", own=own)
+            for key, own in (("organizations", True), ("counterparties", False))
+            for item in data.get(key) or ()
+        ]
+
+    def _read_learned(self) -> List[Counterparty]:
+        if self._learned_path is None or not self._learned_path.exists():
+            return []
+        data = json.loads(self._learned_path.read_text(encoding="utf-8"))
+        # Свои организации задаются только реестром, даже если в файле записано иное
+        return [replace(Counterparty.from_dict(item, "learned"), own=False) for item in data or ()]
+
+    def match(self, text: str) -> List[GazetteerMatch]:
+        """Все известные стороны в тексте: лучшее совпадение на каждую, в порядке появления."""
+        index = self._index
+        best: Dict[str, GazetteerMatch] = {}
+        with_role: set = set()
+
+        def offer(counterparty: Counterparty, confidence: float, position: int, matched_by: str) -> None:
+            if counterparty.key not in with_role and _has_party_role(text, position):
+                with_role.add(counterparty.key)
+            current = best.get(counterparty.key)
+            if current is None or (confidence, -position) > (current.confidence, -current.position):
+                best[counterparty.key] = GazetteerMatch(counterparty, confidence, position, matched_by)
+
+        for found in _INN_RE.finditer(text):
+            counterparty = index.by_inn.get(found.group(1))
+            if counterparty is not None:
+                offer(counterparty, INN_CONFIDENCE, found.start(), "inn")
+
+        if index.trie:
+            tokens = [(token.group(), token.start()) for token in _WORD_RE.finditer(_fold(text))]
+            for start in range(len(tokens)):
+                node = index.trie.get(tokens[start][0])
+                offset = start
+                while node is not None:
+                    for key, confidence in node.get(_TERMINAL, {}).items():
+                        offer(index.entries[key], confidence, tokens[start][1], "name")
+                    offset += 1
+                    if offset >= len(tokens):
+                        break
+                    node = node.get(tokens[offset][0])
+        matches = [replace(match, party_role=key in with_role) for key, match in best.items()]
+        return sorted(matches, key=lambda match: match.position)
+
+    def resolve(self, text: str) -> Tuple[Dict[str, str], List[GazetteerMatch]]:
+        """Значения полей сторон по уверенным совпадениям и все найденные совпадения."""
+        matches = self.match(text)
+        confident = [match for match in matches if match.confidence >= self.min_confidence]
+        values: Dict[str, str] = {}
+        own = [match for match in confident if match.counterparty.own]
+        if own:
+            top = max(match.confidence for match in own)
+            values[ORGANIZATION_FIELD] = next(m for m in own if m.confidence == top).counterparty.value
+        # Упомянутая без роли организация (производитель, банк) контрагентом не считается
+        others = [
+            match for match in confident if not match.counterparty.own and match.party_role
+        ]
+        if others:
+            top = max(match.confidence for match in others)
+            leaders = [match for match in others if match.confidence == top]
+            # Несколько равноправных кандидатов — решать будет LLM
+            if len(leaders) == 1:
+                values[COUNTERPARTY_FIELD] = leaders[0].counterparty.value
+        return values, matches
+
+    def learn(self, text: str, data: Dict[str, Any]) -> List[Counterparty]:
+        """Запоминает «Контрагент» из результата извлечения, если рядом с названием
+        в тексте указан корректный ИНН, которого ещё нет в индексе.
+
+        «Организация» не запоминается: свои организации задаются только реестром,
+        а перепутанные LLM стороны сделали бы поставщика своей организацией.
+        """
+        value = data.get(COUNTERPARTY_FIELD)
+        if not isinstance(value, str) or not value.strip():
+            return []
+        requisites = self._requisites_after(text, value)
+        if requisites is None:
+            return []
+        inn, kpp = requisites
+        counterparty = Counterparty(
+            value=counterparty_value(value, inn, kpp),
+            name=value.strip(),
+            inn=inn,
+            kpp=kpp,
+            source="learned",
+        )
+        # Индекс дополняется на месте: перестраивать его целиком не нужно. Под
+        # замком — save() в другом потоке в это время снимает копию записей
+        with self._lock:
+            if inn in self._index.by_inn:
+                return []
+            self._index.add(counterparty)
+        return [counterparty]
+
+    def _requisites_after(self, text: str, name: str) -> Optional[Tuple[str, str]]:
+        form, core = split_legal_form(name)
+        if not core:
+            return None
+        folded = _fold(text)
+        pattern = re.compile(r"\b" + r"[^0-9a-zа-я]+".join(map(re.escape, core)) + r"\b")
+        # Реквизиты обычно в конце договора — идём от последнего упоминания
+        for found in reversed(list(pattern.finditer(folded))):
+            window = text[found.end() : found.end() + _INN_LOOKAHEAD_CHARS]
+            inn_match = _INN_RE.search(window)
+            if inn_match is None:
+                continue
+            between = _words(window[: inn_match.start()])
+            # Между названием и ИНН не должно быть другой организации
+            if any(word in _FORM_BY_ABBREVIATION for word in between):
+                continue
+            inn = inn_match.group(1)
+            if valid_inn(inn):
+                return inn, inn_match.group(2) or ""
+        return None
+
+    def save(self) -> None:
+        """Записывает выученные записи (вместе с уже сохранёнными другими воркерами)."""
+        if self._learned_path is None:
+            return
+        with self._file_lock:
+            with self._lock:
+                learned = [item for item in self._index.entries.values() if item.source == "learned"]
+            stored = {item.key: item for item in self._read_learned()}
+            for counterparty in learned:
+                stored.setdefault(counterparty.key, counterparty)
+            content = json.dumps(
+                [item.to_dict() for item in stored.values()], ensure_ascii=False, indent=2
+            )
+            atomic_write_text(self._learned_path, content)
+            # Собственную запись перечитывать не нужно
+            fingerprint = assets_fingerprint(self._watched_paths())
+            with self._lock:
+                self._fingerprint = fingerprint
@@ -0,0 +1,248 @@
+"""Offline OKPD2 classifier: code validation, normalization and keyword suggestions.
+
+The bundled ``assets/okpd2.json`` holds all two-digit classes and a subset of
+detailed codes that occur in the zone's procurement. Codes are kept in a
+digit trie, so a lookup, the nearest known ancestor and the summary category
+of a code all cost O(length of the code). Keyword stems form an inverted
+index used to suggest a code from item names without calling the LLM.
+"""
+from __future__ import annotations
+
+import json
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+OKPD2_FIELD = "ОЭЗ_ОКПД2"
+DEFAULT_OKPD2_PATH = Path(__file__).resolve().parent.parent / "assets" / "okpd2.json"
+
+# Длины кода без точек: класс, подкласс, группа, подгруппа, вид, категория/подкатегория
+_CODE_LENGTHS = (2, 3, 4, 5, 6, 9)
+# Без точек код узнаётся только по длине класса, вида или категории: «2025» — это год
+_BARE_CODE_LENGTHS = (2, 6, 9)
+_CODE_RE = re.compile(r"(?<![\d.])(\d{2}(?:\.\d{1,2}){0,2}(?:\.\d{3})?|\d{2,9})(?![\d.]*\d)")
+_WORD_RE = re.compile(r"[a-zа-я0-9-]+")
+_MIN_STEM_CHARS = 3
+
+
+def format_code(digits: str) -> str:
+    """Код с точками по цифрам: ``262011`` → ``26.20.11``, ``262011110`` → ``26.20.11.110``."""
+    parts = [digits[index : index + 2] for index in range(0, min(len(digits), 6), 2)]
+    if len(digits) > 6:
+        parts.append(digits[6:])
+    return ".".join(parts)
+
+
+def normalize_code(value: Any) -> Optional[str]:
+    """Первый код ОКПД2 в значении в каноническом виде или ``None``.
+
+    Понимает «26.20.11», «ОКПД2: 26.20.11.110», «26 20 11» и «262011».
+    Число без точек из 3–5 или 7–8 цифр кодом не считается.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    text = str(value).strip()
+    if not text:
+        return None
+    spaced = re.fullmatch(r"(?:окпд\s*2?\s*:?\s*)?(\d{2}(?:\s+\d{1,3}){0,3})", text, re.IGNORECASE)
+    if spaced:
+        text = spaced.group(1).replace(" ", ".")
+    match = _CODE_RE.search(text)
+    if match is None:
+        return None
+    raw = match.group(1)
+    digits = _digits(raw)
+    if len(digits) not in _CODE_LENGTHS:
+        return None
+    if "." not in raw and len(digits) not in _BARE_CODE_LENGTHS:
+        return None
+    code = format_code(digits)
+    # «26.20.110» — не код: точки должны стоять по разрядам классификатора
+    return code if "." not in raw or raw == code else None
+
+
+def _digits(code: str) -> str:
+    return code.replace(".", "")
+
+
+def _stem_words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower().replace("ё", "е"))
+
+
+@dataclass(frozen=True)
+class OKPD2Entry:
+    code: str
+    name: str
+    # Категория для краткого содержания (в родительном падеже, после «приобретение»)
+    category: str = ""
+    keywords: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class OKPD2Check:
+    value: Any
+    code: Optional[str]
+    # Самая точная известная запись: сам код или ближайший известный предок
+    entry: Optional[OKPD2Entry]
+
+    @property
+    def exact(self) -> bool:
+        """Код есть в классификаторе."""
+        return self.entry is not None and self.entry.code == self.code
+
+    @property
+    def known(self) -> bool:
+        """Известен код или его предок (хотя бы класс): годится для проверки
+        ответа LLM, но не для поиска кода в тексте — под него подходят даты."""
+        return self.entry is not None
+
+
+@dataclass(frozen=True)
+class OKPD2Suggestion:
+    code: str
+    name: str
+    hits: int
+    confidence: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "code": self.code,
+            "name": self.name,
+            "hits": self.hits,
+            "confidence": self.confidence,
+        }
+
+
+@dataclass
+class _Node:
+    children: Dict[str, "_Node"] = field(default_factory=dict)
+    entry: Optional[OKPD2Entry] = None
+    # Категория ближайшего предка с категорией (включая сам узел)
+    category: str = ""
+
+
+class OKPD2Classifier:
+    """Digit trie of OKPD2 codes plus an inverted index of keyword stems."""
+
+    def __init__(self, entries: Iterable[OKPD2Entry]):
+        self._root = _Node()
+        self._entries: Dict[str, OKPD2Entry] = {}
+        # Первая основа ключевого слова → (остальные основы, код)
+        self._keywords: Dict[str, List[Tuple[Tuple[str, ...], str]]] = {}
+        # Родители раньше потомков, чтобы категории наследовались при вставке
+        for entry in sorted(entries, key=lambda item: len(_digits(item.code))):
+            self._add(entry)
+
+    @classmethod
+    def from_file(cls, path: Path) -> "OKPD2Classifier":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if not isinstance(data, list):
+            raise ValueError(f"{path}: expected a list of OKPD2 entries")
+        return cls(
+            OKPD2Entry(
+                code=str(item["code"]),
+                name=str(item.get("name", "")),
+                category=str(item.get("category", "")),
+                keywords=tuple(str(keyword) for keyword in item.get("keywords", ())),
+            )
+            for item in data
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _add(self, entry: OKPD2Entry) -> None:
+        if normalize_code(entry.code) != entry.code:
+            raise ValueError(f"Invalid OKPD2 code in the classifier: {entry.code!r}")
+        node = self._root
+        for digit in _digits(entry.code):
+            child = node.children.get(digit)
+            if child is None:
+                child = node.children[digit] = _Node(category=node.category)
+            node = child
+        node.entry = entry
+        if entry.category:
+            node.category = entry.category
+        self._entries[entry.code] = entry
+        for keyword in entry.keywords:
+            stems = tuple(_stem_words(keyword))
+            if stems and len(stems[0]) >= _MIN_STEM_CHARS:
+                self._keywords.setdefault(stems[0], []).append((stems[1:], entry.code))
+
+    def _walk(self, code: str) -> Tuple[Optional[OKPD2Entry], str]:
+        """Ближайшая известная запись и категория по префиксу кода."""
+        node: Optional[_Node] = self._root
+        entry: Optional[OKPD2Entry] = None
+        category = ""
+        for digit in _digits(code):
+            node = node.children.get(digit)
+            if node is None:
+                break
+            entry = node.entry or entry
+            category = node.category
+        return entry, category
+
+    def get(self, code: str) -> Optional[OKPD2Entry]:
+        return self._entries.get(code)
+
+    def check(self, value: Any) -> OKPD2Check:
+        """Нормализует значение и находит код (или ближайшего предка) в классификаторе."""
+        code = normalize_code(value)
+        if code is None:
+            return OKPD2Check(value, None, None)
+        entry, _ = self._walk(code)
+        return OKPD2Check(value, code, entry)
+
+    def category(self, code: str) -> str:
+        """Категория краткого содержания для кода: от самого точного известного префикса."""
+        code = normalize_code(code) or ""
+        return self._walk(code)[1] if code else ""
+
+    def suggest(self, texts: Iterable[str], limit: int = 3) -> List[OKPD2Suggestion]:
+        """Коды по ключевым словам в названиях позиций (каждый текст — одна позиция).
+
+        Позиция голосует за код самого длинного найденного ключевого слова;
+        уверенность — доля позиций, проголосовавших за код.
+        """
+        votes: Dict[str, int] = {}
+        voters = 0
+        for text in texts:
+            code = self._match_text(_stem_words(text))
+            if code is not None:
+                votes[code] = votes.get(code, 0) + 1
+                voters += 1
+        ranked = sorted(votes.items(), key=lambda item: -item[1])[:limit]
+        return [
+            OKPD2Suggestion(code, self._entries[code].name, hits, round(hits / voters, 3))
+            for code, hits in ranked
+        ]
+
+    def _match_text(self, words: List[str]) -> Optional[str]:
+        best: Tuple[int, Optional[str]] = (0, None)
+        for position, word in enumerate(words):
+            for length in range(_MIN_STEM_CHARS, len(word) + 1):
+                for rest, code in self._keywords.get(word[:length], ()):
+                    following = words[position + 1 : position + 1 + len(rest)]
+                    if len(following) == len(rest) and all(
+                        candidate.startswith(stem) for candidate, stem in zip(following, rest)
+                    ):
+                        score = length + sum(len(stem) for stem in rest)
+                        if score > best[0]:
+                            best = (score, code)
+        return best[1]
+
+
+_default_classifier: Optional[OKPD2Classifier] = None
+_default_lock = threading.Lock()
+
+
+def default_classifier() -> OKPD2Classifier:
+    """Классификатор из ``assets/okpd2.json``; загружается один раз на процесс."""
+    global _default_classifier
+    if _default_classifier is None:
+        with _default_lock:
+            if _default_classifier is None:
+                _default_classifier = OKPD2Classifier.from_file(DEFAULT_OKPD2_PATH)
+    return _default_classifier
@@ -1,15 +1,28 @@
-from typing import Optional
+from __future__ import annotations
+
+import asyncio
+import json
+import weakref
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
 
-import httpx
-from httpx import HTTPStatusError, HTTPError
 from ..core.config import CONFIG
+from ..core.lazy_import import LazyModule
+from ..core.metrics import METRICS
+
+if TYPE_CHECKING:
+    import httpx
+else:
+    # httpx (вместе с httpcore и anyio-бэкендами) — самый тяжёлый импорт сервиса;
+    # он нужен только к первому вызову Ollama, а не при старте процесса.
+    httpx = LazyModule("httpx")
 
 
 class OllamaServiceError(RuntimeError):
     """Raised when the Ollama service cannot be reached or returns an error."""
 
 
-def _summarize_http_error(exc: HTTPStatusError, endpoint: str) -> str:
+def _summarize_http_error(exc: httpx.HTTPStatusError, endpoint: str) -> str:
     """Return a short human readable description for HTTP failures."""
 
     response = exc.response
@@ -28,10 +41,160 @@ def _summarize_http_error(exc: HTTPStatusError, endpoint: str) -> str:
         f"{details}."
     )
 
+def _ns_to_ms(value: Any) -> float | None:
+    if not isinstance(value, (int, float)):
+        return None
+    return round(value / 1_000_000, 3)
+
+
+def _tokens_per_second(count: Any, duration_ns: Any) -> float | None:
+    if not isinstance(count, (int, float)) or not isinstance(duration_ns, (int, float)):
+        return None
+    if duration_ns <= 0:
+        return None
+    return round(count / (duration_ns / 1_000_000_000), 2)
+
+
+@dataclass(frozen=True)
+class ChatStats:
+    """Token counters and timings reported by Ollama for a single call.
+
+    Durations are kept in nanoseconds, exactly as Ollama returns them.
+    """
+
+    prompt_eval_count: int | None = None
+    eval_count: int | None = None
+    prompt_eval_duration: int | None = None
+    eval_duration: int | None = None
+    load_duration: int | None = None
+    total_duration: int | None = None
+
+    @staticmethod
+    def from_response(data: Dict[str, Any]) -> "ChatStats":
+        def _int(key: str) -> int | None:
+            value = data.get(key)
+            return int(value) if isinstance(value, (int, float)) else None
+
+        return ChatStats(
+            prompt_eval_count=_int("prompt_eval_count"),
+            eval_count=_int("eval_count"),
+            prompt_eval_duration=_int("prompt_eval_duration"),
+            eval_duration=_int("eval_duration"),
+            load_duration=_int("load_duration"),
+            total_duration=_int("total_duration"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the stats in milliseconds with prefill/decode throughput."""
+
+        return {
+            "prompt_eval_count": self.prompt_eval_count,
+            "eval_count": self.eval_count,
+            "prompt_eval_ms": _ns_to_ms(self.prompt_eval_duration),
+            "eval_ms": _ns_to_ms(self.eval_duration),
+            "load_ms": _ns_to_ms(self.load_duration),
+            "total_ms": _ns_to_ms(self.total_duration),
+            "prefill_tokens_per_s": _tokens_per_second(
+                self.prompt_eval_count, self.prompt_eval_duration
+            ),
+            "decode_tokens_per_s": _tokens_per_second(self.eval_count, self.eval_duration),
+        }
+
+
+@dataclass(frozen=True)
+class ChatResult:
+    content: str
+    stats: ChatStats = field(default_factory=ChatStats)
+
+
+async def _stream_call(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    payload: Dict[str, Any],
+    timeout: httpx.Timeout,
+    content_of: Callable[[Dict[str, Any]], str],
+) -> ChatResult:
+    """Потоковый вызов Ollama (NDJSON), собирающий ответ из частей.
+
+    Если корутину отменяют (клиент отключился, истёк срок запроса), контекст
+    ``client.stream`` закрывает соединение, и Ollama прекращает генерацию, а
+    не дорабатывает ответ, который никто не прочитает.
+    """
+
+    parts: List[str] = []
+    final: Dict[str, Any] = {}
+    try:
+        async with client.stream("POST", endpoint, json=payload, timeout=timeout) as response:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    raise OllamaServiceError(
+                        f"The Ollama service returned malformed streaming data from {endpoint}."
+                    ) from exc
+                if chunk.get("error"):
+                    raise OllamaServiceError(
+                        f"The Ollama service reported an error while calling {endpoint}: {chunk['error']}"
+                    )
+                parts.append(content_of(chunk) or "")
+                if chunk.get("done"):
+                    final = chunk
+                    break
+    except asyncio.CancelledError:
+        METRICS.increment("ollama_calls_cancelled_total")
+        raise
+    if not final:
+        # Поток оборвался до завершающей части: ответ неполный
+        raise OllamaServiceError(
+            f"The Ollama service closed the stream from {endpoint} before the response was complete."
+        )
+    return ChatResult(content="".join(parts), stats=ChatStats.from_response(final))
+
+
+def keep_alive_value(value: str) -> Any:
+    """``keep_alive`` для Ollama: число секунд (``-1`` — не выгружать) или длительность вида ``30m``."""
+    value = value.strip()
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
 class OllamaClient:
     def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None):
         self.base_url = base_url or CONFIG.ollama_host
         self.model = model or CONFIG.model_name
+        # Один пул соединений на event loop: AsyncClient нельзя делить между циклами,
+        # а создание клиента на каждый вызов заново грузит SSL-контекст.
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _http_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=CONFIG.ollama_max_connections,
+                    max_keepalive_connections=CONFIG.ollama_max_connections,
+                ),
+            )
+            self._clients[loop] = client
+        return client
+
+    async def aclose(self) -> None:
+        """Закрывает пул соединений текущего event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
 
     async def chat(
         self,
@@ -39,11 +202,15 @@ class OllamaClient:
         user_prompt: str,
         temperature: float | None = None,
         max_tokens: int | None = None,
-    ) -> str:
+        num_ctx: int | None = None,
+    ) -> ChatResult:
         options = {
             "temperature": temperature if temperature is not None else CONFIG.temperature,
             "num_predict": max_tokens if max_tokens is not None else CONFIG.max_tokens,
         }
+        if num_ctx is not None:
+            # Без num_ctx Ollama берёт контекст по умолчанию из Modelfile
+            options["num_ctx"] = num_ctx
 
         timeout = httpx.Timeout(
             timeout=CONFIG.ollama_read_timeout + 10.0,
@@ -51,97 +218,155 @@ class OllamaClient:
             read=CONFIG.ollama_read_timeout,
         )
         
-        async with httpx.AsyncClient(base_url=self.base_url, timeout=timeout) as client:
-            chat_payload = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                "stream": False,
-                "options": options,
-            }
-
-            try:
-                response = await client.post("/api/chat", json=chat_payload)
-                response.raise_for_status()
-                data = response.json()
-                return data.get("message", {}).get("content", "")
-            except httpx.ReadTimeout as exc:
-                raise OllamaServiceError(
-                    "Timed out waiting for a response from the Ollama service. "
-                    "Consider increasing OLLAMA_READ_TIMEOUT or checking the model performance."
-                ) from exc
-            except httpx.ConnectError as exc:
-                raise OllamaServiceError(
-                    "Unable to connect to the Ollama service at "
-                    f"{self.base_url}. Ensure the service is running at http://localhost:11434."
-                ) from exc
-            except HTTPStatusError as exc:
-                if exc.response.status_code != 404:
-                    raise OllamaServiceError(_summarize_http_error(exc, "/api/chat")) from exc
-            except HTTPError as exc:
-                raise OllamaServiceError(
-                    "Unexpected error while communicating with the Ollama service. "
-                    f"{exc}"
-                ) from exc
-
-            # Fallback для старых версий Ollama без /api/chat
-            generate_payload = {
-                "model": self.model,
-                "system": system_prompt,
-                "prompt": user_prompt,
-                "stream": False,
-                "options": options,
-            }
-
-            try:
-                response = await client.post("/api/generate", json=generate_payload)
-                response.raise_for_status()
-                data = response.json()
-                return data.get("response", "")
-            except httpx.ReadTimeout as exc:
-                raise OllamaServiceError(
-                    "Timed out waiting for a response from the Ollama service while using the fallback API."
-                ) from exc
-            except httpx.ConnectError as exc:
-                raise OllamaServiceError(
-                    "Unable to connect to the Ollama service at "
-                    f"{self.base_url} when using the fallback API. Ensure the service "
-                    "is running at http://localhost:11434."
-                ) from exc
-            except HTTPStatusError as exc:
-                raise OllamaServiceError(
-                    _summarize_http_error(exc, "/api/generate")
-                ) from exc
-            except HTTPError as exc:
-                raise OllamaServiceError(
-                    "Unexpected error while communicating with the Ollama service during the fallback request. "
-                    f"{exc}"
-                ) from exc
+        client = self._http_client()
+        chat_payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "stream": True,
+            "options": options,
+            "keep_alive": keep_alive_value(CONFIG.ollama_keep_alive),
+        }
+
+        try:
+            return await _stream_call(
+                client,
+                "/api/chat",
+                chat_payload,
+                timeout,
+                lambda chunk: (chunk.get("message") or {}).get("content", ""),
+            )
+        except httpx.ReadTimeout as exc:
+            raise OllamaServiceError(
+                "Timed out waiting for a response from the Ollama service. "
+                "Consider increasing OLLAMA_READ_TIMEOUT or checking the model performance."
+            ) from exc
+        except httpx.ConnectError as exc:
+            raise OllamaServiceError(
+                "Unable to connect to the Ollama service at "
+                f"{self.base_url}. Ensure the service is running at http://localhost:11434."
+            ) from exc
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code != 404:
+                raise OllamaServiceError(_summarize_http_error(exc, "/api/chat")) from exc
+        except httpx.HTTPError as exc:
+            raise OllamaServiceError(
+                "Unexpected error while communicating with the Ollama service. "
+                f"{exc}"
+            ) from exc
+
+        # Fallback для старых версий Ollama без /api/chat
+        generate_payload = {
+            "model": self.model,
+            "system": system_prompt,
+            "prompt": user_prompt,
+            "stream": True,
+            "options": options,
+            "keep_alive": keep_alive_value(CONFIG.ollama_keep_alive),
+        }
+
+        try:
+            return await _stream_call(
+                client,
+                "/api/generate",
+                generate_payload,
+                timeout,
+                lambda chunk: chunk.get("response", ""),
+            )
+        except httpx.ReadTimeout as exc:
+            raise OllamaServiceError(
+                "Timed out waiting for a response from the Ollama service while using the fallback API."
+            ) from exc
+        except httpx.ConnectError as exc:
+            raise OllamaServiceError(
+                "Unable to connect to the Ollama service at "
+                f"{self.base_url} when using the fallback API. Ensure the service "
+                "is running at http://localhost:11434."
+            ) from exc
+        except httpx.HTTPStatusError as exc:
+            raise OllamaServiceError(
+                _summarize_http_error(exc, "/api/generate")
+            ) from exc
+        except httpx.HTTPError as exc:
+            raise OllamaServiceError(
+                "Unexpected error while communicating with the Ollama service during the fallback request. "
+                f"{exc}"
+            ) from exc
 
     async def list_models(self):
-        async with httpx.AsyncClient(base_url=self.base_url, timeout=30.0) as client:
-            try:
-                r = await client.get("/api/tags")
-                r.raise_for_status()
-                return r.json()
-            except httpx.ReadTimeout as exc:
-                raise OllamaServiceError(
-                    "Timed out while requesting the model list from the Ollama service."
-                ) from exc
-            except httpx.ConnectError as exc:
-                raise OllamaServiceError(
-                    "Unable to connect to the Ollama service at "
-                    f"{self.base_url} when requesting the model list. Ensure the service "
-                    "is running at http://localhost:11434."
-                ) from exc
-            except HTTPStatusError as exc:
-                raise OllamaServiceError(
-                    _summarize_http_error(exc, "/api/tags")
-                ) from exc
-            except HTTPError as exc:
-                raise OllamaServiceError(
-                    "Unexpected error while requesting the model list from the Ollama service. "
-                    f"{exc}"
-                ) from exc
+        client = self._http_client()
+        try:
+            r = await client.get("/api/tags", timeout=30.0)
+            r.raise_for_status()
+            return r.json()
+        except httpx.ReadTimeout as exc:
+            raise OllamaServiceError(
+                "Timed out while requesting the model list from the Ollama service."
+            ) from exc
+        except httpx.ConnectError as exc:
+            raise OllamaServiceError(
+                "Unable to connect to the Ollama service at "
+                f"{self.base_url} when requesting the model list. Ensure the service "
+                "is running at http://localhost:11434."
+            ) from exc
+        except httpx.HTTPStatusError as exc:
+            raise OllamaServiceError(
+                _summarize_http_error(exc, "/api/tags")
+            ) from exc
+        except httpx.HTTPError as exc:
+            raise OllamaServiceError(
+                "Unexpected error while requesting the model list from the Ollama service. "
+                f"{exc}"
+            ) from exc
+
+    async def has_model(self) -> bool:
+        """Есть ли настроенная модель среди загруженных в Ollama (``/api/tags``)."""
+        data = await self.list_models()
+        names = set()
+        for item in (data or {}).get("models") or ():
+            for key in ("name", "model"):
+                if item.get(key):
+                    names.add(item[key])
+        model = self.model if ":" in self.model else f"{self.model}:latest"
+        return model in names or self.model in names
+
+    async def warm_up(self, keep_alive: str, num_ctx: int | None = None) -> None:
+        """Загружает модель в память пустым запросом и продлевает ``keep_alive``."""
+        payload: Dict[str, Any] = {
+            "model": self.model,
+            "prompt": "",
+            "stream": False,
+            "keep_alive": keep_alive_value(keep_alive),
+        }
+        if num_ctx is not None:
+            # Ollama загружает модель под конкретный num_ctx: вызов с другим
+            # размером контекста перезагрузит её
+            payload["options"] = {"num_ctx": num_ctx}
+        timeout = httpx.Timeout(
+            timeout=CONFIG.ollama_read_timeout + 10.0,
+            connect=10.0,
+            read=CONFIG.ollama_read_timeout,
+        )
+        client = self._http_client()
+        try:
+            response = await client.post("/api/generate", json=payload, timeout=timeout)
+            response.raise_for_status()
+        except httpx.ReadTimeout as exc:
+            raise OllamaServiceError(
+                "Timed out while loading the model into the Ollama service. "
+                "Consider increasing OLLAMA_READ_TIMEOUT."
+            ) from exc
+        except httpx.ConnectError as exc:
+            raise OllamaServiceError(
+                "Unable to connect to the Ollama service at "
+                f"{self.base_url} while warming up the model."
+            ) from exc
+        except httpx.HTTPStatusError as exc:
+            raise OllamaServiceError(_summarize_http_error(exc, "/api/generate")) from exc
+        except httpx.HTTPError as exc:
+            raise OllamaServiceError(
+                "Unexpected error while warming up the model in the Ollama service. "
+                f"{exc}"
+            ) from exc
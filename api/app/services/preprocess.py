@@ -0,0 +1,301 @@
+"""Line-level cleanup of decoded documents before whitespace normalization.
+
+Specification tables, signature blocks and repeated page headers/footers add
+thousands of prompt tokens without carrying any of the extracted fields. They
+are removed here while the text still has its line structure; lines that do
+matter (totals, VAT, OKPD2 codes) are kept.
+"""
+from __future__ import annotations
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+# Разделитель ячеек строки таблицы DOCX (см. utils._extract_text_from_docx).
+TABLE_CELL_SEPARATOR = " | "
+
+_CYRILLIC_RE = re.compile(r"[А-Яа-яЁё]")
+# Ячейка таблицы с числом, ценой, процентом или единицей измерения
+_NUMERIC_CELL_RE = re.compile(
+    r"^(?:[\d\s .,%/()\-–]+(?:руб\.?|₽)?|шт\.?|ед\.?|кг\.?|г\.|т\.?|л\.?|м\.?|м2|м3|км|компл\.?|упак\.?|усл\.?\s*ед\.?|пог\.?\s*м\.?)$",
+    re.IGNORECASE,
+)
+_ROW_NUMBER_RE = re.compile(r"^[\d\s.,]+$")
+_TABLE_HEADER_RE = re.compile(
+    r"№\s*п\s*/\s*п|наименовани|кол-?во|количеств|ед\.?\s*изм|цена|стоимост", re.IGNORECASE
+)
+# Реквизиты сторон: их значения — тоже числа, но такие строки таблицей не считаются
+_REQUISITES_RE = re.compile(
+    r"\b(?:инн|кпп|огрнип|огрн|бик|окпо)\b|\b[рк]\s*/\s*сч?\b|(?:расч[её]тн|корр?\w*|лицев)\w*\.?\s*сч[её]т",
+    re.IGNORECASE,
+)
+# Строки, которые остаются из удалённой таблицы: итоги, НДС и коды ОКПД2
+_KEEP_LINE_RE = re.compile(r"итог|всего|ндс", re.IGNORECASE)
+_OKPD2_RE = re.compile(r"\b\d{2}\.\d{2}(?:\.\d{1,2}(?:\.\d{3})?)?\b")
+_SIGNATURE_LINE_RE = re.compile(
+    r"^(?:_{3,}.*|[^_]{0,60}_{5,}\s*/[^/_]+/|м\.?\s*п\.?|\(?подпись\)?|\(?ф\.?\s*и\.?\s*о\.?\)?|\(расшифровка подписи\))$",
+    re.IGNORECASE,
+)
+_PAGE_NUMBER_RE = re.compile(
+    r"^(?:-\s*\d+\s*-|(?:стр\.?|страница)\s*\d+(?:\s*(?:из|/)\s*\d+)?)$", re.IGNORECASE
+)
+
+_SHORT_LINE_CHARS = 80
+_MIN_TABLE_NUMERIC_CELLS = 8
+_MIN_NUMERIC_SHARE = 0.3
+_HEADER_LOOKBACK_LINES = 15
+_MIN_REPEATED_LINE_CHARS = 8
+_MAX_REPEATED_LINE_CHARS = 120
+_MIN_REPEATS = 3
+_MAX_LISTED_ITEMS = 10
+_MAX_ITEM_CHARS = 80
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for Qwen-like BPE vocabularies without a tokenizer.
+
+    Cyrillic text costs about one token per 2.8 characters, Latin text, digits
+    and punctuation about one per 4.
+    """
+
+    if not text:
+        return 0
+    cyrillic = len(_CYRILLIC_RE.findall(text))
+    return round(cyrillic / 2.8 + (len(text) - cyrillic) / 4)
+
+
+@dataclass
+class PreprocessReport:
+    original_chars: int = 0
+    removed_chars: int = 0
+    removed_tokens_estimate: int = 0
+    tables_removed: int = 0
+    signature_lines_removed: int = 0
+    header_footer_lines_removed: int = 0
+    # Названия позиций удалённых таблиц (по ним подбирается код ОКПД2)
+    table_items: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "original_chars": self.original_chars,
+            "removed_chars": self.removed_chars,
+            "removed_tokens_estimate": self.removed_tokens_estimate,
+            "tables_removed": self.tables_removed,
+            "signature_lines_removed": self.signature_lines_removed,
+            "header_footer_lines_removed": self.header_footer_lines_removed,
+        }
+
+
+@dataclass(frozen=True)
+class PreprocessResult:
+    text: str
+    report: PreprocessReport
+
+
+def _is_numeric_cell(cell: str) -> bool:
+    cell = cell.strip()
+    return bool(cell) and bool(_NUMERIC_CELL_RE.match(cell))
+
+
+def _is_kept(line: str) -> bool:
+    return bool(_KEEP_LINE_RE.search(line) or _OKPD2_RE.search(line))
+
+
+def _clip(item: str) -> str:
+    item = " ".join(item.split())
+    return item if len(item) <= _MAX_ITEM_CHARS else f"{item[: _MAX_ITEM_CHARS - 1]}…"
+
+
+def _table_summary(items: List[str]) -> str:
+    listed = "; ".join(_clip(item) for item in items[:_MAX_LISTED_ITEMS])
+    more = f" и ещё {len(items) - _MAX_LISTED_ITEMS}" if len(items) > _MAX_LISTED_ITEMS else ""
+    return f"[Таблица спецификации опущена, позиций: {len(items)}. {listed}{more}]"
+
+
+def _item_names(cells: List[str]) -> List[str]:
+    """Названия позиций: текстовые ячейки после первого числа (до него — шапка)."""
+    names: List[str] = []
+    seen_numeric = False
+    for cell in cells:
+        cell = cell.strip()
+        if not cell:
+            continue
+        if _is_numeric_cell(cell):
+            seen_numeric = seen_numeric or bool(_ROW_NUMBER_RE.match(cell))
+            continue
+        if seen_numeric and len(cell) >= 8 and not _is_kept(cell) and not _TABLE_HEADER_RE.search(cell):
+            names.append(cell)
+    return names
+
+
+def _collapse_table(
+    rows: List[str], cells: List[str], report: PreprocessReport
+) -> List[str]:
+    """Заменяет таблицу строкой-сводкой и оставляет строки с итогами и кодами."""
+    items = _item_names(cells)
+    report.table_items.extend(items)
+    kept: List[str] = [_table_summary(items)]
+    keep_next_value = False
+    in_header = True
+    for row in rows:
+        stripped = row.strip()
+        if not stripped:
+            continue
+        if in_header and any(
+            _ROW_NUMBER_RE.match(cell.strip()) for cell in stripped.split(TABLE_CELL_SEPARATOR)
+        ):
+            in_header = False
+        if in_header:
+            # «с НДС 20%» в шапке таблицы итогов не содержит
+            continue
+        if _is_kept(stripped):
+            kept.append(stripped)
+            keep_next_value = TABLE_CELL_SEPARATOR not in stripped
+        elif keep_next_value and _is_numeric_cell(stripped):
+            # Значение итога в таблице «ячейка на строку» идёт следующей строкой
+            kept.append(stripped)
+            keep_next_value = False
+        else:
+            keep_next_value = False
+    report.tables_removed += 1
+    return kept
+
+
+def _is_spec_table(cells: List[str]) -> bool:
+    filled = [cell for cell in cells if cell.strip()]
+    numeric = sum(1 for cell in filled if _is_numeric_cell(cell))
+    return numeric >= _MIN_TABLE_NUMERIC_CELLS and numeric >= _MIN_NUMERIC_SHARE * len(filled)
+
+
+def _strip_docx_tables(lines: List[str], report: PreprocessReport) -> List[str]:
+    """Таблицы DOCX, выгруженные построчно (ячейки через ``TABLE_CELL_SEPARATOR``)."""
+    result: List[str] = []
+    index = 0
+    while index < len(lines):
+        if TABLE_CELL_SEPARATOR not in lines[index]:
+            result.append(lines[index])
+            index += 1
+            continue
+        end = index
+        while end < len(lines) and TABLE_CELL_SEPARATOR in lines[end]:
+            end += 1
+        rows = lines[index:end]
+        cells = [cell for row in rows for cell in row.split(TABLE_CELL_SEPARATOR)]
+        # Таблицы без чисел и таблицы реквизитов сторон (ИНН, КПП, счета) остаются
+        is_spec = _is_spec_table(cells) and not any(_REQUISITES_RE.search(row) for row in rows)
+        result.extend(_collapse_table(rows, cells, report) if is_spec else rows)
+        index = end
+    return result
+
+
+def _cell_table_span(run: List[str]) -> Tuple[int, int] | None:
+    """Границы таблицы в серии коротких строк (таблица «ячейка на строку»).
+
+    Таблица начинается с шапки и заканчивается до первой строки реквизитов:
+    блок «ИНН / 7701234567 / КПП / …» тоже почти весь из чисел.
+    """
+    for start, line in enumerate(run):
+        if not _TABLE_HEADER_RE.search(line) or _REQUISITES_RE.search(line):
+            continue
+        stop = start + 1
+        while stop < len(run) and not _REQUISITES_RE.search(run[stop]):
+            stop += 1
+        numeric = [position for position in range(start, stop) if _is_numeric_cell(run[position])]
+        if not numeric or numeric[0] - start > _HEADER_LOOKBACK_LINES:
+            continue
+        filled = sum(1 for row in run[start:stop] if row.strip())
+        if len(numeric) >= _MIN_TABLE_NUMERIC_CELLS and len(numeric) >= _MIN_NUMERIC_SHARE * filled:
+            return start, numeric[-1] + 1
+    return None
+
+
+def _strip_cell_tables(lines: List[str], report: PreprocessReport) -> List[str]:
+    result: List[str] = []
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        if len(line.strip()) > _SHORT_LINE_CHARS or TABLE_CELL_SEPARATOR in line:
+            result.append(line)
+            index += 1
+            continue
+        end = index
+        while (
+            end < len(lines)
+            and len(lines[end].strip()) <= _SHORT_LINE_CHARS
+            and TABLE_CELL_SEPARATOR not in lines[end]
+        ):
+            end += 1
+        run = lines[index:end]
+        span = _cell_table_span(run)
+        if span is None:
+            result.extend(run)
+        else:
+            start, stop = span
+            result.extend(run[:start])
+            result.extend(_collapse_table(run[start:stop], run[start:stop], report))
+            result.extend(run[stop:])
+        index = end
+    return result
+
+
+def _strip_signatures(lines: List[str], report: PreprocessReport) -> List[str]:
+    result: List[str] = []
+    for line in lines:
+        stripped = line.strip()
+        if stripped and _SIGNATURE_LINE_RE.match(stripped):
+            report.signature_lines_removed += 1
+        else:
+            result.append(line)
+    return result
+
+
+def _strip_headers_footers(lines: List[str], report: PreprocessReport) -> List[str]:
+    """Колонтитулы: номера страниц и одинаковые строки, повторяющиеся на каждой
+    странице (первое вхождение остаётся)."""
+    numbered = [line for line in lines if not _PAGE_NUMBER_RE.match(line.strip())]
+    report.header_footer_lines_removed += len(lines) - len(numbered)
+    lines = numbered
+    counts = Counter(
+        stripped
+        for line in lines
+        if _MIN_REPEATED_LINE_CHARS <= len(stripped := line.strip()) <= _MAX_REPEATED_LINE_CHARS
+    )
+    repeated = {line for line, count in counts.items() if count >= _MIN_REPEATS}
+    if not repeated:
+        return lines
+    result: List[str] = []
+    seen: set = set()
+    for line in lines:
+        stripped = line.strip()
+        if stripped in repeated:
+            if stripped in seen:
+                report.header_footer_lines_removed += 1
+                continue
+            seen.add(stripped)
+        result.append(line)
+    return result
+
+
+def preprocess_document(text: str) -> PreprocessResult:
+    """Remove specification tables, signature blocks and repeated headers/footers.
+
+    The report counts the removed characters and an estimate of the prompt
+    tokens saved; the returned text still has to go through
+    ``normalize_whitespace``.
+    """
+
+    report = PreprocessReport(original_chars=len(text or ""))
+    if not text or "\n" not in text:
+        return PreprocessResult(text or "", report)
+
+    lines = text.splitlines()
+    lines = _strip_docx_tables(lines, report)
+    lines = _strip_cell_tables(lines, report)
+    lines = _strip_signatures(lines, report)
+    lines = _strip_headers_footers(lines, report)
+
+    cleaned = "\n".join(lines)
+    report.removed_chars = max(report.original_chars - len(cleaned), 0)
+    report.removed_tokens_estimate = max(estimate_tokens(text) - estimate_tokens(cleaned), 0)
+    return PreprocessResult(cleaned, report)
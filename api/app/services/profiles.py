@@ -0,0 +1,141 @@
+"""Named configuration profiles, each compiled into its own pipeline snapshot."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from ..core.config_store import ConfigLayer, LayeredConfigStore, assets_fingerprint
+from .config_snapshot import ConfigSnapshotManager
+from .extractor.pipeline import ExtractionPipeline
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE = "default"
+_PROFILE_ID_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# Раскладка файлов внутри каталога профиля (все файлы необязательны).
+PROFILE_ASSET_FILES = {
+    "extractors": "field_extractors.json",
+    "schema": "schema.json",
+    "contexts": "field_contexts.json",
+    "merge_rules": "field_merge_rules.json",
+}
+PROFILE_PROMPT_FILES = {
+    "field_guidelines": "field_guidelines.md",
+    "summary_system": "summary_system.txt",
+    "summary_user_template": "summary_user_template.txt",
+    "system": "system.txt",
+    "user_template": "user_template.txt",
+}
+
+
+class UnknownProfileError(KeyError):
+    """Raised when a request names a profile that is not configured."""
+
+
+def profile_layer(profile_id: str, directory: Path) -> ConfigLayer:
+    prompts_dir = directory / "prompts"
+    return ConfigLayer(
+        f"profile:{profile_id}",
+        assets={key: directory / name for key, name in PROFILE_ASSET_FILES.items()},
+        prompts={key: prompts_dir / name for key, name in PROFILE_PROMPT_FILES.items()},
+        field_prompts_dir=prompts_dir / "fields",
+    )
+
+
+class ProfileRegistry:
+    """Keeps one :class:`ConfigSnapshotManager` per profile.
+
+    Every profile is the base layers (defaults and user overrides) plus the
+    files from ``profiles_dir/<id>/``; the ``default`` profile is the base
+    layers alone. Pipelines are compiled once per profile and share whatever
+    ``factory`` closes over (HTTP pool, result store); ``factory`` gets the
+    store and the profile id. With ``snapshot_dir``
+    every profile keeps its asset snapshot in ``snapshot_dir/<id>.json``.
+    """
+
+    def __init__(
+        self,
+        profiles_dir: Path,
+        base_layers: Sequence[ConfigLayer],
+        factory: Callable[[LayeredConfigStore, str], ExtractionPipeline],
+        override_layer: Optional[str] = None,
+        snapshot_dir: Optional[Path] = None,
+    ):
+        self._profiles_dir = profiles_dir
+        self._snapshot_dir = snapshot_dir
+        self._base_layers = tuple(base_layers)
+        self._factory = factory
+        self._override_layer = override_layer
+        self._lock = threading.Lock()
+        # Отпечатки файлов профилей, которые не удалось собрать: не повторяем сборку без изменений
+        self._failed: Dict[str, str] = {}
+        self.default = self._create(DEFAULT_PROFILE, self._base_layers)
+        self._managers: Dict[str, ConfigSnapshotManager] = {DEFAULT_PROFILE: self.default}
+        self._discover()
+
+    def ids(self) -> List[str]:
+        return sorted(self._managers)
+
+    def get(self, profile_id: Optional[str] = None) -> ConfigSnapshotManager:
+        manager = self._managers.get(profile_id or DEFAULT_PROFILE)
+        if manager is None:
+            raise UnknownProfileError(profile_id)
+        return manager
+
+    def managers(self) -> Dict[str, ConfigSnapshotManager]:
+        return dict(self._managers)
+
+    def refresh(self, force: bool = False) -> Dict[str, bool]:
+        """Подхватывает новые и удалённые каталоги профилей и перезагружает изменённые."""
+        self._discover()
+        return {
+            profile_id: manager.reload_if_changed(force)
+            for profile_id, manager in self.managers().items()
+        }
+
+    async def watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception:  # pragma: no cover - defensive safeguard
+                logger.exception("Unexpected error while checking profile files")
+
+    def _create(self, profile_id: str, layers: Sequence[ConfigLayer]) -> ConfigSnapshotManager:
+        snapshot_path = self._snapshot_dir / f"{profile_id}.json" if self._snapshot_dir else None
+        store = LayeredConfigStore(layers, override_layer=self._override_layer, snapshot_path=snapshot_path)
+        return ConfigSnapshotManager(lambda: self._factory(store, profile_id), store.watched_paths())
+
+    def _discover(self) -> None:
+        with self._lock:
+            found = set()
+            if self._profiles_dir.is_dir():
+                found = {
+                    item.name
+                    for item in self._profiles_dir.iterdir()
+                    if item.is_dir() and _PROFILE_ID_RE.match(item.name) and item.name != DEFAULT_PROFILE
+                }
+            managers = dict(self._managers)
+            for profile_id in set(managers) - found - {DEFAULT_PROFILE}:
+                del managers[profile_id]
+                logger.info("Profile %s removed", profile_id)
+            for profile_id in sorted(found - set(managers)):
+                layers = (*self._base_layers, profile_layer(profile_id, self._profiles_dir / profile_id))
+                fingerprint = assets_fingerprint(layers[-1].files())
+                if self._failed.get(profile_id) == fingerprint:
+                    continue
+                try:
+                    managers[profile_id] = self._create(profile_id, layers)
+                except Exception as exc:
+                    self._failed[profile_id] = fingerprint
+                    logger.warning("Profile %s is not loaded: %s", profile_id, exc)
+                    continue
+                self._failed.pop(profile_id, None)
+                logger.info("Profile %s loaded", profile_id)
+            # Подменяем словарь целиком, чтобы читатели не видели его в процессе изменения
+            self._managers = managers
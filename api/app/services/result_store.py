@@ -0,0 +1,249 @@
+"""Storage of previous extraction results for incremental re-extraction."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+def text_fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def result_id_for(normalized_text: str, profile: Optional[str] = None) -> str:
+    """Идентификатор результата — отпечаток нормализованного текста и профиля.
+
+    У профиля по умолчанию (``None``) — только текста, как до появления профилей.
+    """
+    key = normalized_text if profile is None else f"{profile}\0{normalized_text}"
+    return text_fingerprint(key)[:32]
+
+
+@dataclass(frozen=True)
+class StoredGroup:
+    fields: Tuple[str, ...]
+    # Отпечаток промпта группы (поля, срез, подсказки, подсхема) и её фрагмента текста
+    config_fingerprint: str
+    segment_fingerprint: str
+    values: Dict[str, Any]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "fields": list(self.fields),
+            "config_fingerprint": self.config_fingerprint,
+            "segment_fingerprint": self.segment_fingerprint,
+            "values": self.values,
+        }
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "StoredGroup":
+        return StoredGroup(
+            fields=tuple(data["fields"]),
+            config_fingerprint=data["config_fingerprint"],
+            segment_fingerprint=data["segment_fingerprint"],
+            values=dict(data["values"]),
+        )
+
+
+@dataclass(frozen=True)
+class StoredResult:
+    result_id: str
+    text: str
+    groups: Dict[str, StoredGroup] = field(default_factory=dict)
+    summary_fingerprint: str = ""
+    summary_payload: Dict[str, Any] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    # Профиль, которым получен результат (None — по умолчанию)
+    profile: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "result_id": self.result_id,
+            "profile": self.profile,
+            "text": self.text,
+            "groups": {key: group.to_dict() for key, group in self.groups.items()},
+            "summary_fingerprint": self.summary_fingerprint,
+            "summary_payload": self.summary_payload,
+            "created_at": self.created_at,
+        }
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "StoredResult":
+        return StoredResult(
+            result_id=data["result_id"],
+            text=data["text"],
+            groups={key: StoredGroup.from_dict(group) for key, group in data.get("groups", {}).items()},
+            summary_fingerprint=data.get("summary_fingerprint", ""),
+            summary_payload=dict(data.get("summary_payload", {})),
+            created_at=data.get("created_at", 0.0),
+            profile=data.get("profile"),
+        )
+
+
+class ResultStore:
+    """In-memory LRU of recent results, keyed by :func:`result_id_for`."""
+
+    def __init__(self, max_size: int = 256):
+        self._max_size = max(max_size, 1)
+        self._items: "OrderedDict[str, StoredResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, result_id: str) -> Optional[StoredResult]:
+        with self._lock:
+            item = self._items.get(result_id)
+            if item is not None:
+                self._items.move_to_end(result_id)
+            return item
+
+    def find_by_text(self, normalized_text: str, profile: Optional[str] = None) -> Optional[StoredResult]:
+        return self.get(result_id_for(normalized_text, profile))
+
+    def put(self, result: StoredResult) -> None:
+        with self._lock:
+            self._items[result.result_id] = result
+            self._items.move_to_end(result.result_id)
+            while len(self._items) > self._max_size:
+                self._items.popitem(last=False)
+
+    # Асинхронный интерфейс пайплайна: в памяти операции быстрые, поток не нужен
+    async def aget(self, result_id: str) -> Optional[StoredResult]:
+        return self.get(result_id)
+
+    async def afind_by_text(
+        self, normalized_text: str, profile: Optional[str] = None
+    ) -> Optional[StoredResult]:
+        return self.find_by_text(normalized_text, profile)
+
+    async def aput(self, result: StoredResult) -> None:
+        self.put(result)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class SqliteResultStore:
+    """:class:`ResultStore` backed by a SQLite file shared by all workers.
+
+    The database runs in WAL mode, so readers in one worker do not block a
+    writer in another; each thread keeps its own connection. Eviction is LRU
+    by last access, like the in-memory store. The async methods used by the
+    pipeline run the queries (and commits) in one dedicated thread, so a busy
+    database never blocks the event loop.
+    """
+
+    def __init__(self, path: str, max_size: int = 256):
+        self._path = path
+        self._max_size = max(max_size, 1)
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-store")
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "result_id TEXT PRIMARY KEY, payload TEXT NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self._path, timeout=30.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, result_id: str) -> Optional[StoredResult]:
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT payload FROM results WHERE result_id = ?", (result_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE results SET accessed_at = ? WHERE result_id = ?", (time.time(), result_id)
+            )
+        return StoredResult.from_dict(json.loads(row[0]))
+
+    def find_by_text(self, normalized_text: str, profile: Optional[str] = None) -> Optional[StoredResult]:
+        return self.get(result_id_for(normalized_text, profile))
+
+    def put(self, result: StoredResult) -> None:
+        payload = json.dumps(result.to_dict(), ensure_ascii=False)
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO results (result_id, payload, accessed_at) VALUES (?, ?, ?)",
+                (result.result_id, payload, time.time()),
+            )
+            connection.execute(
+                "DELETE FROM results WHERE result_id IN ("
+                "SELECT result_id FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self._max_size,),
+            )
+
+    async def aget(self, result_id: str) -> Optional[StoredResult]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.get, result_id)
+
+    async def afind_by_text(
+        self, normalized_text: str, profile: Optional[str] = None
+    ) -> Optional[StoredResult]:
+        return await self.aget(result_id_for(normalized_text, profile))
+
+    async def aput(self, result: StoredResult) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.put, result)
+
+    def __len__(self) -> int:
+        with self._connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+AnyResultStore = Union[ResultStore, SqliteResultStore]
+
+
+def create_result_store(path: str = "", max_size: int = 256) -> AnyResultStore:
+    """Хранилище в памяти процесса или, если задан путь, общий файл SQLite."""
+    if path:
+        return SqliteResultStore(path, max_size)
+    return ResultStore(max_size)
+
+
+def diff_spans(old: str, new: str) -> List[Tuple[int, int]]:
+    """Return the changed region of ``new`` relative to ``old`` as ``[(start, end)]``.
+
+    Only the common prefix and suffix are trimmed, which is linear and exact
+    for a single edit; several edits are reported as one span covering them.
+    """
+
+    if old == new:
+        return []
+
+    limit = min(len(old), len(new))
+    prefix = _common_length(old, new, limit, from_end=False)
+    suffix = _common_length(old, new, limit - prefix, from_end=True)
+    return [(prefix, len(new) - suffix)]
+
+
+def _common_length(old: str, new: str, limit: int, *, from_end: bool) -> int:
+    # Бинарный поиск по срезам: сравнения строк выполняются на C
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if from_end:
+            equal = old[len(old) - middle :] == new[len(new) - middle :]
+        else:
+            equal = old[:middle] == new[:middle]
+        if equal:
+            low = middle
+        else:
+            high = middle - 1
+    return low
@@ -0,0 +1,53 @@
+"""Coalescing of identical concurrent async computations."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """Runs one computation per key; concurrent callers with the same key await it.
+
+    The shared task is shielded, so a caller that is cancelled does not cancel
+    the computation for the others. Callers are reference-counted: when the
+    last one is cancelled, the computation itself is cancelled.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Возвращает ``(результат, shared)``; ``shared`` — результат получен от чужого вызова."""
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done: self._forget(key, done))
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            if self._inflight.get(key) is task:
+                self._waiters[key] -= 1
+                if self._waiters[key] <= 0:
+                    # Результат больше никто не ждёт — останавливаем вычисление. Ключ
+                    # освобождается сразу: новый такой же запрос до завершения отмены
+                    # должен запустить своё вычисление, а не получить чужую отмену
+                    del self._inflight[key]
+                    del self._waiters[key]
+                    task.cancel()
+            raise
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._waiters.pop(key, None)
+        if not task.cancelled():
+            # Исключение уже получили ожидающие; помечаем его полученным
+            task.exception()
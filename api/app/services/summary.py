@@ -2,10 +2,19 @@
 from __future__ import annotations
 
 import re
-from typing import Any, Dict, Iterable, List, Optional
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from .okpd2 import default_classifier
 
 _MAX_SUMMARY_LENGTH = 300
 
+# Bounds of the document digest, so that summary fallbacks do not depend on
+# the contract length.
+_DIGEST_MAX_SNIPPETS = 6
+_DIGEST_SNIPPET_LENGTH = 400
+_DIGEST_MAX_OKPD2_CODES = 16
+
 # Keywords mapped to category labels written in the form expected after
 # "приобретение" (genitive case for better readability).
 _CATEGORY_KEYWORDS: Dict[str, tuple[str, ...]] = {
@@ -48,25 +57,6 @@ _CATEGORY_KEYWORDS: Dict[str, tuple[str, ...]] = {
     ),
 }
 
-# Mapping of OKPD2 prefixes to category labels.
-_OKPD2_CATEGORY_MAP: Dict[str, str] = {
-    "26": "оргтехники",
-    "27": "бытовой электроники",
-    "28": "промышленного оборудования",
-    "29": "транспортных средств",
-    "30": "транспортных средств",
-    "31": "офисной мебели",
-    "32": "медицинского оборудования",
-    "33": "услуг",
-    "35": "энергии",
-    "38": "утилизации",
-    "41": "строительных работ",
-    "42": "строительных работ",
-    "43": "строительных работ",
-    "45": "услуг",
-    "46": "товаров",
-}
-
 _LEGAL_FORMS = (
     "ООО", "АО", "ПАО", "ЗАО", "ОАО", "ИП", "АНО", "ГУП", "МУП", "ФГУП",
     "СПАО", "НКО", "ТСЖ", "ПК", "АОЗТ",
@@ -74,6 +64,150 @@ _LEGAL_FORMS = (
 
 _OKPD_PATTERN = re.compile(r"\b(\d{2})\.(\d{2})(?:\.(\d{1,2}))?\b")
 
+_LEGAL_FORMS_ALTERNATION = "|".join(_LEGAL_FORMS)
+_LEGAL_FORM_SUFFIX_RE = re.compile(
+    rf"^(?P<body>.+?)\s+(?P<form>{_LEGAL_FORMS_ALTERNATION})$", re.IGNORECASE
+)
+_LEGAL_FORM_PREFIX_RE = re.compile(
+    rf"^(?P<form>{_LEGAL_FORMS_ALTERNATION})\s+(?P<body>.+)$", re.IGNORECASE
+)
+_PARENTHESES_RE = re.compile(r"\s*\([^)]*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Build a regex alternation factored by common prefixes.
+
+    ``re`` tries alternatives one by one, so a flat ``a|b|c`` over ~100
+    keywords is slower than separate substring scans; a trie-shaped pattern
+    needs at most one branch per character.
+    """
+
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        optional = "" in node
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        return f"(?:{'|'.join(branches)})" + ("?" if optional else "")
+
+    return build(trie)
+
+
+def _compile_category_matcher() -> tuple[re.Pattern[str], Dict[str, frozenset[str]]]:
+    """Compile all category keywords into one single-pass matcher.
+
+    The lookahead reports the longest keyword starting at every position;
+    each keyword maps to the labels of all keywords that are its prefixes,
+    so shorter keywords starting at the same position are not lost.
+    """
+
+    labels_by_keyword: Dict[str, set[str]] = {}
+    for label, keywords in _CATEGORY_KEYWORDS.items():
+        for keyword in keywords:
+            labels_by_keyword.setdefault(keyword.lower(), set()).add(label)
+
+    closure: Dict[str, frozenset[str]] = {}
+    for keyword in labels_by_keyword:
+        labels: set[str] = set()
+        for other, other_labels in labels_by_keyword.items():
+            if keyword.startswith(other):
+                labels.update(other_labels)
+        closure[keyword] = frozenset(labels)
+
+    pattern = re.compile(f"(?=({_trie_pattern(labels_by_keyword)}))")
+    return pattern, closure
+
+
+_CATEGORY_MATCHER, _CATEGORY_LABELS_BY_KEYWORD = _compile_category_matcher()
+_CATEGORY_ORDER = tuple(_CATEGORY_KEYWORDS)
+
+# Places where contracts describe what is being bought, by priority, with the
+# number of snippets taken from each: specification table headers first,
+# then the first subject clause.
+_SUBJECT_MARKERS: tuple[tuple[re.Pattern[str], int], ...] = (
+    (re.compile(r"наименовани\w*\s+и\s+характеристик\w*|№\s*п\s*/\s*п", re.IGNORECASE), 3),
+    (
+        re.compile(
+            r"предмет\w*\s+договора|обязуется\s+(?:поставить|передать|оказать|выполнить)",
+            re.IGNORECASE,
+        ),
+        1,
+    ),
+)
+# OKPD2 codes (XX.XX, XX.XX.X, XX.XX.XX, XX.XX.XX.XXX) but not dates like 26.09.2025.
+_DIGEST_OKPD_PATTERN = re.compile(r"(?<![\d.])(\d{2}\.\d{2}(?:\.\d{1,2}(?:\.\d{1,3})?)?)(?![\d.]*\d)")
+# Short dates (26.09.25) have the shape of a six-digit code and are skipped.
+_SHORT_DATE_PATTERN = re.compile(r"(0[1-9]|[12]\d|3[01])\.(0[1-9]|1[0-2])\.\d{2}")
+# A code counts as stated by the document only shortly after an "ОКПД" marker
+# (the same line or the header of a specification table).
+_OKPD_MARKER_PATTERN = re.compile(r"окпд", re.IGNORECASE)
+_OKPD_MARKER_DISTANCE = 200
+
+
+@dataclass(frozen=True)
+class DocumentDigest:
+    """Bounded extract of a document used by the summary fallbacks.
+
+    It is built once per request right after normalization; afterwards the
+    fallbacks only look at these few snippets and codes.
+    """
+
+    key_sentences: tuple[str, ...] = ()
+    okpd2_codes: tuple[str, ...] = ()
+    # Subset of okpd2_codes found shortly after an "ОКПД" marker
+    marked_okpd2_codes: tuple[str, ...] = ()
+
+
+def build_document_digest(text: str) -> DocumentDigest:
+    """Collect subject snippets and OKPD2 codes from the normalized text."""
+
+    if not text:
+        return DocumentDigest()
+
+    snippets: List[str] = []
+    covered: List[tuple[int, int]] = []
+    for marker, limit in _SUBJECT_MARKERS:
+        taken = 0
+        for match in marker.finditer(text):
+            if taken >= limit or len(snippets) >= _DIGEST_MAX_SNIPPETS:
+                break
+            start = match.start()
+            end = min(start + _DIGEST_SNIPPET_LENGTH, len(text))
+            if any(start < other_end and other_start < end for other_start, other_end in covered):
+                continue
+            covered.append((start, end))
+            snippets.append(text[start:end])
+            taken += 1
+
+    codes: List[str] = []
+    marked: List[str] = []
+    for match in _DIGEST_OKPD_PATTERN.finditer(text):
+        code = match.group(1)
+        if _SHORT_DATE_PATTERN.fullmatch(code):
+            continue
+        _append_unique(codes, code)
+        start = match.start(1)
+        if _OKPD_MARKER_PATTERN.search(text, max(start - _OKPD_MARKER_DISTANCE, 0), start):
+            _append_unique(marked, code)
+        if len(codes) >= _DIGEST_MAX_OKPD2_CODES:
+            break
+
+    return DocumentDigest(
+        key_sentences=tuple(snippets), okpd2_codes=tuple(codes), marked_okpd2_codes=tuple(marked)
+    )
+
+
+SummarySource = Union[DocumentDigest, str]
+
 
 def clamp_summary_text(text: str) -> str:
     """Normalize spacing and trim the text to the maximum allowed length."""
@@ -88,12 +222,16 @@ def clamp_summary_text(text: str) -> str:
     return _trim_summary(normalized, _MAX_SUMMARY_LENGTH)
 
 
-def build_short_summary(data: Dict[str, Any], source_text: str) -> str:
-    """Return a compact textual summary (≤300 characters) of the contract."""
+def build_short_summary(data: Dict[str, Any], source: SummarySource) -> str:
+    """Return a compact textual summary (≤300 characters) of the contract.
+
+    ``source`` should be the request's :class:`DocumentDigest`; a raw text is
+    digested on the fly.
+    """
 
     parties_line = _build_parties_line(data)
     amount_line = _build_amount_line(data)
-    subject_line = _build_subject_line(data, source_text)
+    subject_line = _build_subject_line(data, source)
 
     parts = [part for part in (parties_line, amount_line, subject_line) if part]
     if not parts:
@@ -103,7 +241,7 @@ def build_short_summary(data: Dict[str, Any], source_text: str) -> str:
     return _trim_summary(summary, _MAX_SUMMARY_LENGTH)
 
 
-def build_selection_rationale(data: Dict[str, Any], source_text: str) -> str:
+def build_selection_rationale(data: Dict[str, Any], source: SummarySource) -> str:
     """Heuristically justify the supplier choice within the 300-character limit."""
 
     supplier = _normalize_party_name(data.get("Контрагент"))
@@ -123,7 +261,7 @@ def build_selection_rationale(data: Dict[str, Any], source_text: str) -> str:
     if payment_fragment:
         reasons.append(payment_fragment)
 
-    categories = _detect_categories(data, source_text)
+    categories = _detect_categories(data, source)
     if categories:
         reasons.append(f"предмет — {_join_categories(categories)}")
 
@@ -182,8 +320,8 @@ def _build_vat_fragment(vat_amount: Optional[float], vat_rate: Optional[float])
     return ""
 
 
-def _build_subject_line(data: Dict[str, Any], source_text: str) -> str:
-    categories = _detect_categories(data, source_text)
+def _build_subject_line(data: Dict[str, Any], source: SummarySource) -> str:
+    categories = _detect_categories(data, source)
     if categories:
         joined = _join_categories(categories)
         return f"Предмет: приобретение {joined}."
@@ -221,8 +359,8 @@ def _build_payment_fragment(value: Any) -> str:
     return f"оплата — {cleaned}"
 
 
-def _detect_categories(data: Dict[str, Any], source_text: str) -> List[str]:
-    categories: List[str] = []
+def _detect_categories(data: Dict[str, Any], source: SummarySource) -> List[str]:
+    digest = source if isinstance(source, DocumentDigest) else build_document_digest(source or "")
     text_parts: List[str] = []
 
     for key in ("Содержание", "ОЭЗ_Предмет"):
@@ -230,24 +368,37 @@ def _detect_categories(data: Dict[str, Any], source_text: str) -> List[str]:
         if isinstance(value, str):
             text_parts.append(value)
 
-    if source_text:
-        text_parts.append(source_text)
-
+    text_parts.extend(digest.key_sentences)
     combined_text = " \n ".join(text_parts).lower()
 
-    for label, keywords in _CATEGORY_KEYWORDS.items():
-        if any(keyword.lower() in combined_text for keyword in keywords):
-            _append_unique(categories, label)
-
-    for match in _OKPD_PATTERN.finditer(combined_text):
-        prefix = match.group(1)
-        mapped = _OKPD2_CATEGORY_MAP.get(prefix)
+    categories = _match_categories(combined_text)
+
+    # Categories of OKPD2 codes come from the classifier (longest known prefix).
+    codes = [match.group(0) for match in _OKPD_PATTERN.finditer(combined_text)]
+    codes.extend(digest.okpd2_codes)
+    extracted_code = data.get("ОЭЗ_ОКПД2")
+    if isinstance(extracted_code, str):
+        codes.append(extracted_code)
+    classifier = default_classifier()
+    for code in codes:
+        mapped = classifier.category(code)
         if mapped:
             _append_unique(categories, mapped)
 
     return categories
 
 
+def _match_categories(lowered_text: str) -> List[str]:
+    """Return category labels whose keywords occur in the (lowercased) text."""
+
+    found: set[str] = set()
+    for match in _CATEGORY_MATCHER.finditer(lowered_text):
+        found.update(_CATEGORY_LABELS_BY_KEYWORD[match.group(1)])
+        if len(found) == len(_CATEGORY_ORDER):
+            break
+    return [label for label in _CATEGORY_ORDER if label in found]
+
+
 def _append_unique(items: List[str], value: str) -> None:
     if value not in items:
         items.append(value)
@@ -270,12 +421,12 @@ def _normalize_party_name(value: Any) -> Optional[str]:
     if not isinstance(value, str):
         value = str(value)
 
-    name = re.sub(r"\s*\([^)]*\)", "", value)
-    name = re.sub(r"\s+", " ", name).strip().strip(',;')
+    name = _PARENTHESES_RE.sub("", value)
+    name = _WHITESPACE_RE.sub(" ", name).strip().strip(',;')
     if not name:
         return None
 
-    match = re.match(rf"^(?P<body>.+?)\s+(?P<form>{'|'.join(_LEGAL_FORMS)})$", name, re.IGNORECASE)
+    match = _LEGAL_FORM_SUFFIX_RE.match(name)
     if match:
         body = match.group("body").strip(' «»"')
         form = match.group("form").upper()
@@ -284,7 +435,7 @@ def _normalize_party_name(value: Any) -> Optional[str]:
         else:
             name = form
     else:
-        form_match = re.match(rf"^(?P<form>{'|'.join(_LEGAL_FORMS)})\s+(?P<body>.+)$", name, re.IGNORECASE)
+        form_match = _LEGAL_FORM_PREFIX_RE.match(name)
         if form_match:
             form = form_match.group("form").upper()
             body = form_match.group("body").strip(' «»"')
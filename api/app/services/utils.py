@@ -1,36 +1,63 @@
+from __future__ import annotations
+
 from io import BytesIO
+from pathlib import Path
 from fastapi import UploadFile
 import json
+from typing import TYPE_CHECKING, Iterator
+
+from .preprocess import TABLE_CELL_SEPARATOR
+
+if TYPE_CHECKING:
+    from docx.table import Table
+
+
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
 
-from docx import Document
 
+def _is_docx(filename: str | None, content_type: str | None = None) -> bool:
+    return (filename or "").lower().endswith(".docx") or content_type == DOCX_CONTENT_TYPE
 
-def _is_docx(file: UploadFile) -> bool:
-    return (
-        (file.filename or "").lower().endswith(".docx")
-        or file.content_type
-        == "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-    )
+
+def _table_rows(table: Table) -> Iterator[str]:
+    for row in table.rows:
+        cells: list[str] = []
+        previous = None
+        for cell in row.cells:
+            # Объединённую ячейку python-docx возвращает несколько раз подряд с тем же
+            # элементом <w:tc>; соседние разные ячейки с одинаковым текстом остаются
+            if cell._tc is previous:
+                continue
+            previous = cell._tc
+            cell_text = " ".join(cell.text.split())
+            if cell_text:
+                cells.append(cell_text)
+        if cells:
+            yield TABLE_CELL_SEPARATOR.join(cells)
 
 
 def _extract_text_from_docx(content: bytes) -> str:
-    document = Document(BytesIO(content))
-    chunks = [paragraph.text for paragraph in document.paragraphs if paragraph.text]
+    """Текст абзацев и таблиц в порядке документа; строка таблицы — одна строка текста."""
+    # python-docx тянет lxml: импортируем при первом DOCX, а не при старте сервиса
+    from docx import Document
+    from docx.table import Table
 
-    for table in document.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                cell_text = cell.text.strip()
-                if cell_text:
-                    chunks.append(cell_text)
+    document = Document(BytesIO(content))
+    chunks: list[str] = []
+    for block in document.iter_inner_content():
+        if isinstance(block, Table):
+            chunks.extend(_table_rows(block))
+            # Пустая строка отделяет соседние таблицы друг от друга
+            chunks.append("")
+        elif block.text:
+            chunks.append(block.text)
 
     return "\n".join(chunks)
 
 
-async def read_text_from_upload(file: UploadFile) -> str:
-    content = await file.read()
-
-    if _is_docx(file):
+def decode_document(content: bytes, filename: str | None = None, content_type: str | None = None) -> str:
+    """Decode an uploaded document (DOCX or plain text) into a string."""
+    if _is_docx(filename, content_type):
         try:
             return _extract_text_from_docx(content)
         except Exception:
@@ -43,6 +70,16 @@ async def read_text_from_upload(file: UploadFile) -> str:
         return content.decode("cp1251", errors="ignore")
 
 
+async def read_text_from_upload(file: UploadFile) -> str:
+    content = await file.read()
+    return decode_document(content, file.filename, file.content_type)
+
+
+def read_text_from_path(path: str | Path) -> str:
+    path = Path(path)
+    return decode_document(path.read_bytes(), path.name)
+
+
 async def read_json_from_upload(file: UploadFile):
     text = await read_text_from_upload(file)
     return json.loads(text)
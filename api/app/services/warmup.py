@@ -0,0 +1,94 @@
+"""Model warm-up at startup and keep-alive refresh while requests keep coming.
+
+Loading the 32B model takes longer than most clients wait, so the first
+``/check`` after a deploy or an idle period used to time out. ``ModelWarmer``
+loads the model in the background and reports readiness separately from
+liveness (``/readyz`` vs ``/healthz``).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from ..core.config import CONFIG
+from ..core.metrics import METRICS
+from .ollama_client import OllamaClient, OllamaServiceError
+
+logger = logging.getLogger(__name__)
+
+
+def warmup_num_ctx() -> int:
+    """Размер контекста прогрева: ``LLM_NUM_CTX_WARMUP`` или ``LLM_NUM_CTX_MIN``.
+
+    Вызовы с другим размером (длинные документы) перезагрузят модель; чтобы
+    этого не было совсем, контекст фиксируют: ``LLM_NUM_CTX_MIN = LLM_NUM_CTX_MAX``.
+    """
+    size = CONFIG.llm_num_ctx_warmup or CONFIG.llm_num_ctx_min
+    return max(CONFIG.llm_num_ctx_min, min(size, CONFIG.llm_num_ctx_max))
+
+
+class ModelWarmer:
+    def __init__(self, client: OllamaClient, enabled: bool = True):
+        self._client = client
+        self.enabled = enabled
+        # Без прогрева экземпляр готов сразу: модель загрузится первым запросом
+        self.ready = not enabled
+        self.last_error = ""
+        self.last_warm_up: Optional[float] = None
+        # Старт сервиса тоже считается признаком ожидаемых запросов
+        self._last_activity = time.monotonic()
+
+    def touch(self) -> None:
+        """Отмечает входящий запрос: пока они идут, keep_alive продлевается."""
+        self._last_activity = time.monotonic()
+
+    def _traffic_expected(self) -> bool:
+        return time.monotonic() - self._last_activity <= CONFIG.warmup_traffic_window
+
+    async def warm_up(self) -> bool:
+        """Проверяет модель в Ollama и загружает её; при ошибке экземпляр не готов."""
+        try:
+            if not await self._client.has_model():
+                raise OllamaServiceError(
+                    f"Model '{self._client.model}' is not available in the Ollama service"
+                )
+            started = time.perf_counter()
+            num_ctx = warmup_num_ctx() if CONFIG.dynamic_llm_budget else None
+            await self._client.warm_up(CONFIG.ollama_keep_alive, num_ctx)
+        except OllamaServiceError as exc:
+            METRICS.increment("model_warmup_failures_total")
+            self.ready = False
+            self.last_error = str(exc)
+            logger.warning("Model warm-up failed: %s", exc)
+            return False
+        METRICS.increment("model_warmups_total")
+        if not self.ready:
+            logger.info(
+                "Model %s is warm (%.1f s)", self._client.model, time.perf_counter() - started
+            )
+        self.ready = True
+        self.last_error = ""
+        self.last_warm_up = time.time()
+        return True
+
+    async def run(self) -> None:
+        """Прогрев до успеха, затем продление keep_alive, пока недавно были запросы."""
+        while True:
+            if not self.ready:
+                if not await self.warm_up():
+                    await asyncio.sleep(CONFIG.warmup_retry_interval)
+                    continue
+            await asyncio.sleep(CONFIG.warmup_refresh_interval)
+            if self._traffic_expected():
+                await self.warm_up()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.ready else "warming_up",
+            "model": self._client.model,
+            "warm_up": self.enabled,
+            "last_warm_up": self.last_warm_up,
+            "error": self.last_error,
+        }
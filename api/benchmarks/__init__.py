@@ -0,0 +1 @@
+"""Offline benchmarks for the extraction pipeline (no GPU or real Ollama required)."""
@@ -0,0 +1,73 @@
+"""Benchmark documents: files from ``sample/`` plus synthetic large contracts."""
+from __future__ import annotations
+
+import random
+from pathlib import Path
+from typing import Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+SAMPLE_DIR = REPO_ROOT / "sample"
+
+_HEAD_LINES = 8
+_TAIL_LINES = 70
+
+
+def load_sample_documents(sample_dir: Path = SAMPLE_DIR) -> Dict[str, str]:
+    """Return ``{file name: text}`` for every ``*.txt`` document in ``sample/``."""
+
+    documents: Dict[str, str] = {}
+    for path in sorted(sample_dir.glob("*.txt")):
+        documents[path.name] = path.read_text(encoding="utf-8")
+    return documents
+
+
+def synthetic_contract(target_chars: int, seed: int = 0, base_text: str | None = None) -> str:
+    """Build a contract of roughly ``target_chars`` characters.
+
+    The header (parties) and the tail (specification, totals, signatures) of
+    the base document are kept as is, the body clauses are repeated with
+    renumbering and randomised amounts until the size target is reached.
+    """
+
+    if base_text is None:
+        samples = load_sample_documents()
+        if not samples:
+            raise FileNotFoundError(f"No sample documents found in {SAMPLE_DIR}")
+        base_text = next(iter(samples.values()))
+
+    lines = base_text.splitlines()
+    if len(lines) <= _HEAD_LINES + _TAIL_LINES:
+        head, body, tail = lines[:1], lines[1:], []
+    else:
+        head = lines[:_HEAD_LINES]
+        body = lines[_HEAD_LINES:-_TAIL_LINES]
+        tail = lines[-_TAIL_LINES:]
+
+    rng = random.Random(seed)
+    fixed_chars = sum(len(line) + 1 for line in head + tail)
+    parts: List[str] = list(head)
+    size = fixed_chars
+    section = 1
+    while size < target_chars and body:
+        parts.append(f"{section + 20}. ДОПОЛНИТЕЛЬНЫЕ УСЛОВИЯ (РАЗДЕЛ {section})")
+        for line in body:
+            amount = f"{rng.randint(1_000, 9_999_999):,}".replace(",", " ")
+            parts.append(f"{line} Сумма по разделу {section}: {amount},00 руб.")
+            size += len(parts[-1]) + 1
+            if size >= target_chars:
+                break
+        section += 1
+    parts.extend(tail)
+    return "\n".join(parts)
+
+
+def parse_size(value: str) -> int:
+    """Parse sizes such as ``60k``, ``1m`` or ``250000`` into characters."""
+
+    value = value.strip().lower()
+    multiplier = 1
+    if value.endswith("k"):
+        multiplier, value = 1_000, value[:-1]
+    elif value.endswith("m"):
+        multiplier, value = 1_000_000, value[:-1]
+    return int(float(value) * multiplier)
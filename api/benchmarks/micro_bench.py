@@ -0,0 +1,239 @@
+"""Micro-benchmarks of the CPU-bound stages with a saved baseline and a comparison report.
+
+Every case runs on synthetic contracts of each requested size (cases that do
+not depend on the document run once). Timings are the best and the median of
+``--repeat`` samples, each sample looping the call long enough to be
+measurable (``timeit`` autorange)::
+
+    cd api
+    python -m benchmarks.micro_bench --sizes 10k,100k,1m,10m --save micro_baseline.json
+    # ... change the code ...
+    python -m benchmarks.micro_bench --sizes 10k,100k,1m,10m --compare micro_baseline.json --json micro.json
+
+With ``--compare`` a case is reported as a regression when its best time grew
+by more than ``--threshold`` (default 20%); the exit code is then 1.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import timeit
+from dataclasses import asdict, dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from docx import Document
+
+from app import main
+from app.services import summary
+from app.services.extractor.llm import LLMExtractor
+from app.services.extractor.rules import RuleBasedExtractor
+from app.services.normalize import extract_number, normalize_whitespace
+from app.services.preprocess import TABLE_CELL_SEPARATOR
+from app.services.utils import _extract_text_from_docx
+
+from .corpus import REPO_ROOT, parse_size, synthetic_contract
+from .mock_ollama import default_response
+
+_NUMBER_RE = re.compile(r"\d[\d\s ]*(?:[.,]\d+)?")
+
+
+@dataclass
+class CaseResult:
+    case: str
+    # Размер документа в символах; 0 — случай не зависит от документа
+    size: int
+    best_ms: float
+    median_ms: float
+    loops: int
+    samples: int
+
+
+@dataclass
+class Comparison:
+    case: str
+    size: int
+    baseline_ms: Optional[float]
+    current_ms: Optional[float]
+    ratio: Optional[float]
+    status: str
+
+
+def synthetic_docx(text: str) -> bytes:
+    """DOCX with the contract as paragraphs; table-like lines become a real table."""
+
+    document = Document()
+    rows: List[List[str]] = []
+
+    def flush_table() -> None:
+        if not rows:
+            return
+        width = max(len(row) for row in rows)
+        table = document.add_table(rows=len(rows), cols=width)
+        for row, cells in zip(table.rows, rows):
+            for cell, value in zip(row.cells, cells):
+                cell.text = value
+        rows.clear()
+
+    for line in text.splitlines():
+        if TABLE_CELL_SEPARATOR in line:
+            rows.append(line.split(TABLE_CELL_SEPARATOR))
+            continue
+        flush_table()
+        document.add_paragraph(line)
+    flush_table()
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def _measure(func: Callable[[], Any], repeat: int) -> tuple[float, float, int]:
+    timer = timeit.Timer(func)
+    loops, _ = timer.autorange()
+    samples = [elapsed / loops * 1000 for elapsed in timer.repeat(repeat=repeat, number=loops)]
+    return min(samples), statistics.median(samples), loops
+
+
+def _document_cases(text: str) -> Dict[str, Callable[[], Any]]:
+    data = default_response()
+    rules = RuleBasedExtractor()
+    numbers = _NUMBER_RE.findall(text)
+    docx_bytes = synthetic_docx(text)
+    loop = asyncio.new_event_loop()
+    return {
+        "normalize_whitespace": lambda: normalize_whitespace(text),
+        "extract_number": lambda: [extract_number(value) for value in numbers],
+        "RuleBasedExtractor.extract": lambda: loop.run_until_complete(rules.extract(text, {})),
+        "summary.build_short_summary": lambda: summary.build_short_summary(data, text),
+        "summary.build_selection_rationale": lambda: summary.build_selection_rationale(data, text),
+        "_extract_text_from_docx": lambda: _extract_text_from_docx(docx_bytes),
+    }
+
+
+def _fixed_cases() -> Dict[str, Callable[[], Any]]:
+    pipeline = main.build_pipeline()
+    field_settings = pipeline.field_settings
+    data = default_response()
+    extractor = pipeline.llm or LLMExtractor(pipeline.schema, system_prompt="", user_template="")
+    return {
+        "SchemaValidator.validate": lambda: pipeline.validator.validate(data),
+        "FieldSettings.build_llm_groups": field_settings.build_llm_groups,
+        "FieldSettings.build_guidelines_bundle": field_settings.build_guidelines_bundle,
+        "LLMExtractor._build_json_skeleton": extractor._build_json_skeleton,
+    }
+
+
+def run(sizes: Sequence[int], repeat: int, pattern: Optional[str]) -> List[CaseResult]:
+    selected = re.compile(pattern) if pattern else None
+    results: List[CaseResult] = []
+
+    def bench(name: str, size: int, func: Callable[[], Any]) -> None:
+        if selected is not None and not selected.search(name):
+            return
+        best, median, loops = _measure(func, repeat)
+        result = CaseResult(name, size, round(best, 4), round(median, 4), loops, repeat)
+        results.append(result)
+        print(
+            f"{name:<40} {size or '-':>10} best={result.best_ms:<12} median={result.median_ms:<12} loops={loops}",
+            flush=True,
+        )
+
+    for name, func in _fixed_cases().items():
+        bench(name, 0, func)
+    for index, size in enumerate(sizes):
+        for name, func in _document_cases(synthetic_contract(size, seed=index)).items():
+            bench(name, size, func)
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+    return completed.stdout.strip()
+
+
+def build_report(results: Sequence[CaseResult]) -> Dict[str, Any]:
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": [asdict(result) for result in results],
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[Comparison]:
+    """Cases matched by ``(case, size)``; ``threshold`` is the tolerated relative slowdown."""
+
+    before = {(item["case"], item["size"]): item["best_ms"] for item in baseline["results"]}
+    after = {(item["case"], item["size"]): item["best_ms"] for item in current["results"]}
+    rows: List[Comparison] = []
+    for key in list(before) + [key for key in after if key not in before]:
+        old, new = before.get(key), after.get(key)
+        if old is None or new is None:
+            rows.append(Comparison(key[0], key[1], old, new, None, "new" if old is None else "missing"))
+            continue
+        ratio = round(new / old, 3) if old else None
+        if ratio is None:
+            status = "ok"
+        elif ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 / (1 + threshold):
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append(Comparison(key[0], key[1], old, new, ratio, status))
+    return rows
+
+
+def _print_comparison(baseline: Dict[str, Any], current: Dict[str, Any], rows: Sequence[Comparison]) -> None:
+    print(f"\nbaseline {baseline.get('commit') or '?'} -> current {current.get('commit') or '?'}")
+    print(f"{'case':<40} {'size':>10} {'baseline_ms':>12} {'current_ms':>12} {'ratio':>7}  status")
+    for row in rows:
+        print(
+            f"{row.case:<40} {row.size or '-':>10} {row.baseline_ms if row.baseline_ms is not None else '-':>12} "
+            f"{row.current_ms if row.current_ms is not None else '-':>12} "
+            f"{row.ratio if row.ratio is not None else '-':>7}  {row.status}"
+        )
+
+
+def main_cli(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10k,100k,1m", help="synthetic contract sizes, e.g. 10k,1m,10m")
+    parser.add_argument("--repeat", type=int, default=5, help="samples per case")
+    parser.add_argument("--filter", help="regular expression selecting case names")
+    parser.add_argument("--json", dest="json_path", help="write the results to this JSON file")
+    parser.add_argument("--save", help="write the results as a baseline to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="tolerated relative slowdown")
+    args = parser.parse_args(argv)
+
+    results = run([parse_size(size) for size in args.sizes.split(",") if size], args.repeat, args.filter)
+    report = build_report(results)
+    for path in filter(None, (args.json_path, args.save)):
+        Path(path).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    if not args.compare:
+        return 0
+
+    baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+    if args.filter:
+        # Отфильтрованные случаи не считаются пропавшими
+        selected = re.compile(args.filter)
+        baseline["results"] = [item for item in baseline["results"] if selected.search(item["case"])]
+    rows = compare(baseline, report, args.threshold)
+    _print_comparison(baseline, report, rows)
+    return 1 if any(row.status == "regression" for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,188 @@
+"""Minimal fake Ollama HTTP server for offline benchmarks.
+
+The server speaks just enough of the Ollama API for :class:`OllamaClient`:
+``GET /api/tags``, ``POST /api/chat`` and ``POST /api/generate`` (both
+streaming NDJSON and non-streaming). Every generation request sleeps for a
+configurable amount of time and answers with a canned JSON object, together
+with the token counters Ollama normally reports.
+"""
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+GOLD_PATH = REPO_ROOT / "test" / "sample_gold.json"
+
+_SUMMARY_DEFAULTS = {
+    "КраткоеСодержание": "Договор: АО «ОЭЗ ППТ «Алабуга» ⇄ ООО «ИНСНАБ». Сумма: 1 215 616 руб.",
+    "ОбоснованиеВыбора": "Выбор ООО «ИНСНАБ» обоснован: цена 1 215 616 руб.; НДС 20% выделен.",
+}
+
+
+def default_response() -> Dict[str, Any]:
+    """Return the canned answer: the gold sample plus summary fields."""
+
+    payload: Dict[str, Any] = {}
+    if GOLD_PATH.exists():
+        payload.update(json.loads(GOLD_PATH.read_text(encoding="utf-8-sig")))
+    payload.update(_SUMMARY_DEFAULTS)
+    return payload
+
+
+@dataclass
+class MockOllamaSettings:
+    model: str = "mock-model"
+    base_latency_ms: float = 50.0
+    # Extra latency per 1000 prompt characters, emulating prefill cost.
+    prefill_ms_per_1k_chars: float = 0.0
+    jitter_ms: float = 0.0
+    stream_chunks: int = 8
+    response: Dict[str, Any] = field(default_factory=default_response)
+
+
+class MockOllamaServer:
+    """Fake Ollama served from a background thread.
+
+    Usage::
+
+        with MockOllamaServer(MockOllamaSettings(base_latency_ms=20)) as server:
+            client = OllamaClient(base_url=server.url)
+    """
+
+    def __init__(self, settings: MockOllamaSettings | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.settings = settings or MockOllamaSettings()
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.requests_served = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "MockOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def _count_request(self) -> None:
+        with self._lock:
+            self.requests_served += 1
+
+    def _latency_seconds(self, prompt_chars: int) -> float:
+        settings = self.settings
+        latency = settings.base_latency_ms + settings.prefill_ms_per_1k_chars * prompt_chars / 1000
+        if settings.jitter_ms:
+            latency += random.uniform(0, settings.jitter_ms)
+        return max(latency, 0.0) / 1000
+
+
+def _make_handler(server: MockOllamaServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - stdlib signature
+            return
+
+        def do_GET(self) -> None:  # noqa: N802 - stdlib naming
+            if self.path != "/api/tags":
+                self._send_json(404, {"error": "not found"})
+                return
+            self._send_json(200, {"models": [{"name": server.settings.model, "model": server.settings.model}]})
+
+        def do_POST(self) -> None:  # noqa: N802 - stdlib naming
+            if self.path not in {"/api/chat", "/api/generate"}:
+                self._send_json(404, {"error": "not found"})
+                return
+
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send_json(400, {"error": "invalid json"})
+                return
+
+            server._count_request()
+            if self.path == "/api/chat":
+                prompt_chars = sum(len(m.get("content", "")) for m in payload.get("messages", []))
+            else:
+                prompt_chars = len(payload.get("system", "")) + len(payload.get("prompt", ""))
+
+            latency = server._latency_seconds(prompt_chars)
+            time.sleep(latency)
+
+            content = json.dumps(server.settings.response, ensure_ascii=False)
+            latency_ns = int(latency * 1_000_000_000)
+            stats = {
+                "prompt_eval_count": max(prompt_chars // 4, 1),
+                "eval_count": max(len(content) // 4, 1),
+                "prompt_eval_duration": latency_ns // 3,
+                "eval_duration": latency_ns - latency_ns // 3,
+                "load_duration": 0,
+                "total_duration": latency_ns,
+            }
+
+            if payload.get("stream", True):
+                self._send_stream(self.path, content, stats)
+            else:
+                self._send_json(200, {**self._content_message(self.path, content), "done": True, **stats})
+
+        @staticmethod
+        def _content_message(path: str, content: str) -> Dict[str, Any]:
+            if path == "/api/chat":
+                return {"message": {"role": "assistant", "content": content}}
+            return {"response": content}
+
+        def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, path: str, content: str, stats: Dict[str, Any]) -> None:
+            chunks = max(server.settings.stream_chunks, 1)
+            step = max(len(content) // chunks, 1)
+            lines = [
+                {**self._content_message(path, content[i : i + step]), "done": False}
+                for i in range(0, len(content), step)
+            ]
+            lines.append({**self._content_message(path, ""), "done": True, **stats})
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for line in lines:
+                    data = (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+                    self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client went away (e.g. request cancelled) — stop generating.
+                return
+
+    return Handler
@@ -0,0 +1,207 @@
+"""Throughput/latency/memory benchmark for ``ExtractionPipeline`` and ``/check``.
+
+Runs entirely offline against :class:`benchmarks.mock_ollama.MockOllamaServer`::
+
+    cd api
+    python -m benchmarks.pipeline_bench --concurrency 1,4,16 --requests 32 \\
+        --sizes 60k,1m --latency-ms 50 --json bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import resource
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, List, Sequence
+
+import httpx
+
+from app import main
+from app.services.ollama_client import OllamaClient
+
+from .corpus import load_sample_documents, parse_size, synthetic_contract
+from .mock_ollama import MockOllamaServer, MockOllamaSettings
+
+
+@dataclass
+class LevelResult:
+    target: str
+    concurrency: int
+    requests: int
+    errors: int
+    wall_s: float
+    throughput_rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+    peak_rss_mb: float
+    traced_peak_mb: float | None
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile; ``values`` does not need to be sorted."""
+
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def _peak_rss_mb() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(usage / divisor, 1)
+
+
+def build_documents(sizes: Sequence[int]) -> List[str]:
+    documents = list(load_sample_documents().values())
+    base = documents[0] if documents else None
+    for index, size in enumerate(sizes):
+        documents.append(synthetic_contract(size, seed=index, base_text=base))
+    return documents
+
+
+async def run_level(
+    target: str,
+    call: Callable[[str], Awaitable[bool]],
+    documents: Sequence[str],
+    concurrency: int,
+    total_requests: int,
+    trace_memory: bool,
+) -> LevelResult:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        text = documents[index % len(documents)]
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                ok = await call(text)
+            except Exception:
+                ok = False
+            latencies.append((time.perf_counter() - started) * 1000)
+            if not ok:
+                errors += 1
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total_requests)))
+    wall = time.perf_counter() - started
+    traced_peak = None
+    if trace_memory:
+        traced_peak = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        tracemalloc.stop()
+
+    return LevelResult(
+        target=target,
+        concurrency=concurrency,
+        requests=total_requests,
+        errors=errors,
+        wall_s=round(wall, 3),
+        throughput_rps=round(total_requests / wall, 2) if wall else 0.0,
+        p50_ms=round(percentile(latencies, 50), 1),
+        p95_ms=round(percentile(latencies, 95), 1),
+        p99_ms=round(percentile(latencies, 99), 1),
+        max_ms=round(max(latencies, default=0.0), 1),
+        peak_rss_mb=_peak_rss_mb(),
+        traced_peak_mb=traced_peak,
+    )
+
+
+async def run_benchmark(args: argparse.Namespace) -> List[LevelResult]:
+    settings = MockOllamaSettings(
+        base_latency_ms=args.latency_ms,
+        prefill_ms_per_1k_chars=args.prefill_ms_per_1k,
+        jitter_ms=args.jitter_ms,
+    )
+    if args.responses:
+        with open(args.responses, "r", encoding="utf-8") as fh:
+            settings.response = json.load(fh)
+
+    documents = build_documents([parse_size(size) for size in args.sizes.split(",") if size])
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+    results: List[LevelResult] = []
+
+    with MockOllamaServer(settings) as server:
+        pipeline = main.build_pipeline(OllamaClient(base_url=server.url, model=settings.model))
+
+        async def call_pipeline(text: str) -> bool:
+            await pipeline.run(text, reuse_results=False)
+            return True
+
+        main.snapshots.install(pipeline)
+        # Документы повторяются: без этого /check отвечал бы из хранилища результатов
+        main.CONFIG.reuse_identical_results = False
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+
+            async def call_check(text: str) -> bool:
+                files = {"file": ("contract.txt", text.encode("utf-8"), "text/plain")}
+                response = await http.post("/check", files=files)
+                # 422 means the pipeline ran but the canned answer failed validation.
+                return response.status_code in (200, 422)
+
+            calls: Dict[str, Callable[[str], Awaitable[bool]]] = {
+                "pipeline": call_pipeline,
+                "check": call_check,
+            }
+            targets = list(calls) if args.target == "both" else [args.target]
+            for target in targets:
+                for level in levels:
+                    result = await run_level(
+                        target, calls[target], documents, level, args.requests, args.trace_memory
+                    )
+                    results.append(result)
+                    _print_row(result)
+
+    return results
+
+
+def _print_row(result: LevelResult) -> None:
+    print(
+        f"{result.target:<9} c={result.concurrency:<4} n={result.requests:<5} "
+        f"err={result.errors:<3} rps={result.throughput_rps:<8} "
+        f"p50={result.p50_ms:<8} p95={result.p95_ms:<8} p99={result.p99_ms:<8} "
+        f"rss={result.peak_rss_mb}MB"
+        + (f" traced={result.traced_peak_mb}MB" if result.traced_peak_mb is not None else ""),
+        flush=True,
+    )
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=("pipeline", "check", "both"), default="both")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="requests per concurrency level")
+    parser.add_argument("--sizes", default="60k,1m", help="synthetic contract sizes, e.g. 60k,1m")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="fixed mock latency per LLM call")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=0.0, help="extra latency per 1000 prompt chars")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--responses", help="JSON file with the canned LLM answer")
+    parser.add_argument("--trace-memory", action="store_true", help="also report tracemalloc peak (slower)")
+    parser.add_argument("--json", dest="json_path", help="write results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run_benchmark(args))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump([asdict(result) for result in results], fh, ensure_ascii=False, indent=2)
+    return 0 if all(result.errors == 0 for result in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main_cli())
@@ -0,0 +1,173 @@
+"""Cold-start benchmark: ``import app.main`` and the first ``/check`` in a fresh process.
+
+Every run starts a new interpreter, imports the application, then sends two
+``/check`` requests straight to the ASGI app (no HTTP client is imported up
+front, so lazily imported modules are charged to the request that needs
+them). Ollama is replaced by :class:`benchmarks.mock_ollama.MockOllamaServer`::
+
+    cd api
+    python -m benchmarks.startup_bench --runs 10
+    python -m benchmarks.startup_bench --runs 10 --docx --asset-snapshot --json startup.json
+
+With ``--asset-snapshot`` the runs share a temporary ``ASSET_SNAPSHOT_DIR``;
+the first run writes the snapshot and is reported separately.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+_API_DIR = Path(__file__).resolve().parents[1]
+_HEAVY_MODULES = ("httpx", "docx", "jsonschema", "lxml")
+
+
+def _child(docx_path: str | None) -> Dict[str, Any]:
+    """One measurement; runs in the fresh interpreter.
+
+    The DOCX is prepared by the parent, so python-docx is first imported by
+    the request that parses it.
+    """
+
+    import asyncio
+    import time
+
+    started = time.perf_counter()
+    from app import main
+
+    import_ms = (time.perf_counter() - started) * 1000
+    loaded_at_import = [name for name in _HEAVY_MODULES if name in sys.modules]
+
+    from .corpus import load_sample_documents
+    from .mock_ollama import MockOllamaServer, MockOllamaSettings
+
+    docx = docx_path is not None
+    if docx:
+        content = Path(docx_path).read_bytes()
+        # Второй запрос — другой файл, чтобы не попасть в хранилище результатов
+        bodies = [content, content.replace(b"</w:body>", b"<w:p/></w:body>")]
+    else:
+        text = next(iter(load_sample_documents().values()))
+        bodies = [(text + f"\n{index}").encode("utf-8") for index in range(2)]
+
+    async def call(body: bytes) -> tuple[float, int]:
+        boundary = "startupbench"
+        filename = "contract.docx" if docx else "contract.txt"
+        payload = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode() + body + f"\r\n--{boundary}--\r\n".encode()
+        content_type = f"multipart/form-data; boundary={boundary}"
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/check",
+            "raw_path": b"/check",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(payload)).encode())],
+            "client": ("127.0.0.1", 0),
+            "server": ("bench", 80),
+        }
+        messages = [{"type": "http.request", "body": payload, "more_body": False}]
+        status = 0
+        finished = asyncio.Event()
+
+        async def receive() -> Dict[str, Any]:
+            if messages:
+                return messages.pop(0)
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                finished.set()
+
+        request_started = time.perf_counter()
+        await main.app(scope, receive, send)
+        return (time.perf_counter() - request_started) * 1000, status
+
+    async def requests() -> List[tuple[float, int]]:
+        return [await call(body) for body in bodies]
+
+    with MockOllamaServer(MockOllamaSettings(base_latency_ms=0)) as server:
+        main.ollama_client.base_url = server.url
+        (first_ms, first_status), (second_ms, second_status) = asyncio.run(requests())
+    return {
+        "import_ms": round(import_ms, 1),
+        "first_request_ms": round(first_ms, 1),
+        "second_request_ms": round(second_ms, 1),
+        "status": [first_status, second_status],
+        "loaded_at_import": loaded_at_import,
+    }
+
+
+def _run_child(docx_path: str | None, env: Dict[str, str]) -> Dict[str, Any]:
+    command = [sys.executable, "-m", "benchmarks.startup_bench", "--child"]
+    if docx_path is not None:
+        command += ["--docx-path", docx_path]
+    completed = subprocess.run(command, cwd=_API_DIR, env=env, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _summary(runs: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    keys = ("import_ms", "first_request_ms", "second_request_ms")
+    return {
+        "runs": len(runs),
+        **{f"{key[:-3]}_median_ms": round(statistics.median(run[key] for run in runs), 1) for key in keys},
+        **{f"{key[:-3]}_min_ms": round(min(run[key] for run in runs), 1) for key in keys},
+        "loaded_at_import": runs[-1]["loaded_at_import"],
+        "status": runs[-1]["status"],
+    }
+
+
+def main_cli(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes to measure")
+    parser.add_argument("--docx", action="store_true", help="upload the sample as DOCX instead of plain text")
+    parser.add_argument("--asset-snapshot", action="store_true", help="start from an asset snapshot")
+    parser.add_argument("--json", dest="json_path", help="write the summary to this JSON file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--docx-path", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(_child(args.docx_path)))
+        return 0
+
+    env = dict(os.environ, MODEL_WARMUP="false", STATE_DB_PATH="", COUNTERPARTY_LEARNING="false")
+    env.pop("ASSET_SNAPSHOT_DIR", None)
+    report: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        docx_path = None
+        if args.docx:
+            from .corpus import load_sample_documents
+            from .micro_bench import synthetic_docx
+
+            docx_path = os.path.join(workdir, "contract.docx")
+            Path(docx_path).write_bytes(synthetic_docx(next(iter(load_sample_documents().values()))))
+        if args.asset_snapshot:
+            env["ASSET_SNAPSHOT_DIR"] = os.path.join(workdir, "snapshots")
+            report["snapshot_build"] = _run_child(docx_path, env)
+        runs = [_run_child(docx_path, env) for _ in range(args.runs)]
+    report["summary"] = _summary(runs)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0 if all(status in (200, 422) for run in runs for status in run["status"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
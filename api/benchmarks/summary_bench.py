@@ -0,0 +1,86 @@
+"""Benchmark of the summary fallbacks on large documents.
+
+Compares the precompiled category matcher with the previous per-keyword
+substring scans (checking that both detect the same categories) and times
+the digest build and the fallbacks, which only look at the digest::
+
+    cd api
+    python -m benchmarks.summary_bench --sizes 60k,1m,10m
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any, Callable, Dict, List, Sequence
+
+from app.services import summary
+
+from .corpus import parse_size, synthetic_contract
+
+_DATA: Dict[str, Any] = {
+    "Организация": "АО «ОЭЗ ППТ «Алабуга»",
+    "Контрагент": "ИНСНАБ ООО (ИНН:1650381764 КПП:165001001)",
+    "Сумма": 1215616,
+    "СуммаНДС": 202602.67,
+    "СтавкаНДС": "20",
+    "СпособОплаты": "100% по факту",
+}
+
+
+def reference_match_categories(lowered_text: str) -> List[str]:
+    """The original keyword search: one substring scan per keyword."""
+
+    return [
+        label
+        for label, keywords in summary._CATEGORY_KEYWORDS.items()
+        if any(keyword.lower() in lowered_text for keyword in keywords)
+    ]
+
+
+def _time_ms(func: Callable[[], Any], repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def run(sizes: Sequence[int], repeat: int) -> int:
+    mismatches = 0
+    print(
+        f"{'size':>10} {'reference_ms':>13} {'matcher_ms':>11} {'digest_ms':>10} "
+        f"{'short_summary_ms':>17} {'rationale_ms':>13}"
+    )
+    for index, size in enumerate(sizes):
+        texts = {
+            "contract": synthetic_contract(size, seed=index),
+            # worst case for substring scans: no keyword occurs at all
+            "no-hit": "а" * size,
+        }
+        for kind, text in texts.items():
+            lowered = text.lower()
+            expected = reference_match_categories(lowered)
+            actual = summary._match_categories(lowered)
+            if expected != actual:
+                mismatches += 1
+                print(f"MISMATCH {kind} {size}: {expected} != {actual}")
+            digest = summary.build_document_digest(text)
+            print(
+                f"{size:>10} {_time_ms(lambda: reference_match_categories(lowered), repeat):>13.2f} "
+                f"{_time_ms(lambda: summary._match_categories(lowered), repeat):>11.2f} "
+                f"{_time_ms(lambda: summary.build_document_digest(text), repeat):>10.2f} "
+                f"{_time_ms(lambda: summary.build_short_summary(_DATA, digest), repeat):>17.2f} "
+                f"{_time_ms(lambda: summary.build_selection_rationale(_DATA, digest), repeat):>13.2f}  {kind}"
+            )
+    return 1 if mismatches else 0
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="60k,1m,10m")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    return run([parse_size(size) for size in args.sizes.split(",") if size], args.repeat)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
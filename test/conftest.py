@@ -0,0 +1,7 @@
+import os
+import sys
+from pathlib import Path
+
+# Тесты запускаются из корня репозитория: пакет app лежит в api/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "api"))
+os.environ.setdefault("USE_LLM", "false")
@@ -0,0 +1,71 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.services.extractor.budget import context_tokens, document_chars, output_tokens
+from app.services.preprocess import estimate_tokens
+
+SCHEMA_PATH = Path(__file__).resolve().parents[1] / "api" / "app" / "assets" / "schema.json"
+
+
+@pytest.mark.parametrize(
+    ("prompt_tokens", "num_predict", "expected"),
+    [
+        (0, 1, 4096),
+        (1000, 200, 4096),
+        (5000, 200, 8192),
+        (12000, 1000, 16384),
+        (100000, 1024, 32768),
+    ],
+)
+def test_context_is_power_of_two_within_bounds(prompt_tokens, num_predict, expected):
+    assert context_tokens(prompt_tokens, num_predict, 4096, 32768) == expected
+
+
+def test_context_covers_prompt_and_answer():
+    for prompt_tokens in range(0, 25000, 997):
+        size = context_tokens(prompt_tokens, 300, 1, 1 << 20)
+        assert size & (size - 1) == 0
+        assert size >= prompt_tokens + 300
+
+
+def test_output_grows_with_fields_and_respects_cap():
+    number = {"type": "object", "properties": {"Сумма": {"type": "number"}}}
+    strings = {
+        "type": "object",
+        "properties": {f"Поле{index}": {"type": "string"} for index in range(10)},
+    }
+
+    assert output_tokens(number, 1024) < output_tokens(strings, 1024)
+    assert output_tokens(strings, 100) == 100
+
+
+def test_output_budget_follows_field_types():
+    def single(meta):
+        return output_tokens({"properties": {"x": meta}}, 10_000)
+
+    assert single({"type": "boolean"}) < single({"type": "number"}) < single({"type": "string"})
+    assert single({"type": "string", "format": "date"}) < single({"type": "string"})
+    assert single({"type": "string", "maxLength": 10}) < single({"type": "string", "maxLength": 500})
+    assert single({"type": ["null", "integer"]}) == single({"type": "integer"})
+    assert single({"enum": ["да", "нет"]}) < single({"type": "string"})
+
+
+def test_repo_schema_fits_default_max_tokens():
+    schema = json.loads(SCHEMA_PATH.read_text(encoding="utf-8"))
+
+    assert 0 < output_tokens(schema, 1_000_000)
+    assert output_tokens(schema, 1024) <= 1024
+
+
+@pytest.mark.parametrize("overhead", [0, 1500, 6000])
+def test_document_chars_fit_context(overhead):
+    num_predict = 400
+    chars = document_chars(overhead, num_predict, 16384)
+
+    for text in ("я" * chars, "a" * chars, "1 " * (chars // 2)):
+        prompt_tokens = overhead + estimate_tokens(text)
+        size = context_tokens(prompt_tokens, num_predict, 4096, 1 << 20)
+        assert size <= 16384
+    assert document_chars(16384, num_predict, 16384) == 0
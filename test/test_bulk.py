@@ -0,0 +1,77 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, Set
+
+from app.services.bulk import collect_documents, run_bulk  # type: ignore
+
+
+class FakePipeline:
+    """Возвращает длину текста; документы с текстом из ``failing`` падают."""
+
+    def __init__(self, failing: Set[str]):
+        self.failing = failing
+
+    async def run_prepared(self, prepared: Any, reuse_results: bool = True):
+        if prepared.text in self.failing:
+            raise RuntimeError("model is unavailable")
+        return {"chars": len(prepared.text)}, [], [], {"result_id": prepared.text}, ""
+
+
+def _records(path: Path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def _run(pipeline: FakePipeline, documents, output: Path, **kwargs):
+    return asyncio.run(run_bulk(pipeline, documents, output, workers=1, concurrency=2, **kwargs))
+
+
+def test_manifest_duplicates_keep_the_first_document(tmp_path: Path) -> None:
+    (tmp_path / "a.txt").write_text("a", encoding="utf-8")
+    (tmp_path / "b.txt").write_text("b", encoding="utf-8")
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text(
+        '{"id": "x", "path": "a.txt"}\n{"id": "x", "path": "b.txt"}\nb.txt\nb.txt\n', encoding="utf-8"
+    )
+
+    documents = collect_documents(manifest=manifest)
+
+    assert [(document.id, document.path.name) for document in documents] == [("x", "a.txt"), ("b.txt", "b.txt")]
+
+
+def test_retry_failed_replaces_failed_records(tmp_path: Path) -> None:
+    source = tmp_path / "in"
+    source.mkdir()
+    for name in ("ok", "flaky"):
+        (source / f"{name}.txt").write_text(name, encoding="utf-8")
+    output = tmp_path / "results.jsonl"
+    documents = collect_documents(source)
+
+    first = _run(FakePipeline({"flaky"}), documents, output)
+    assert (first.total, first.processed, first.failed) == (2, 2, 1)
+
+    second = _run(FakePipeline(set()), documents, output, retry_failed=True)
+    records = _records(output)
+    assert (second.total, second.skipped, second.processed, second.failed) == (2, 1, 1, 0)
+    assert sorted(record["id"] for record in records) == ["flaky.txt", "ok.txt"]
+    assert not any("error" in record for record in records)
+    checkpoint = json.loads((tmp_path / "results.jsonl.checkpoint").read_text(encoding="utf-8"))
+    assert checkpoint["offset"] == output.stat().st_size
+
+
+def test_interrupted_run_resumes_after_the_last_complete_record(tmp_path: Path) -> None:
+    source = tmp_path / "in"
+    source.mkdir()
+    for name in ("a", "b", "c"):
+        (source / f"{name}.txt").write_text(name, encoding="utf-8")
+    output = tmp_path / "results.jsonl"
+    documents = collect_documents(source)
+    _run(FakePipeline(set()), documents[:2], output)
+    # Оборванная запись после последней контрольной точки
+    with output.open("ab") as handle:
+        handle.write(b'{"id": "c.txt", "da')
+
+    progress = _run(FakePipeline(set()), documents, output)
+
+    assert (progress.total, progress.skipped, progress.processed) == (3, 2, 1)
+    assert [record["id"] for record in _records(output)] == ["a.txt", "b.txt", "c.txt"]
@@ -0,0 +1,86 @@
+import pytest
+
+from app.services.extractor.chunking import merge_values, merge_window_results, split_windows  # type: ignore
+
+
+def _sentences(count: int) -> str:
+    return " ".join(f"Предложение номер {index} о поставке товара." for index in range(count))
+
+
+def test_short_text_and_disabled_windowing_give_one_window() -> None:
+    text = _sentences(10)
+
+    assert split_windows(text, len(text), 100) == [(0, len(text))]
+    assert split_windows(text, 0, 100) == [(0, len(text))]
+    assert split_windows("", 100, 10) == [(0, 0)]
+
+
+@pytest.mark.parametrize("size, overlap", [(500, 100), (1000, 0), (300, 1000)])
+def test_windows_cover_the_text_with_bounded_size_and_overlap(size: int, overlap: int) -> None:
+    text = _sentences(200)
+
+    windows = split_windows(text, size, overlap)
+
+    assert windows[0][0] == 0 and windows[-1][1] == len(text)
+    for (start, end), (next_start, _) in zip(windows, windows[1:]):
+        assert 0 < end - start <= size
+        # Без пропусков, перекрытие не больше половины окна
+        assert start < next_start <= end
+        assert end - next_start <= min(overlap, size // 2)
+    for start, end in windows[:-1]:
+        # Граница по концу предложения, начало — с целого слова
+        assert text[end - 1] == "."
+        assert start == 0 or not (text[start - 1].isalnum() and text[start].isalnum())
+
+
+def test_text_without_spaces_is_cut_at_size() -> None:
+    windows = split_windows("x" * 250, 100, 10)
+
+    assert windows == [(0, 100), (90, 190), (180, 250)]
+
+
+@pytest.mark.parametrize(
+    "rule, candidates, expected",
+    [
+        ("first", ["", "ООО «Альфа»", "ООО «Бета»"], "ООО «Альфа»"),
+        ("max", ["1 000,50", 2000, None, "900"], 2000),
+        ("max", [1000, 1000.0], 1000),
+        ("max", ["не указано", ""], "не указано"),
+        ("majority", ["RUB", "USD", " rub ", "USD", "rub"], "RUB"),
+        ("majority", ["20", "10"], "20"),
+        ("first", [None, ""], None),
+        ("first", [], None),
+    ],
+)
+def test_merge_values(rule, candidates, expected) -> None:
+    assert merge_values(rule, candidates) == expected
+
+
+@pytest.mark.parametrize(
+    "rule, candidates, expected",
+    [
+        # Ответ из шаблона (0 / false) уступает содержательному ответу любого окна
+        ("max", [0, 48000.0], 48000.0),
+        ("majority", [False, False, True], True),
+        ("first", [0, "", 120], 120),
+        # Если другого ответа нет, ноль и «нет» сохраняются, а не теряются за null
+        ("max", [None, 0], 0),
+        ("majority", [None, False, ""], False),
+        ("first", ["", 0.0], 0.0),
+    ],
+)
+def test_zero_and_false_are_weak_answers(rule, candidates, expected) -> None:
+    assert merge_values(rule, candidates) == expected
+
+
+def test_merge_window_results_uses_field_rules_and_skips_missing_fields() -> None:
+    results = [
+        {"Сумма": "100", "Валюта": "RUB", "ОЭЗ_Резидент": False},
+        {"Сумма": "250", "Валюта": "USD"},
+        {"Сумма": 0, "Валюта": "RUB", "ОЭЗ_Резидент": False},
+    ]
+    rules = {"Сумма": "max", "Валюта": "majority", "ОЭЗ_Резидент": "majority"}
+
+    merged = merge_window_results(["Сумма", "Валюта", "ОЭЗ_Резидент", "СрокДоговора"], results, rules)
+
+    assert merged == {"Сумма": "250", "Валюта": "RUB", "ОЭЗ_Резидент": False}
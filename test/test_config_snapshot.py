@@ -0,0 +1,59 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from app.core.config_store import InterProcessLock  # type: ignore
+from app.services.config_snapshot import ConfigSnapshotManager  # type: ignore
+
+
+def _manager(paths):
+    return ConfigSnapshotManager(lambda: object(), paths)
+
+
+def test_version_is_the_same_in_every_worker_and_follows_content(tmp_path: Path) -> None:
+    schema = tmp_path / "schema.json"
+    schema.write_text('{"type": "object"}', encoding="utf-8")
+
+    first, second = _manager([schema]), _manager([schema])
+    assert first.current.version == second.current.version
+
+    schema.write_text('{"type": "object", "title": "x"}', encoding="utf-8")
+    assert first.reload_if_changed()
+    assert first.current.version != second.current.version
+    assert second.reload_if_changed()
+    assert first.current.version == second.current.version
+
+    # Перезагрузка без изменения содержимого версию не меняет
+    version = first.current.version
+    assert first.reload_if_changed(force=True)
+    assert first.current.version == version
+
+
+_TRY_LOCK = """
+import fcntl, sys
+with open(sys.argv[1], "a+") as handle:
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        print("locked")
+    else:
+        print("free")
+"""
+
+
+def _other_process_sees(path: Path) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", _TRY_LOCK, str(path)], capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip()
+
+
+def test_override_lock_excludes_other_processes(tmp_path: Path) -> None:
+    lock = InterProcessLock(tmp_path / "users_assets" / ".overrides.lock")
+
+    lock.acquire()
+    try:
+        assert _other_process_sees(lock.path) == "locked"
+    finally:
+        lock.release()
+    assert _other_process_sees(lock.path) == "free"
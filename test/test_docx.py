@@ -0,0 +1,43 @@
+from io import BytesIO
+
+from docx import Document  # type: ignore
+
+from app.services.preprocess import TABLE_CELL_SEPARATOR  # type: ignore
+from app.services.utils import decode_document  # type: ignore
+
+
+def _docx_with_table(rows, merge=None) -> bytes:
+    document = Document()
+    document.add_paragraph("Спецификация")
+    table = document.add_table(rows=len(rows), cols=len(rows[0]))
+    for row, values in zip(table.rows, rows):
+        for cell, value in zip(row.cells, values):
+            cell.text = value
+    if merge is not None:
+        (row_a, col_a), (row_b, col_b) = merge
+        table.cell(row_a, col_a).merge(table.cell(row_b, col_b))
+    document.add_paragraph("Итого")
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def _lines(content: bytes):
+    return decode_document(content, "spec.docx").splitlines()
+
+
+def test_equal_neighbouring_cells_are_kept() -> None:
+    content = _docx_with_table([["Ноутбук", "шт.", "шт.", "1", "1"]])
+
+    assert _lines(content)[1] == TABLE_CELL_SEPARATOR.join(["Ноутбук", "шт.", "шт.", "1", "1"])
+
+
+def test_merged_cell_is_read_once() -> None:
+    content = _docx_with_table([["Поставка оборудования", "", "100"], ["Ноутбук", "5", "20"]], merge=((0, 0), (0, 1)))
+
+    lines = _lines(content)
+
+    assert lines[0] == "Спецификация"
+    assert lines[1] == TABLE_CELL_SEPARATOR.join(["Поставка оборудования", "100"])
+    assert lines[2] == TABLE_CELL_SEPARATOR.join(["Ноутбук", "5", "20"])
+    assert lines[-1] == "Итого"
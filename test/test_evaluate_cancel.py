@@ -0,0 +1,64 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app import main  # type: ignore
+
+
+class _HangingPipeline:
+    def __init__(self) -> None:
+        self.started = 0
+        self.cancelled = 0
+
+    async def run(self, *args, **kwargs):
+        self.started += 1
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+class _Request:
+    def __init__(self, disconnected: bool) -> None:
+        self.disconnected = disconnected
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+
+def _payload():
+    return {"samples": [{"name": "a", "text": "Договор поставки", "expected": {}}]}
+
+
+def _use(monkeypatch, pipeline):
+    snapshots = SimpleNamespace(current=SimpleNamespace(pipeline=pipeline))
+    monkeypatch.setattr(main, "_profile_snapshots", lambda profile: snapshots)
+    monkeypatch.setattr(main.CONFIG, "disconnect_poll_interval", 0.01)
+
+
+def test_evaluate_stops_when_client_disconnects(monkeypatch):
+    pipeline = _HangingPipeline()
+    _use(monkeypatch, pipeline)
+    monkeypatch.setattr(main.CONFIG, "request_deadline_seconds", 0)
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(asyncio.wait_for(main.evaluate(_Request(disconnected=True), _payload()), 5))
+
+    assert raised.value.status_code == 499
+    assert pipeline.started == 1
+    assert pipeline.cancelled == 1
+
+
+def test_evaluate_respects_request_deadline(monkeypatch):
+    pipeline = _HangingPipeline()
+    _use(monkeypatch, pipeline)
+    monkeypatch.setattr(main.CONFIG, "request_deadline_seconds", 0.05)
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(asyncio.wait_for(main.evaluate(_Request(disconnected=False), _payload()), 5))
+
+    assert raised.value.status_code == 504
+    assert pipeline.cancelled == 1
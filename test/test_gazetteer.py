@@ -0,0 +1,143 @@
+import asyncio
+import json
+import threading
+from pathlib import Path
+
+from app import main  # type: ignore
+from app.core.config import CONFIG  # type: ignore
+from app.services.evaluation import EvaluationSample, evaluate_corpus  # type: ignore
+from app.services.gazetteer import (  # type: ignore
+    COUNTERPARTY_FIELD,
+    ORGANIZATION_FIELD,
+    CounterpartyGazetteer,
+    valid_inn,
+)
+
+_INN_WEIGHTS = (2, 4, 10, 3, 5, 9, 4, 6, 8)
+
+
+def _inn(number: int) -> str:
+    """ИНН организации с правильной контрольной цифрой."""
+    body = f"{7700000000 + number * 10:010d}"[:9]
+    check = sum(weight * int(digit) for weight, digit in zip(_INN_WEIGHTS, body)) % 11 % 10
+    inn = body + str(check)
+    assert valid_inn(inn)
+    return inn
+
+
+def _name(number: int) -> str:
+    letters = "абвгдежзиклмнопрстуфхцчшэюя"
+    return "ООО «Ромашка" + letters[number % len(letters)] + letters[number // len(letters)] + "»"
+
+
+def _contract(number: int) -> str:
+    return f"Поставщик: {_name(number)}. Реквизиты: {_name(number)}, ИНН {_inn(number)}, КПП 770101001."
+
+
+def _gazetteer(tmp_path: Path) -> CounterpartyGazetteer:
+    registry = tmp_path / "counterparties.json"
+    registry.write_text(json.dumps({"organizations": [], "counterparties": []}), encoding="utf-8")
+    return CounterpartyGazetteer(registry, tmp_path / "learned.json")
+
+
+def test_learned_counterparty_is_saved_and_matched_after_reload(tmp_path: Path) -> None:
+    gazetteer = _gazetteer(tmp_path)
+
+    learned = gazetteer.learn(_contract(1), {COUNTERPARTY_FIELD: _name(1)})
+    gazetteer.save()
+    reloaded = _gazetteer(tmp_path)
+
+    assert [item.inn for item in learned] == [_inn(1)]
+    assert gazetteer.learn(_contract(1), {COUNTERPARTY_FIELD: _name(1)}) == []
+    values, _ = reloaded.resolve(f"Покупатель: {_name(1)}")
+    assert values[COUNTERPARTY_FIELD] == learned[0].value
+
+
+def test_save_in_a_thread_while_learning(tmp_path: Path) -> None:
+    gazetteer = _gazetteer(tmp_path)
+    stop = threading.Event()
+    errors = []
+
+    def saver() -> None:
+        while not stop.is_set():
+            try:
+                gazetteer.save()
+            except Exception as exc:  # pragma: no cover - ошибка и есть провал теста
+                errors.append(exc)
+                return
+
+    thread = threading.Thread(target=saver)
+    thread.start()
+    try:
+        for number in range(300):
+            gazetteer.learn(_contract(number), {COUNTERPARTY_FIELD: _name(number)})
+    finally:
+        stop.set()
+        thread.join()
+    gazetteer.save()
+
+    assert errors == []
+    saved = json.loads((tmp_path / "learned.json").read_text(encoding="utf-8"))
+    assert len({item["inn"] for item in saved}) == 300
+
+
+class _NoErrors:
+    def validate(self, data):
+        return []
+
+
+def test_evaluation_does_not_learn_counterparties(monkeypatch) -> None:
+    monkeypatch.setattr(CONFIG, "counterparty_learning", True)
+    calls = []
+    monkeypatch.setattr(main.gazetteer, "learn", lambda text, data: calls.append(text) or [])
+    monkeypatch.setattr(main.gazetteer, "save", lambda: None)
+    pipeline = main.build_pipeline()
+    pipeline.validator = _NoErrors()
+    sample = EvaluationSample(name="sample", text=_contract(5), expected={})
+
+    asyncio.run(evaluate_corpus(pipeline, [sample]))
+    assert calls == []
+
+    asyncio.run(pipeline.run(_contract(6)))
+    assert calls == [_contract(6)]
+
+
+def test_result_with_validation_errors_is_not_learned(monkeypatch) -> None:
+    monkeypatch.setattr(CONFIG, "counterparty_learning", True)
+    calls = []
+    monkeypatch.setattr(main.gazetteer, "learn", lambda text, data: calls.append(text) or [])
+    pipeline = main.build_pipeline()
+
+    _, _, errors, _, _ = asyncio.run(pipeline.run(_contract(7)))
+
+    assert errors
+    assert calls == []
+
+
+def test_organization_answer_is_never_learned(tmp_path: Path) -> None:
+    gazetteer = _gazetteer(tmp_path)
+    # Стороны перепутаны: поставщик в «Организация»
+    learned = gazetteer.learn(_contract(2), {ORGANIZATION_FIELD: _name(2)})
+    (tmp_path / "learned.json").write_text(
+        json.dumps([{"value": _name(3), "inn": _inn(3), "own": True}], ensure_ascii=False),
+        encoding="utf-8",
+    )
+    reloaded = _gazetteer(tmp_path)
+
+    assert learned == []
+    values, _ = reloaded.resolve(_contract(3))
+    assert ORGANIZATION_FIELD not in values
+    assert values[COUNTERPARTY_FIELD] == _name(3)
+
+
+def test_party_mentioned_without_role_does_not_fill_counterparty(tmp_path: Path) -> None:
+    gazetteer = _gazetteer(tmp_path)
+    gazetteer.learn(_contract(4), {COUNTERPARTY_FIELD: _name(4)})
+    mention = f"Товар производства {_name(4)} (ИНН {_inn(4)}) поставляется в заводской упаковке."
+
+    values, matches = gazetteer.resolve(f"Договор поставки. {mention}")
+
+    assert COUNTERPARTY_FIELD not in values
+    assert [match.party_role for match in matches] == [False]
+    values, _ = gazetteer.resolve(f"{_name(4)}, именуемое в дальнейшем «Поставщик». {mention}")
+    assert COUNTERPARTY_FIELD in values
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.extractor.pipeline import ExtractionPipeline  # type: ignore
+from app.services.okpd2 import default_classifier, normalize_code  # type: ignore
+from app.services.summary import build_document_digest  # type: ignore
+
+
+def _resolve(text: str):
+    # _resolve_okpd2 использует только классификатор пайплайна
+    pipeline = SimpleNamespace(okpd2=default_classifier())
+    return ExtractionPipeline._resolve_okpd2(pipeline, build_document_digest(text), None)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("26.20.11", "26.20.11"),
+        ("ОКПД2: 26.20.11.110", "26.20.11.110"),
+        ("ОКПД2 26 20 11", "26.20.11"),
+        ("262011", "26.20.11"),
+        ("26", "26"),
+        ("2025", None),
+        ("12345", None),
+        ("26.20.110", None),
+        (True, None),
+    ],
+)
+def test_normalize_code(value, expected) -> None:
+    assert normalize_code(value) == expected
+
+
+def test_code_next_to_okpd_marker_is_taken_from_document() -> None:
+    code, details = _resolve("Поставка ноутбуков. Код по ОКПД2: 26.20.11, количество 5 шт.")
+
+    assert code == "26.20.11"
+    assert details["source"] == "document"
+
+
+def test_code_from_specification_table_header() -> None:
+    text = "№ | Наименование | Код ОКПД2 | Кол-во\n1 | Ноутбук Lenovo | 26.20.11 | 5"
+
+    assert _resolve(text)[0] == "26.20.11"
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        # Короткие даты совпадают с кодами по форме и по классу
+        "Договор подписан 26.09.25, акт от 12.03.24.",
+        "ОКПД2 указан в спецификации. Срок поставки до 26.09.25.",
+        # Код из классификатора, но без упоминания ОКПД рядом
+        "Позиция 26.20.11 прайс-листа поставщика.",
+        # Известен только класс кода
+        "Код ОКПД2: 26.99.99",
+    ],
+)
+def test_dates_and_unmarked_codes_are_not_document_codes(text: str) -> None:
+    code, details = _resolve(text)
+
+    assert details["document_codes"] == []
+    assert details.get("source") != "document"
+
+
+def test_short_dates_are_not_collected_as_codes() -> None:
+    digest = build_document_digest("Срок: 26.09.25. ОКПД2 26.20.11")
+
+    assert digest.okpd2_codes == ("26.20.11",)
+    assert digest.marked_okpd2_codes == ("26.20.11",)
@@ -0,0 +1,40 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services.ollama_client import OllamaClient, OllamaServiceError
+
+
+def _client(lines):
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = "".join(json.dumps(line) + "\n" for line in lines)
+        return httpx.Response(200, text=body)
+
+    client = OllamaClient(base_url="http://ollama", model="test-model")
+    client._http_client = lambda: httpx.AsyncClient(
+        base_url="http://ollama", transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+def test_chat_joins_streamed_parts():
+    client = _client(
+        [
+            {"message": {"content": '{"a": '}},
+            {"message": {"content": "1}"}, "done": True, "eval_count": 3},
+        ]
+    )
+
+    result = asyncio.run(client.chat("system", "user"))
+
+    assert result.content == '{"a": 1}'
+    assert result.stats.eval_count == 3
+
+
+def test_chat_rejects_stream_without_done_chunk():
+    client = _client([{"message": {"content": '{"a": '}}])
+
+    with pytest.raises(OllamaServiceError, match="before the response was complete"):
+        asyncio.run(client.chat("system", "user"))
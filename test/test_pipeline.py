@@ -0,0 +1,77 @@
+import asyncio
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+from fastapi.testclient import TestClient  # type: ignore
+
+from app import main  # type: ignore
+from app.core.config import CONFIG  # type: ignore
+from app.services.ollama_client import ChatResult, OllamaServiceError  # type: ignore
+
+ROOT = Path(__file__).resolve().parents[1]
+SAMPLE_TEXT_PATH = ROOT / "sample" / "sample_document.txt"
+
+
+class FakeOllama:
+    """Отвечает фиксированным JSON; вызовы с ``failing_system_prompt`` падают."""
+
+    def __init__(self, answer: Dict[str, Any]):
+        self.answer = answer
+        self.failing_system_prompt: Optional[str] = None
+        self.calls = 0
+
+    async def chat(self, system_prompt: str, user_prompt: str, **_: Any) -> ChatResult:
+        self.calls += 1
+        if system_prompt == self.failing_system_prompt:
+            raise OllamaServiceError("summary model is unavailable")
+        return ChatResult(content=json.dumps(self.answer, ensure_ascii=False))
+
+
+def _llm_pipeline(monkeypatch, answer: Dict[str, Any]):
+    monkeypatch.setattr(CONFIG, "use_llm", True)
+    monkeypatch.setattr(CONFIG, "reuse_identical_results", False)
+    monkeypatch.setattr(CONFIG, "counterparty_learning", False)
+    client = FakeOllama(answer)
+    pipeline = main.build_pipeline(client=client)
+    snapshot = SimpleNamespace(current=SimpleNamespace(pipeline=pipeline, version=0))
+    monkeypatch.setattr(main, "_profile_snapshots", lambda profile: snapshot)
+    return pipeline, client
+
+
+def test_check_survives_failed_summary_call(monkeypatch) -> None:
+    pipeline, client = _llm_pipeline(monkeypatch, {"Сумма": 1215616, "Валюта": "RUB"})
+    assert pipeline.summary_llm is not None
+    client.failing_system_prompt = pipeline.summary_llm.system_prompt
+
+    response = TestClient(main.app).post(
+        "/check", files={"file": ("contract.txt", SAMPLE_TEXT_PATH.read_bytes(), "text/plain")}
+    )
+
+    assert response.status_code in (200, 422)
+    body = response.json()
+    assert body["data"]["Сумма"] == 1215616
+    assert body["data"]["Валюта"] == "RUB"
+    calls = body["debug"]["llm_calls"]
+    assert calls[0]["stage"] == "summary" and calls[0]["failed"] is True
+    assert any(call["stage"] == "group" for call in calls)
+    # Краткое содержание строится эвристиками без LLM
+    assert body["data"]["КраткоеСодержание"]
+
+
+def test_long_document_is_split_to_fit_context(monkeypatch) -> None:
+    pipeline, _ = _llm_pipeline(monkeypatch, {"Сумма": 1215616})
+    monkeypatch.setattr(CONFIG, "dynamic_llm_budget", True)
+    monkeypatch.setattr(CONFIG, "llm_window_chars", 0)
+    monkeypatch.setattr(CONFIG, "llm_num_ctx_max", 8192)
+    text = SAMPLE_TEXT_PATH.read_text(encoding="utf-8")
+
+    _, _, _, debug, _ = asyncio.run(pipeline.run(text))
+
+    calls = debug["llm_calls"]
+    assert any(call["stage"] == "summary" for call in calls)
+    assert any(call.get("window") for call in calls)
+    for call in calls:
+        # Промпт и ответ помещаются в контекст: Ollama ничего не обрежет
+        assert call["prompt_tokens_estimate"] + call["num_predict"] <= call["num_ctx"] <= 8192
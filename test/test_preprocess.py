@@ -0,0 +1,93 @@
+from app.services.preprocess import preprocess_document
+
+REQUISITES = """Реквизиты сторон
+Покупатель
+АО «Бета»
+ИНН
+7701234567
+КПП
+770101001
+ОГРН
+1027700132195
+р/с
+40702810900000001234
+к/с
+30101810400000000225
+БИК
+044525225
+Поставщик
+ООО «Ромашка»
+ИНН
+7707083893
+КПП
+773601001
+р/с
+40702810400000004321
+БИК
+044525593"""
+
+SPEC_TABLE = """Спецификация
+№ п/п
+Наименование
+Кол-во
+Цена
+1
+Бумага офисная А4
+10
+250,00
+2
+Картридж лазерный
+2
+4 500,00
+3
+Папка-регистратор
+5
+180,00
+Итого:
+12 400,00"""
+
+
+def test_requisites_one_item_per_line_are_kept():
+    result = preprocess_document(f"Договор поставки\n{REQUISITES}\n")
+
+    assert result.report.tables_removed == 0
+    assert result.report.table_items == []
+    for value in ("7701234567", "770101001", "40702810900000001234", "044525593"):
+        assert value in result.text
+
+
+def test_spec_table_is_collapsed_but_following_requisites_stay():
+    result = preprocess_document(f"Договор поставки\n{SPEC_TABLE}\n{REQUISITES}\n")
+
+    assert result.report.tables_removed == 1
+    assert "Бумага офисная А4" in result.report.table_items
+    assert not any("Бета" in item or "Ромашка" in item for item in result.report.table_items)
+    assert "\n4 500,00\n" not in result.text
+    assert "12 400,00" in result.text
+    for value in ("7701234567", "7707083893", "40702810400000004321"):
+        assert value in result.text
+
+
+def test_numbers_without_table_header_are_kept():
+    lines = "\n".join(f"Пункт {index}\n{index * 100}" for index in range(1, 12))
+
+    result = preprocess_document(f"Договор\n{lines}\n")
+
+    assert result.report.tables_removed == 0
+    assert "1100" in result.text
+
+
+def test_docx_requisites_table_is_kept():
+    rows = "\n".join(
+        f"{label} | {value}"
+        for label, value in [
+            ("ИНН", "7701234567"), ("КПП", "770101001"), ("ОГРН", "1027700132195"),
+            ("р/с", "40702810900000001234"), ("к/с", "30101810400000000225"),
+            ("БИК", "044525225"), ("ИНН", "7707083893"), ("КПП", "773601001"),
+        ]
+    )
+
+    result = preprocess_document(f"Реквизиты\n{rows}\n")
+
+    assert result.report.tables_removed == 0
+    assert "40702810900000001234" in result.text
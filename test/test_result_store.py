@@ -0,0 +1,138 @@
+import asyncio
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.services.result_store import (  # type: ignore
+    ResultStore,
+    SqliteResultStore,
+    StoredGroup,
+    StoredResult,
+    diff_spans,
+    result_id_for,
+    text_fingerprint,
+)
+
+
+def _result(text: str) -> StoredResult:
+    group = StoredGroup(
+        fields=("Сумма", "Валюта"),
+        config_fingerprint="config",
+        segment_fingerprint=text_fingerprint(text),
+        values={"Сумма": 100.5, "Валюта": "RUB"},
+    )
+    return StoredResult(
+        result_id=result_id_for(text),
+        text=text,
+        groups={"Сумма|Валюта": group},
+        summary_fingerprint="summary",
+        summary_payload={"КраткоеСодержание": "Поставка"},
+    )
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path: Path):
+    if request.param == "memory":
+        return ResultStore(max_size=2)
+    return SqliteResultStore(str(tmp_path / "state" / "results.db"), max_size=2)
+
+
+def test_round_trip_and_lookup_by_text(store) -> None:
+    stored = _result("Договор поставки №1")
+    store.put(stored)
+
+    assert store.get(stored.result_id) == stored
+    assert store.find_by_text("Договор поставки №1") == stored
+    assert store.get(result_id_for("другой текст")) is None
+
+
+def test_least_recently_used_result_is_evicted(store) -> None:
+    first, second, third = (_result(f"Договор №{index}") for index in range(3))
+    store.put(first)
+    store.put(second)
+    # Обращение продлевает жизнь записи
+    assert store.get(first.result_id) is not None
+    store.put(third)
+
+    assert len(store) == 2
+    assert store.get(second.result_id) is None
+    assert store.get(first.result_id) is not None
+
+
+def test_async_methods_match_sync_ones(store) -> None:
+    stored = _result("Договор аренды")
+
+    async def scenario():
+        await store.aput(stored)
+        return await store.aget(stored.result_id), await store.afind_by_text("Договор аренды")
+
+    assert asyncio.run(scenario()) == (stored, stored)
+
+
+def test_sqlite_queries_run_outside_the_event_loop_thread(tmp_path: Path, monkeypatch) -> None:
+    store = SqliteResultStore(str(tmp_path / "results.db"))
+    threads = []
+    original_get = SqliteResultStore.get
+
+    def recording_get(self, result_id):
+        threads.append(threading.current_thread())
+        return original_get(self, result_id)
+
+    monkeypatch.setattr(SqliteResultStore, "get", recording_get)
+
+    async def scenario():
+        await store.aput(_result("Договор подряда"))
+        await store.aget(result_id_for("Договор подряда"))
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(scenario())
+    assert threads and threads[0] is not loop_thread
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path: Path) -> None:
+    path = str(tmp_path / "results.db")
+    stored = _result("Договор оказания услуг")
+    SqliteResultStore(path).put(stored)
+
+    assert SqliteResultStore(path).get(stored.result_id) == stored
+
+
+def test_diff_spans_covers_the_changed_region() -> None:
+    old = "Сумма договора 100 рублей, срок 10 дней."
+    new = "Сумма договора 250 рублей, срок 10 дней."
+
+    # Общие префикс и суффикс отбрасываются: «100» → «250» отличается в «25»
+    assert [new[start:end] for start, end in diff_spans(old, new)] == ["25"]
+    assert diff_spans(old, old) == []
+
+
+def test_profiles_do_not_share_results(monkeypatch) -> None:
+    from app import main  # type: ignore
+    from app.core.config import CONFIG  # type: ignore
+
+    monkeypatch.setattr(CONFIG, "counterparty_learning", False)
+    shared = ResultStore()
+    pipelines = {}
+    for profile in ("default", "leasing"):
+        pipelines[profile] = main.build_pipeline(profile=profile)
+        pipelines[profile].result_store = shared
+    text = "Договор поставки № 5. Сумма договора 1000 рублей."
+
+    async def scenario():
+        ids = {}
+        for profile, pipeline in pipelines.items():
+            _, _, _, debug, _ = await pipeline.run(text)
+            ids[profile] = debug["result_id"]
+        # Идентификатор результата одного профиля другой профиль не принимает
+        _, _, _, debug, _ = await pipelines["leasing"].run(
+            text, previous_result_id=ids["default"], reuse_results=False
+        )
+        return ids, debug["incremental"]
+
+    ids, incremental = asyncio.run(scenario())
+
+    assert ids["default"] != ids["leasing"]
+    assert len(shared) == 2
+    assert shared.get(ids["leasing"]).profile == "leasing"
+    assert incremental["previous_found"] is False
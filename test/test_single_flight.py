@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_computation():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.run("key", compute) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+
+    assert calls == [1]
+    assert results == [("result", False), ("result", True), ("result", True)]
+    assert len(flight) == 0
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+
+    async def scenario():
+        return await asyncio.gather(
+            flight.run("a", lambda: asyncio.sleep(0, result="a")),
+            flight.run("b", lambda: asyncio.sleep(0, result="b")),
+        )
+
+    assert asyncio.run(scenario()) == [("a", False), ("b", False)]
+
+
+def test_error_reaches_every_caller_and_is_not_cached():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        results = await asyncio.gather(
+            flight.run("key", fail), flight.run("key", fail), return_exceptions=True
+        )
+        retried = await flight.run("key", lambda: asyncio.sleep(0, result="ok"))
+        return results, retried
+
+    results, retried = asyncio.run(scenario())
+
+    assert all(isinstance(item, ValueError) for item in results)
+    assert retried == ("ok", False)
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    flight = SingleFlight()
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def compute():
+            await gate.wait()
+            return "result"
+
+        first = asyncio.ensure_future(flight.run("key", compute))
+        second = asyncio.ensure_future(flight.run("key", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == ("result", True)
+
+
+def test_last_cancelled_caller_cancels_computation():
+    flight = SingleFlight()
+    state = {}
+
+    async def scenario():
+        async def compute():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                state["cancelled"] = True
+                raise
+
+        callers = [asyncio.ensure_future(flight.run("key", compute)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+
+    assert state == {"cancelled": True}
+    assert len(flight) == 0
+
+
+def test_newcomer_during_cancellation_gets_its_own_computation():
+    flight = SingleFlight()
+    started = []
+
+    async def scenario():
+        async def compute():
+            started.append(1)
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                # Отмена завершается не мгновенно (например, закрытие соединения)
+                await asyncio.sleep(0.01)
+                raise
+            return "result"
+
+        async def fast():
+            started.append(2)
+            return "fresh"
+
+        caller = asyncio.ensure_future(flight.run("key", compute))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.sleep(0)
+        newcomer = await flight.run("key", fast)
+        await asyncio.gather(caller, return_exceptions=True)
+        return newcomer
+
+    assert asyncio.run(scenario()) == ("fresh", False)
+    assert started == [1, 2]
+    assert len(flight) == 0
@@ -0,0 +1,72 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from app.core import validator as validator_module  # type: ignore
+from app.core.validator import SchemaValidator  # type: ignore
+
+SCHEMA_PATH = Path(__file__).resolve().parents[1] / "api" / "app" / "assets" / "schema.json"
+
+FLAT_SCHEMAS: List[Dict[str, Any]] = [
+    json.loads(SCHEMA_PATH.read_text(encoding="utf-8")),
+    {
+        "type": "object",
+        "properties": {
+            "Сумма": {"type": "number"},
+            "Количество": {"type": "integer"},
+            "Резидент": {"type": "boolean"},
+            "Валюта": {"enum": ["RUB", "USD"], "type": "string"},
+            "Флаг": {"enum": [1, True, None]},
+            "Пусто": {"type": "null"},
+        },
+        "required": ["Сумма", "Валюта"],
+    },
+    {"properties": {"Код": {"type": "string", "format": "date"}}, "required": ["Код"]},
+]
+
+DOCUMENTS: List[Any] = [
+    {},
+    {"Сумма": 10, "Валюта": "RUB"},
+    {"Сумма": "10", "Количество": 2.0, "Резидент": 1, "Валюта": "EUR", "Флаг": False},
+    {"Количество": 2.5, "Резидент": True, "Флаг": 1, "Пусто": 0, "Код": 5},
+    {"Сумма": True, "Количество": True, "Флаг": True, "Пусто": None, "Код": "не дата"},
+    {"Сумма": None, "Валюта": None, "Предмет": 1, "СтавкаНДС": "20"},
+    [],
+    "строка",
+]
+
+
+def _reference(schema: Dict[str, Any], monkeypatch) -> SchemaValidator:
+    with monkeypatch.context() as patch:
+        patch.setattr(validator_module._FlatSchemaValidator, "compile", staticmethod(lambda _: None))
+        return SchemaValidator(schema)
+
+
+@pytest.mark.parametrize("schema", FLAT_SCHEMAS)
+def test_fast_path_matches_jsonschema(schema: Dict[str, Any], monkeypatch) -> None:
+    fast = SchemaValidator(schema)
+    reference = _reference(schema, monkeypatch)
+
+    assert fast.is_fast_path and not reference.is_fast_path
+    for document in DOCUMENTS:
+        assert fast.validate(document) == reference.validate(document), document
+
+
+@pytest.mark.parametrize(
+    "schema",
+    [
+        {"type": "object", "properties": {"Сумма": {"type": ["number", "null"]}}},
+        {"type": "object", "properties": {"Сумма": {"type": "number", "minimum": 0}}},
+        {"type": ["object", "null"], "properties": {}},
+        {"type": "object", "properties": {"Сумма": True}},
+    ],
+)
+def test_unsupported_schemas_fall_back_to_jsonschema(schema: Dict[str, Any], monkeypatch) -> None:
+    validator = SchemaValidator(schema)
+    reference = _reference(schema, monkeypatch)
+
+    assert not validator.is_fast_path
+    for document in ({"Сумма": None}, {"Сумма": -1}, {"Сумма": "1"}, None):
+        assert validator.validate(document) == reference.validate(document)
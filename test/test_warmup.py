@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import httpx
+
+from app.core.config import CONFIG
+from app.services.ollama_client import OllamaClient
+from app.services.warmup import ModelWarmer
+
+
+def _ollama(requests):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "test-model:latest"}]})
+        payload = json.loads(request.content)
+        requests.append((request.url.path, (payload.get("options") or {}).get("num_ctx")))
+        if request.url.path == "/api/chat":
+            chunk = {"message": {"content": "{}"}, "done": True}
+            return httpx.Response(200, text=json.dumps(chunk) + "\n")
+        return httpx.Response(200, json={"done": True})
+
+    client = OllamaClient(base_url="http://ollama", model="test-model")
+    client._http_client = lambda: httpx.AsyncClient(
+        base_url="http://ollama", transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+def _scenario(client, warmer):
+    async def run():
+        assert await warmer.warm_up()
+        await client.chat("system", "user", num_ctx=16384)
+        await client.chat("system", "user", num_ctx=4096)
+        assert await warmer.warm_up()
+
+    asyncio.run(run())
+
+
+def test_warm_up_uses_fixed_context_and_calls_keep_their_own(monkeypatch):
+    monkeypatch.setattr(CONFIG, "dynamic_llm_budget", True)
+    monkeypatch.setattr(CONFIG, "llm_num_ctx_min", 4096)
+    monkeypatch.setattr(CONFIG, "llm_num_ctx_warmup", 0)
+    requests = []
+    client = _ollama(requests)
+
+    _scenario(client, ModelWarmer(client))
+
+    # Большой документ не меняет размер ни следующих вызовов, ни прогрева
+    assert requests == [
+        ("/api/generate", 4096),
+        ("/api/chat", 16384),
+        ("/api/chat", 4096),
+        ("/api/generate", 4096),
+    ]
+
+
+def test_warm_up_context_is_configurable(monkeypatch):
+    monkeypatch.setattr(CONFIG, "dynamic_llm_budget", True)
+    monkeypatch.setattr(CONFIG, "llm_num_ctx_min", 4096)
+    monkeypatch.setattr(CONFIG, "llm_num_ctx_max", 32768)
+    monkeypatch.setattr(CONFIG, "llm_num_ctx_warmup", 16384)
+    requests = []
+    client = _ollama(requests)
+
+    _scenario(client, ModelWarmer(client))
+
+    assert [num_ctx for path, num_ctx in requests if path == "/api/generate"] == [16384, 16384]